@@ -0,0 +1,109 @@
+import threading
+import time
+from typing import Any, Dict, Iterator, Set
+from weakref import WeakKeyDictionary
+
+from algosdk.logic import get_application_address
+from algosdk.v2client.algod import AlgodClient
+
+from confirmation import get_confirmation_waiter
+
+
+# transaction fields holding addresses whose account data changes
+_ADDRESS_FIELDS = ("snd", "rcv", "close", "arcv", "aclose", "asnd", "rekey")
+
+
+class _Snapshot:
+    def __init__(self, account_info: Dict[str, Any]) -> None:
+        self.account_info = account_info
+        self.round: int = account_info.get("round", 0)
+        self.fetched_at = time.monotonic()
+
+
+class AccountSnapshotCache:
+    """Fetches `account_info` at most once per address per round.
+
+    A snapshot is served until the shared confirmation waiter sees a newer
+    round, or for `max_age` seconds when the waiter is idle. Snapshots of
+    every account touched by one of our own confirmed transactions are
+    dropped as soon as the confirmation lands.
+
+    Args:
+        client: An algod client.
+        max_age: Seconds a snapshot is served when no newer round is known.
+    """
+
+    def __init__(self, client: AlgodClient, max_age: float = 4.0) -> None:
+        self.client = client
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._snapshots: Dict[str, _Snapshot] = dict()
+        get_confirmation_waiter(client).add_listener(self.on_confirmed)
+
+    def get(self, address: str) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = self._snapshots.get(address)
+        if snapshot is not None and self._is_fresh(snapshot):
+            self.hits += 1
+            return snapshot.account_info
+
+        self.misses += 1
+        snapshot = _Snapshot(self.client.account_info(address))
+        with self._lock:
+            self._snapshots[address] = snapshot
+        return snapshot.account_info
+
+    def invalidate(self, address: str) -> None:
+        with self._lock:
+            self._snapshots.pop(address, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+
+    def on_confirmed(self, tx_id: str, pending_txn: Dict[str, Any]) -> None:
+        for address in touched_addresses(pending_txn):
+            self.invalidate(address)
+
+    def _is_fresh(self, snapshot: _Snapshot) -> bool:
+        if time.monotonic() - snapshot.fetched_at > self.max_age:
+            return False
+        last_round = get_confirmation_waiter(self.client).last_round
+        return last_round is None or last_round <= snapshot.round
+
+
+def touched_addresses(pending_txn: Dict[str, Any]) -> Set[str]:
+    """Return every address whose account data a confirmed transaction changed."""
+    return set(_iter_addresses(pending_txn))
+
+
+def _iter_addresses(pending_txn: Dict[str, Any]) -> Iterator[str]:
+    txn = pending_txn.get("txn", {}).get("txn", {})
+    for field in _ADDRESS_FIELDS:
+        if field in txn:
+            yield txn[field]
+    yield from txn.get("apat", [])
+    if txn.get("apid"):
+        yield get_application_address(txn["apid"])
+    if pending_txn.get("application-index"):
+        yield get_application_address(pending_txn["application-index"])
+
+    for inner_txn in pending_txn.get("inner-txns", []):
+        yield from _iter_addresses(inner_txn)
+
+
+_caches: "WeakKeyDictionary[AlgodClient, AccountSnapshotCache]" = WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def get_account_cache(client: AlgodClient) -> AccountSnapshotCache:
+    """Return the account snapshot cache shared by everything using `client`."""
+    with _caches_lock:
+        cache = _caches.get(client)
+        if cache is None:
+            cache = AccountSnapshotCache(client)
+            _caches[client] = cache
+        return cache
@@ -0,0 +1,256 @@
+import base64
+import collections
+import http.client
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import msgpack
+from algosdk import encoding, error
+from algosdk.v2client.algod import AlgodClient, api_version_path_prefix
+
+from pooled_client import endpoint_name
+from single_flight import SingleFlight
+
+
+# GET requests under these paths read ledger state and are safe to serve from
+# any node and to retry on another one
+READ_PATHS = ("/accounts/", "/applications/", "/assets/", "/blocks/")
+PENDING_PATH = "/transactions/pending/"
+
+# transactions whose node is remembered for confirmation lookups
+SENT_TO_SIZE = 65536
+
+ROUND_ROBIN = "round_robin"
+LOWEST_LATENCY = "latency"
+
+# weight of the newest sample in the per-node latency average
+_LATENCY_ALPHA = 0.2
+
+_NODE_ERRORS = (OSError, http.client.HTTPException, error.AlgodResponseError)
+
+logger = logging.getLogger(__name__)
+
+
+class AlgodNode:
+    """One endpoint of an `AlgodPool` together with its health.
+
+    A node is ejected for `eject_for` seconds after `max_failures`
+    consecutive transport errors or 5xx responses. Once the ejection expires
+    the node serves traffic again, but a single further failure ejects it
+    again until it answers successfully.
+    """
+
+    def __init__(self, client: AlgodClient, max_failures: int, eject_for: float) -> None:
+        self.client = client
+        self.max_failures = max_failures
+        self.eject_for = eject_for
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.latency = 0.0
+        self.requests = 0
+
+    @property
+    def address(self) -> str:
+        return self.client.algod_address
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def succeeded(self, elapsed: float) -> None:
+        self.requests += 1
+        self.failures = 0
+        if self.latency:
+            self.latency += _LATENCY_ALPHA * (elapsed - self.latency)
+        else:
+            self.latency = elapsed
+
+    def failed(self, now: float) -> None:
+        self.requests += 1
+        self.failures += 1
+        if self.failures >= self.max_failures:
+            self.ejected_until = now + self.eject_for
+            logger.warning("algod node %s ejected for %ss", self.address, self.eject_for)
+
+    def as_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "address": self.address,
+            "healthy": self.healthy(now),
+            "failures": self.failures,
+            "latency": self.latency,
+            "requests": self.requests,
+        }
+
+
+def is_read(method: str, requrl: str) -> bool:
+    """Whether a request only reads ledger state and can go to any node."""
+    return method == "GET" and requrl.startswith(READ_PATHS)
+
+
+def is_node_failure(e: Exception) -> bool:
+    """Whether `e` says something about the node rather than the request."""
+    if isinstance(e, error.AlgodHTTPError):
+        return e.code is None or e.code >= 500
+    return isinstance(e, _NODE_ERRORS)
+
+
+class AlgodPool(AlgodClient):
+    """AlgodClient that spreads requests over several algod endpoints.
+
+    Ledger reads (`account_info`, `application_info`, `asset_info`,
+    `block_info`) are balanced over the healthy nodes and retried on the next
+    node when one fails. Everything else - submissions, status and
+    confirmation polling, suggested params - is pinned to the first healthy
+    node in preference order, because pending transactions are only known to
+    the node they were sent to until they are gossiped. Pinned GETs fail over
+    to the next node; submissions are never retried here. Pending
+    transaction lookups go to the node the transaction was sent to and do
+    not fail over, as any other node would answer 404 for a transaction
+    still in its sender's pool. Identical GET requests in flight at the same
+    time share one call, whichever node serves it.
+
+    Args:
+        clients: One client per endpoint, most preferred first.
+        strategy: ROUND_ROBIN or LOWEST_LATENCY for balancing reads.
+        max_failures: Consecutive failures before a node is ejected.
+        eject_for: Seconds an ejected node is left out of rotation.
+        coalesce_reads: Share concurrent identical GET requests.
+    """
+
+    def __init__(
+        self,
+        clients: Sequence[AlgodClient],
+        strategy: str = ROUND_ROBIN,
+        max_failures: int = 3,
+        eject_for: float = 30.0,
+        coalesce_reads: bool = True,
+    ) -> None:
+        if not clients:
+            raise Exception("AlgodPool needs at least one client")
+        if strategy not in (ROUND_ROBIN, LOWEST_LATENCY):
+            raise Exception(f"Unknown read strategy {strategy}")
+        preferred = clients[0]
+        super().__init__(preferred.algod_token, preferred.algod_address, preferred.headers)
+        self.strategy = strategy
+        self.nodes = [AlgodNode(client, max_failures, eject_for) for client in clients]
+        self.single_flight = SingleFlight() if coalesce_reads else None
+
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+        self._sent_to: "collections.OrderedDict[str, AlgodNode]" = collections.OrderedDict()
+
+    def algod_request(
+        self,
+        method,
+        requrl,
+        params=None,
+        data=None,
+        headers=None,
+        response_format="json",
+        **kwargs,
+    ):
+        if method == "GET" and self.single_flight is not None:
+            key = (requrl, tuple(sorted((params or {}).items())), response_format,
+                   tuple(sorted((headers or {}).items())))
+            return self.single_flight.run(
+                key,
+                lambda: self._route(method, requrl, params, data, headers, response_format, **kwargs),
+                label=endpoint_name(method, api_version_path_prefix + requrl),
+            )
+        return self._route(method, requrl, params, data, headers, response_format, **kwargs)
+
+    @property
+    def preferred(self) -> AlgodNode:
+        """The node submissions currently go to."""
+        return self._write_order()[0]
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Return health and latency for every node, in preference order."""
+        now = time.monotonic()
+        with self._lock:
+            return [node.as_dict(now) for node in self.nodes]
+
+    def close(self) -> None:
+        for node in self.nodes:
+            if hasattr(node.client, "close"):
+                node.client.close()
+
+    def _route(self, method, requrl, params, data, headers, response_format, **kwargs):
+        if is_read(method, requrl):
+            nodes = self._read_order()
+        else:
+            nodes = self._pending_order(method, requrl) or self._write_order()
+
+        last_error: Optional[Exception] = None
+        for node in nodes:
+            start = time.monotonic()
+            try:
+                response = node.client.algod_request(
+                    method, requrl, params, data, headers, response_format, **kwargs
+                )
+            except Exception as e:
+                if not is_node_failure(e):
+                    with self._lock:
+                        node.succeeded(time.monotonic() - start)
+                    raise
+                with self._lock:
+                    node.failed(time.monotonic())
+                if method != "GET":
+                    raise
+                last_error = e
+                continue
+            with self._lock:
+                node.succeeded(time.monotonic() - start)
+            if method == "POST" and requrl == "/transactions":
+                self._remember(data, node)
+            return response
+        raise last_error
+
+    def _pending_order(self, method: str, requrl: str) -> List[AlgodNode]:
+        if method != "GET" or not requrl.startswith(PENDING_PATH):
+            return []
+        with self._lock:
+            node = self._sent_to.get(requrl[len(PENDING_PATH):])
+        return [node] if node is not None else []
+
+    def _remember(self, data: bytes, node: AlgodNode) -> None:
+        tx_ids = _tx_ids(data)
+        with self._lock:
+            for tx_id in tx_ids:
+                self._sent_to[tx_id] = node
+                self._sent_to.move_to_end(tx_id)
+            while len(self._sent_to) > SENT_TO_SIZE:
+                self._sent_to.popitem(last=False)
+
+    def _healthy(self) -> List[AlgodNode]:
+        now = time.monotonic()
+        with self._lock:
+            healthy = [node for node in self.nodes if node.healthy(now)]
+            if healthy:
+                return healthy
+            # everything is ejected, try the node that has been out the longest first
+            return sorted(self.nodes, key=lambda node: node.ejected_until)
+
+    def _write_order(self) -> List[AlgodNode]:
+        return self._healthy()
+
+    def _read_order(self) -> List[AlgodNode]:
+        nodes = self._healthy()
+        if self.strategy == LOWEST_LATENCY:
+            # unmeasured nodes have latency 0 and are tried first
+            return sorted(nodes, key=lambda node: node.latency)
+        start = next(self._next) % len(nodes)
+        return nodes[start:] + nodes[:start]
+
+
+def _tx_ids(data: bytes) -> List[str]:
+    """IDs of the signed transactions concatenated in a posted body."""
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(data)
+    tx_ids = []
+    for stxn in unpacker:
+        digest = encoding.checksum(b"TX" + msgpack.packb(stxn["txn"], use_bin_type=True))
+        tx_ids.append(base64.b32encode(digest).decode().rstrip("="))
+    return tx_ids
@@ -0,0 +1,130 @@
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from weakref import WeakKeyDictionary
+
+from algosdk import encoding
+from algosdk.future import transaction
+from algosdk.logic import get_application_address
+from algosdk.v2client.algod import AlgodClient
+
+from confirmation import get_confirmation_waiter
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    """Global state of an app that is only written on create or setup.
+
+    Addresses are kept encoded so they can go straight into `accounts`.
+    Keys an app does not have are left as None.
+    """
+    app_id: int
+    app_address: str
+    # SA_ID
+    store_app_id: Optional[int] = None
+    # SA_ADDR
+    staking_address: Optional[str] = None
+    # TW_ADDR
+    team_wallet_address: Optional[str] = None
+    # TK_ID
+    token_id: Optional[int] = None
+    # TA
+    token_app_id: Optional[int] = None
+
+    @classmethod
+    def from_global_state(cls, app_id: int, state: Dict[bytes, Any]) -> "AppConfig":
+        def address(key: bytes) -> Optional[str]:
+            if key not in state:
+                return None
+            return encoding.encode_address(state[key])
+
+        return cls(
+            app_id=app_id,
+            app_address=get_application_address(app_id),
+            store_app_id=state.get(b"SA_ID"),
+            staking_address=address(b"SA_ADDR"),
+            team_wallet_address=address(b"TW_ADDR"),
+            token_id=state.get(b"TK_ID"),
+            token_app_id=state.get(b"TA"),
+        )
+
+    def global_state(self) -> Dict[bytes, Any]:
+        """The global state keys this config was read from, as `from_global_state` takes them."""
+        state: Dict[bytes, Any] = dict()
+        for key, value in ((b"SA_ID", self.store_app_id), (b"TK_ID", self.token_id), (b"TA", self.token_app_id)):
+            if value is not None:
+                state[key] = value
+        for key, address in ((b"SA_ADDR", self.staking_address), (b"TW_ADDR", self.team_wallet_address)):
+            if address is not None:
+                state[key] = encoding.decode_address(address)
+        return state
+
+
+class AppConfigCache:
+    """Loads each app's config once and keeps it until the app is updated.
+
+    Entries are dropped when one of our own UpdateApplication or
+    DeleteApplication calls confirms.
+
+    Args:
+        client: An algod client.
+    """
+
+    def __init__(self, client: AlgodClient) -> None:
+        self.client = client
+
+        self._lock = threading.Lock()
+        self._configs: Dict[int, AppConfig] = dict()
+        get_confirmation_waiter(client).add_listener(self.on_confirmed)
+
+    def get(self, app_id: int) -> AppConfig:
+        with self._lock:
+            config = self._configs.get(app_id)
+        if config is None:
+            config = self.refresh(app_id)
+        return config
+
+    def refresh(self, app_id: int) -> AppConfig:
+        # imported here because utils builds on this module
+        from utils import get_app_global_state
+
+        config = AppConfig.from_global_state(app_id, get_app_global_state(self.client, app_id))
+        with self._lock:
+            self._configs[app_id] = config
+        return config
+
+    def invalidate(self, app_id: int) -> None:
+        with self._lock:
+            self._configs.pop(app_id, None)
+
+    def on_confirmed(self, tx_id: str, pending_txn: Dict[str, Any]) -> None:
+        app_id = changed_app_id(pending_txn)
+        if app_id is not None:
+            self.invalidate(app_id)
+
+
+def changed_app_id(pending_txn: Dict[str, Any]) -> Optional[int]:
+    """Return the app a confirmed UpdateApplication or DeleteApplication call targets."""
+    txn = pending_txn.get("txn", {}).get("txn", {})
+    if txn.get("type") != "appl":
+        return None
+    if txn.get("apan") in (
+        transaction.OnComplete.UpdateApplicationOC,
+        transaction.OnComplete.DeleteApplicationOC,
+    ):
+        return txn["apid"]
+    return None
+
+
+_caches: "WeakKeyDictionary[AlgodClient, AppConfigCache]" = WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def get_app_config_cache(client: AlgodClient) -> AppConfigCache:
+    """Return the app config cache shared by everything using `client`."""
+    with _caches_lock:
+        cache = _caches.get(client)
+        if cache is None:
+            cache = AppConfigCache(client)
+            _caches[client] = cache
+        return cache
@@ -0,0 +1,350 @@
+import asyncio
+import base64
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib import parse
+
+from algosdk import constants, encoding, error
+from algosdk.future import transaction
+from algosdk.v2client.algod import api_version_path_prefix
+
+from pooled_client import LONG_POLL_PATH, LONG_POLL_TIMEOUT, MAX_THROTTLE_RETRIES, LatencyStats, endpoint_name
+from rate_limit import DEFAULT_RETRY_AFTER, AsyncRateLimiter, endpoint_class
+from single_flight import AsyncSingleFlight
+
+
+_Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class AsyncConnectionPool:
+    """Pool of persistent HTTP connections to one host for one event loop.
+
+    Args:
+        url: Base URL of the host.
+        size: Maximum number of connections open at once.
+    """
+
+    def __init__(self, url: str, size: int = 10) -> None:
+        parsed = parse.urlsplit(url)
+        self.scheme = parsed.scheme or "http"
+        self.host = parsed.hostname
+        default_port = 443 if self.scheme == "https" else 80
+        self.port = parsed.port or default_port
+        # value of the Host header, with the port unless it is the scheme's default
+        self.netloc = "[{}]".format(self.host) if ":" in self.host else self.host
+        if self.port != default_port:
+            self.netloc += ":{}".format(self.port)
+        self.base_path = parsed.path.rstrip("/")
+        self.size = size
+        self.opened = 0
+
+        self._idle: List[_Connection] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self) -> Tuple[_Connection, bool]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        await self._slots.acquire()
+        while self._idle:
+            conn = self._idle.pop()
+            if not conn[1].is_closing() and not conn[0].at_eof():
+                return conn, True
+            conn[1].close()
+        try:
+            return await self._connect(), False
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: _Connection, reusable: bool = True) -> None:
+        if reusable:
+            self._idle.append(conn)
+        else:
+            conn[1].close()
+        self._slots.release()
+
+    async def replace(self, conn: _Connection) -> _Connection:
+        conn[1].close()
+        return await self._connect()
+
+    def close(self) -> None:
+        while self._idle:
+            self._idle.pop()[1].close()
+
+    async def _connect(self) -> _Connection:
+        self.opened += 1
+        if self.scheme == "https":
+            return await asyncio.open_connection(self.host, self.port, ssl=True)
+        return await asyncio.open_connection(self.host, self.port)
+
+
+class AsyncAlgodClient:
+    """asyncio-native algod client.
+
+    Speaks HTTP/1.1 over keep-alive connections on the running event loop,
+    so one loop can keep hundreds of requests in flight without a thread
+    per request. Method names and return values follow AlgodClient.
+    With a rate limiter, requests wait for a token of their endpoint class
+    and 429 responses pause that class, as in PooledAlgodClient; without
+    one a 429 is resent after its Retry-After period all the same.
+    Identical GET requests in flight at the same time share one round trip.
+
+    Args:
+        algod_token: algod API token.
+        algod_address: algod address.
+        headers: Extra headers for all requests.
+        pool_size: Maximum number of open connections.
+        timeout: Default per-request timeout in seconds.
+        rate_limiter: Optional client-side rate limiter.
+        coalesce_reads: Share concurrent identical GET requests.
+    """
+
+    def __init__(
+        self,
+        algod_token: str,
+        algod_address: str,
+        headers: Optional[Dict[str, str]] = None,
+        pool_size: int = 10,
+        timeout: float = 30.0,
+        rate_limiter: Optional[AsyncRateLimiter] = None,
+        coalesce_reads: bool = True,
+    ) -> None:
+        self.algod_token = algod_token
+        self.algod_address = algod_address
+        self.headers = headers
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.pool = AsyncConnectionPool(algod_address, size=pool_size)
+        self.single_flight = AsyncSingleFlight() if coalesce_reads else None
+
+        self._stats: Dict[str, LatencyStats] = dict()
+
+    async def algod_request(
+        self,
+        method,
+        requrl,
+        params=None,
+        data=None,
+        headers=None,
+        response_format="json",
+        timeout=None,
+    ):
+        header = {"User-Agent": "py-algorand-sdk"}
+        if self.headers:
+            header.update(self.headers)
+        if headers:
+            header.update(headers)
+        if requrl not in constants.no_auth:
+            header.update({constants.algod_auth_header: self.algod_token})
+
+        klass = endpoint_class(method, requrl)
+        if requrl not in constants.unversioned_paths:
+            requrl = api_version_path_prefix + requrl
+        if timeout is None:
+            timeout = LONG_POLL_TIMEOUT if LONG_POLL_PATH in requrl else self.timeout
+        if params:
+            requrl = requrl + "?" + parse.urlencode(params)
+
+        name = endpoint_name(method, requrl)
+        if method == "GET" and self.single_flight is not None:
+            key = (requrl, response_format, tuple(sorted(header.items())))
+            return await self.single_flight.run(
+                key,
+                lambda: self._request(method, requrl, data, header, response_format, timeout, klass, name),
+                label=name,
+            )
+        return await self._request(method, requrl, data, header, response_format, timeout, klass, name)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return latency counters keyed by endpoint."""
+        return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def close(self) -> None:
+        self.pool.close()
+
+    async def account_info(self, address, **kwargs):
+        return await self.algod_request("GET", "/accounts/" + address, **kwargs)
+
+    async def asset_info(self, asset_id, **kwargs):
+        return await self.algod_request("GET", "/assets/" + str(asset_id), **kwargs)
+
+    async def application_info(self, application_id, **kwargs):
+        return await self.algod_request("GET", "/applications/" + str(application_id), **kwargs)
+
+    async def block_info(self, block, response_format="json", **kwargs):
+        return await self.algod_request(
+            "GET", "/blocks/" + str(block), {"format": response_format},
+            response_format=response_format, **kwargs
+        )
+
+    async def status(self, **kwargs):
+        return await self.algod_request("GET", "/status", **kwargs)
+
+    async def status_after_block(self, block_num, **kwargs):
+        return await self.algod_request("GET", "/status/wait-for-block-after/" + str(block_num), **kwargs)
+
+    async def pending_transactions(self, max_txns=0, response_format="json", **kwargs):
+        query = {"format": response_format}
+        if max_txns:
+            query["max"] = max_txns
+        return await self.algod_request(
+            "GET", "/transactions/pending", query, response_format=response_format, **kwargs
+        )
+
+    async def pending_transaction_info(self, transaction_id, response_format="json", **kwargs):
+        return await self.algod_request(
+            "GET", "/transactions/pending/" + transaction_id, {"format": response_format},
+            response_format=response_format, **kwargs
+        )
+
+    async def send_raw_transaction(self, txn, **kwargs):
+        """Broadcast base64 encoded signed transactions and return the first txid."""
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers["Content-Type"] = "application/x-binary"
+        response = await self.algod_request(
+            "POST", "/transactions", data=base64.b64decode(txn), headers=headers, **kwargs
+        )
+        return response["txId"]
+
+    async def send_transaction(self, txn, **kwargs):
+        return await self.send_transactions([txn], **kwargs)
+
+    async def send_transactions(self, txns, **kwargs):
+        serialized = []
+        for txn in txns:
+            assert not isinstance(
+                txn, transaction.Transaction
+            ), "Attempt to send UNSIGNED transaction {}".format(txn)
+            serialized.append(base64.b64decode(encoding.msgpack_encode(txn)))
+        return await self.send_raw_transaction(base64.b64encode(b"".join(serialized)), **kwargs)
+
+    async def suggested_params(self, **kwargs):
+        res = await self.algod_request("GET", "/transactions/params", **kwargs)
+        return transaction.SuggestedParams(
+            res["fee"],
+            res["last-round"],
+            res["last-round"] + 1000,
+            res["genesis-hash"],
+            res["genesis-id"],
+            False,
+            res["consensus-version"],
+            res["min-fee"],
+        )
+
+    async def compile(self, source, **kwargs):
+        return await self.algod_request(
+            "POST", "/teal/compile", {"sourcemap": False}, data=source.encode("utf-8"),
+            headers={"Content-Type": "application/x-binary"}, **kwargs
+        )
+
+    async def _request(self, method, requrl, data, header, response_format, timeout, klass, name):
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(klass)
+            start = time.monotonic()
+            try:
+                status, body, retry_after = await asyncio.wait_for(
+                    self._send(method, self.pool.base_path + requrl, data, header), timeout
+                )
+            except Exception:
+                self._record(name, time.monotonic() - start, failed=True)
+                raise
+            self._record(name, time.monotonic() - start, failed=status >= 400)
+            if status != 429 or attempt == MAX_THROTTLE_RETRIES:
+                break
+            if self.rate_limiter is not None:
+                self.rate_limiter.throttle(klass, retry_after)
+            else:
+                await asyncio.sleep(retry_after or DEFAULT_RETRY_AFTER)
+
+        if status >= 400:
+            message = body.decode("utf-8")
+            try:
+                message = json.loads(message)["message"]
+            finally:
+                raise error.AlgodHTTPError(message, status)
+        if response_format == "json":
+            try:
+                return json.loads(body)
+            except Exception as e:
+                raise error.AlgodResponseError(
+                    "Failed to parse JSON response from algod"
+                ) from e
+        return body
+
+    async def _send(self, method, path, data, header) -> Tuple[int, bytes, Optional[float]]:
+        header = dict(header)
+        header["Host"] = self.pool.netloc
+        header["Content-Length"] = str(len(data) if data else 0)
+        head = "{} {} HTTP/1.1\r\n".format(method, path)
+        head += "".join("{}: {}\r\n".format(k, v) for k, v in header.items())
+        request = head.encode("latin-1") + b"\r\n" + (data or b"")
+
+        conn, reused = await self.pool.acquire()
+        reusable = False
+        try:
+            while True:
+                try:
+                    reader, writer = conn
+                    writer.write(request)
+                    await writer.drain()
+                    status, body, reusable, retry_after = await _read_response(reader)
+                    return status, body, retry_after
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # only retry if the server dropped an idle connection
+                    if not reused:
+                        raise
+                    conn = await self.pool.replace(conn)
+                    reused = False
+        finally:
+            self.pool.release(conn, reusable)
+
+    def _record(self, name: str, elapsed: float, failed: bool = False) -> None:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = LatencyStats()
+            self._stats[name] = stats
+        stats.add(elapsed, failed)
+
+
+async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, bytes, bool, Optional[float]]:
+    status_line = await reader.readuntil(b"\r\n")
+    version, status = status_line.decode("latin-1").split(" ", 2)[:2]
+
+    headers: Dict[str, str] = dict()
+    while True:
+        line = await reader.readuntil(b"\r\n")
+        if line == b"\r\n":
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            if size == 0:
+                # skip trailers
+                while await reader.readuntil(b"\r\n") != b"\r\n":
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+        reusable = True
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+        reusable = True
+    else:
+        body = await reader.read()
+        reusable = False
+
+    connection = headers.get("connection", "").lower()
+    if connection == "close" or (version == "HTTP/1.0" and connection != "keep-alive"):
+        reusable = False
+    try:
+        retry_after = float(headers["retry-after"])
+    except (KeyError, ValueError):
+        retry_after = None
+    return int(status), body, reusable, retry_after
@@ -0,0 +1,710 @@
+import asyncio
+import copy
+import logging
+from base64 import b64decode
+import time
+from typing import Any, Callable, Collection, Dict, List, Optional, Set, Tuple, Union
+from weakref import WeakKeyDictionary
+
+from algosdk.error import AlgodHTTPError
+from algosdk.future import transaction
+from pyteal import compileTeal, Expr, Mode
+
+from account import Account
+from account_cache import touched_addresses
+from app_config import AppConfig, changed_app_id
+from async_client import AsyncAlgodClient
+from compile_cache import get_compile_cache
+from confirmation import ConfirmationTimeout, DEFAULT_TIMEOUT_ROUNDS, MAX_STATUS_FAILURES
+from group_packer import Operation, pack
+from fee_bumper import DEFAULT_BUDGET, FeeBudget, FeeBumper, is_low_fee
+from signer_registry import SignerRegistry
+from single_flight import AsyncSingleFlight
+from pending_pool import MAX_PENDING_TXNS, PendingCall, check_conflicts, index_pending
+from raw_submit import RAW_HEADERS, EncodedGroup
+from rate_limit import DEFAULT_LIMITS, AsyncRateLimiter
+from rekeyed_registry import SLOT_FREE, SLOT_IN_USE, SLOT_NEW, get_rekeyed_registry
+from retry import backoff, is_transient
+from submission_queue import AlreadyInLedger, SubmissionError, is_duplicate, is_in_ledger
+from utils import (
+    GroupBuilder,
+    SLOTS_PER_GROUP,
+    PendingTxnResponse,
+    decode_balances,
+    decode_local_state,
+    decode_state,
+    has_app_local_state,
+    has_asset_holding,
+    slot_operation,
+    slot_optin_operation,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncConfirmationWaiter:
+    """Tracks pending transactions against one block-follow task.
+
+    The asyncio counterpart of confirmation.ConfirmationWaiter: it reads the
+    current round each time its task starts, counts a transaction's round
+    budget from the first round it is checked in, retries transient algod
+    errors the same way, and looks up only the first transaction of a group
+    until it is confirmed.
+
+    Args:
+        client: An async algod client.
+        timeout_rounds: Number of rounds to wait before giving up on a
+            transaction.
+        backoff_base: Upper bound of the first retry delay, in seconds.
+        backoff_cap: Upper bound of any retry delay, in seconds.
+    """
+
+    def __init__(self, client: AsyncAlgodClient, timeout_rounds: int = DEFAULT_TIMEOUT_ROUNDS,
+                 backoff_base: float = 0.5, backoff_cap: float = 8.0) -> None:
+        self.client = client
+        self.timeout_rounds = timeout_rounds
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.last_round: Optional[int] = None
+
+        # tx_id -> [future, deadline round, rounds budget, [tx_id of followers]]
+        self._tracked: Dict[str, List[Any]] = dict()
+        # transactions of groups whose first transaction is tracked for them
+        self._following: Dict[str, List[Any]] = dict()
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_listener(self, listener: Callable[[str, Dict[str, Any]], None]) -> None:
+        self._listeners.append(listener)
+
+    def track(self, tx_id: str, timeout_rounds: Optional[int] = None,
+              last_valid: Optional[int] = None) -> asyncio.Future:
+        return self._track(tx_id, timeout_rounds, last_valid)[0]
+
+    def track_group(self, tx_ids: List[str], timeout_rounds: Optional[int] = None,
+                    last_valid: Optional[int] = None) -> List[asyncio.Future]:
+        """Track every transaction of a group, looking up only the first one
+        until it is confirmed. See confirmation.ConfirmationWaiter.track_group."""
+        leader = self._track(tx_ids[0], timeout_rounds, last_valid)
+        futures = [leader[0]]
+        for tx_id in tx_ids[1:]:
+            tracked = self._tracked.get(tx_id) or self._following.get(tx_id)
+            if tracked is None:
+                tracked = [asyncio.get_running_loop().create_future(), last_valid,
+                           self.timeout_rounds if timeout_rounds is None else timeout_rounds, []]
+                self._following[tx_id] = tracked
+                leader[3].append(tx_id)
+            futures.append(tracked[0])
+        return futures
+
+    def _track(self, tx_id: str, timeout_rounds: Optional[int], last_valid: Optional[int]) -> List[Any]:
+        tracked = self._tracked.get(tx_id) or self._following.get(tx_id)
+        if tracked is None:
+            if timeout_rounds is None:
+                timeout_rounds = self.timeout_rounds
+            tracked = [asyncio.get_running_loop().create_future(), last_valid, timeout_rounds, []]
+            self._tracked[tx_id] = tracked
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        return tracked
+
+    async def wait(self, tx_id: str, timeout_rounds: Optional[int] = None) -> Dict[str, Any]:
+        return await asyncio.shield(self.track(tx_id, timeout_rounds))
+
+    async def wait_for_group(self, tx_ids: List[str], timeout_rounds: Optional[int] = None) -> List[Dict[str, Any]]:
+        futures = self.track_group(tx_ids, timeout_rounds)
+        return list(await asyncio.shield(asyncio.gather(*futures)))
+
+    async def _run(self) -> None:
+        failures = 0
+        fresh = False
+        try:
+            while self._tracked:
+                try:
+                    if not fresh:
+                        self.last_round = (await self.client.status())["last-round"]
+                        fresh = True
+                    await asyncio.gather(*[
+                        self._check(tx_id, tracked) for tx_id, tracked in list(self._tracked.items())
+                    ])
+                    if not self._tracked:
+                        break
+                    status = await self.client.status_after_block(self.last_round + 1)
+                    self.last_round = status["last-round"]
+                    failures = 0
+                except Exception as e:
+                    failures += 1
+                    if is_transient(e) and failures < MAX_STATUS_FAILURES:
+                        logger.warning("Confirmation waiter retrying after %s", e)
+                        await asyncio.sleep(backoff(failures, self.backoff_base, self.backoff_cap))
+                        continue
+                    tracked = list(self._tracked.values()) + list(self._following.values())
+                    self._tracked.clear()
+                    self._following.clear()
+                    for future, _, _, _ in tracked:
+                        if not future.done():
+                            future.set_exception(e)
+        finally:
+            self._task = None
+
+    async def _check(self, tx_id: str, tracked: List[Any]) -> None:
+        future = tracked[0]
+        if tracked[1] is None:
+            tracked[1] = self.last_round + tracked[2]
+
+        try:
+            pending_txn = await self.client.pending_transaction_info(tx_id)
+        except Exception as e:
+            if not is_transient(e):
+                self._finish(tx_id, future, error=e)
+            # a transient failure is looked up again next round, or times out
+            elif self.last_round >= tracked[1]:
+                self._finish(tx_id, future, error=ConfirmationTimeout(
+                    "Transaction {} not confirmed by round {}".format(tx_id, tracked[1])
+                ))
+            return
+
+        if pending_txn.get("confirmed-round", 0) > 0:
+            self._finish(tx_id, future, pending_txn=pending_txn)
+            await self._look_up_followers(tracked)
+        elif pending_txn.get("pool-error"):
+            self._finish(tx_id, future, error=Exception(pending_txn["pool-error"]))
+        elif self.last_round >= tracked[1]:
+            self._finish(tx_id, future, error=ConfirmationTimeout(
+                "Transaction {} not confirmed by round {}".format(tx_id, tracked[1])
+            ))
+
+    async def _look_up_followers(self, tracked: List[Any]) -> None:
+        for tx_id in tracked[3]:
+            follower = self._following.get(tx_id)
+            if follower is None:
+                continue
+            try:
+                pending_txn = await self.client.pending_transaction_info(tx_id)
+            except Exception as e:
+                logger.warning("Lookup of %s failed, tracking it on its own: %s", tx_id, e)
+                pending_txn = {}
+            if pending_txn.get("confirmed-round", 0) > 0:
+                self._finish(tx_id, follower[0], pending_txn=pending_txn)
+                await self._look_up_followers(follower)
+            elif self._following.pop(tx_id, None) is follower:
+                # checked every round from now on, like any other transaction
+                self._tracked[tx_id] = follower
+
+    def _finish(self, tx_id: str, future: asyncio.Future, pending_txn: Dict[str, Any] = None, error: Exception = None) -> None:
+        tracked = self._tracked.pop(tx_id, None) or self._following.pop(tx_id, None)
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+            # the group commits atomically, its other transactions fail with it
+            for follower_id in tracked[3] if tracked is not None else ():
+                follower = self._following.get(follower_id)
+                if follower is not None:
+                    self._finish(follower_id, follower[0], error=error)
+            return
+        for listener in self._listeners:
+            try:
+                listener(tx_id, pending_txn)
+            except Exception:
+                logger.exception("Confirmation listener failed for %s", tx_id)
+        future.set_result(pending_txn)
+
+
+class AsyncSuggestedParamsProvider:
+    """asyncio counterpart of suggested_params.SuggestedParamsProvider."""
+
+    def __init__(
+        self,
+        client: AsyncAlgodClient,
+        max_rounds: int = 10,
+        max_age: float = 30.0,
+        refresh_after: float = 15.0,
+    ) -> None:
+        self.client = client
+        self.max_rounds = max_rounds
+        self.max_age = max_age
+        self.refresh_after = refresh_after
+        self.fetches = 0
+
+        self._params: Optional[transaction.SuggestedParams] = None
+        self._fetched_at = 0.0
+        self._flight = AsyncSingleFlight()
+
+    async def get(self) -> transaction.SuggestedParams:
+        params = self._params
+        age = time.monotonic() - self._fetched_at
+        if params is None or age > self.max_age or self._is_round_expired(params):
+            params = await self.refresh()
+        elif age > self.refresh_after:
+            asyncio.ensure_future(self._background_refresh())
+        return copy.copy(params)
+
+    async def refresh(self) -> transaction.SuggestedParams:
+        return await self._flight.run("params", self._fetch)
+
+    async def _fetch(self) -> transaction.SuggestedParams:
+        params = await self.client.suggested_params()
+        self.fetches += 1
+        self._params = params
+        self._fetched_at = time.monotonic()
+        return params
+
+    async def _background_refresh(self) -> None:
+        try:
+            await self.refresh()
+        except Exception:
+            # the next caller past max_age refetches in the foreground
+            pass
+
+    def _is_round_expired(self, params: transaction.SuggestedParams) -> bool:
+        last_round = get_confirmation_waiter(self.client).last_round
+        return last_round is not None and last_round - params.first >= self.max_rounds
+
+
+class AsyncAccountSnapshotCache:
+    """asyncio counterpart of account_cache.AccountSnapshotCache.
+
+    Concurrent misses for the same address share one `account_info` call.
+    """
+
+    def __init__(self, client: AsyncAlgodClient, max_age: float = 4.0) -> None:
+        self.client = client
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+
+        self._snapshots: Dict[str, Any] = dict()
+        self._flight = AsyncSingleFlight()
+        get_confirmation_waiter(client).add_listener(self.on_confirmed)
+
+    async def get(self, address: str) -> Dict[str, Any]:
+        snapshot = self._snapshots.get(address)
+        if snapshot is not None and self._is_fresh(snapshot):
+            self.hits += 1
+            return snapshot[0]
+
+        self.misses += 1
+        return await self._flight.run(address, lambda: self._fetch(address))
+
+    def invalidate(self, address: str) -> None:
+        self._snapshots.pop(address, None)
+
+    def on_confirmed(self, tx_id: str, pending_txn: Dict[str, Any]) -> None:
+        for address in touched_addresses(pending_txn):
+            self.invalidate(address)
+
+    async def _fetch(self, address: str) -> Dict[str, Any]:
+        account_info = await self.client.account_info(address)
+        self._snapshots[address] = (account_info, account_info.get("round", 0), time.monotonic())
+        return account_info
+
+    def _is_fresh(self, snapshot) -> bool:
+        _, snapshot_round, fetched_at = snapshot
+        if time.monotonic() - fetched_at > self.max_age:
+            return False
+        last_round = get_confirmation_waiter(self.client).last_round
+        return last_round is None or last_round <= snapshot_round
+
+
+class AsyncAppConfigCache:
+    """asyncio counterpart of app_config.AppConfigCache."""
+
+    def __init__(self, client: AsyncAlgodClient) -> None:
+        self.client = client
+
+        self._configs: Dict[int, AppConfig] = dict()
+        self._flight = AsyncSingleFlight()
+        get_confirmation_waiter(client).add_listener(self.on_confirmed)
+
+    async def get(self, app_id: int) -> AppConfig:
+        config = self._configs.get(app_id)
+        if config is None:
+            config = await self.refresh(app_id)
+        return config
+
+    async def refresh(self, app_id: int) -> AppConfig:
+        return await self._flight.run(app_id, lambda: self._fetch(app_id))
+
+    def invalidate(self, app_id: int) -> None:
+        self._configs.pop(app_id, None)
+
+    def on_confirmed(self, tx_id: str, pending_txn: Dict[str, Any]) -> None:
+        app_id = changed_app_id(pending_txn)
+        if app_id is not None:
+            self.invalidate(app_id)
+
+    async def _fetch(self, app_id: int) -> AppConfig:
+        config = AppConfig.from_global_state(app_id, await get_app_global_state(self.client, app_id))
+        self._configs[app_id] = config
+        return config
+
+
+class AsyncPendingPool:
+    """asyncio counterpart of pending_pool.PendingPool."""
+
+    def __init__(self, client: AsyncAlgodClient, max_age: float = 0.5, max_txns: int = MAX_PENDING_TXNS) -> None:
+        self.client = client
+        self.max_age = max_age
+        self.max_txns = max_txns
+        self.reads = 0
+
+        self._calls: Optional[Dict[Any, List[PendingCall]]] = None
+        self._read_at = 0.0
+        self._app_ids: Set[int] = set()
+        self._flight = AsyncSingleFlight()
+
+    async def calls(self, app_id: int, address: str) -> List[PendingCall]:
+        if app_id not in self._app_ids:
+            self._app_ids.add(app_id)
+            self._calls = None
+        calls = self._calls
+        if calls is None or time.monotonic() - self._read_at > self.max_age:
+            app_ids = frozenset(self._app_ids)
+            calls = await self._flight.run(app_ids, lambda: self._fetch(app_ids), label="pending")
+        return list(calls.get((app_id, address), ()))
+
+    async def check(self, app_id: int, address: str) -> None:
+        check_conflicts(app_id, address, await self.calls(app_id, address))
+
+    def invalidate(self) -> None:
+        self._calls = None
+
+    async def _fetch(self, app_ids: Collection[int]) -> Dict[Any, List[PendingCall]]:
+        response = await self.client.pending_transactions(self.max_txns, response_format="msgpack")
+        self._calls = index_pending(response, app_ids)
+        self._read_at = time.monotonic()
+        self.reads += 1
+        return self._calls
+
+
+_waiters: "WeakKeyDictionary[AsyncAlgodClient, AsyncConfirmationWaiter]" = WeakKeyDictionary()
+_providers: "WeakKeyDictionary[AsyncAlgodClient, AsyncSuggestedParamsProvider]" = WeakKeyDictionary()
+_account_caches: "WeakKeyDictionary[AsyncAlgodClient, AsyncAccountSnapshotCache]" = WeakKeyDictionary()
+_app_config_caches: "WeakKeyDictionary[AsyncAlgodClient, AsyncAppConfigCache]" = WeakKeyDictionary()
+_pending_pools: "WeakKeyDictionary[AsyncAlgodClient, AsyncPendingPool]" = WeakKeyDictionary()
+
+
+def get_confirmation_waiter(client: AsyncAlgodClient) -> AsyncConfirmationWaiter:
+    if client not in _waiters:
+        _waiters[client] = AsyncConfirmationWaiter(client)
+    return _waiters[client]
+
+
+def get_params_provider(client: AsyncAlgodClient) -> AsyncSuggestedParamsProvider:
+    if client not in _providers:
+        _providers[client] = AsyncSuggestedParamsProvider(client)
+    return _providers[client]
+
+
+def get_account_cache(client: AsyncAlgodClient) -> AsyncAccountSnapshotCache:
+    if client not in _account_caches:
+        _account_caches[client] = AsyncAccountSnapshotCache(client)
+    return _account_caches[client]
+
+
+def get_app_config_cache(client: AsyncAlgodClient) -> AsyncAppConfigCache:
+    if client not in _app_config_caches:
+        _app_config_caches[client] = AsyncAppConfigCache(client)
+    return _app_config_caches[client]
+
+
+def get_pending_pool(client: AsyncAlgodClient) -> AsyncPendingPool:
+    if client not in _pending_pools:
+        _pending_pools[client] = AsyncPendingPool(client)
+    return _pending_pools[client]
+
+
+def get_async_algod_client(url, token, pool_size: int = 10, timeout: float = 30.0,
+                           rate_limits: Optional[Dict[str, Tuple[float, int]]] = DEFAULT_LIMITS) -> AsyncAlgodClient:
+    """Return an async algod client, rate limited like utils.get_algod_client:
+    `rate_limits` gives it an `AsyncRateLimiter`, None sends requests unpaced."""
+    headers = {
+        'X-API-Key': token
+    }
+    rate_limiter = AsyncRateLimiter(rate_limits) if rate_limits is not None else None
+    return AsyncAlgodClient(token, url, headers, pool_size=pool_size, timeout=timeout, rate_limiter=rate_limiter)
+
+
+async def get_suggested_params(client: AsyncAlgodClient) -> transaction.SuggestedParams:
+    return await get_params_provider(client).get()
+
+
+async def get_account_snapshot(client: AsyncAlgodClient, address: str) -> Dict[str, Any]:
+    return await get_account_cache(client).get(address)
+
+
+async def wait_for_confirmation(
+        client: AsyncAlgodClient, tx_id: str, timeout_rounds: Optional[int] = None
+) -> PendingTxnResponse:
+    pending_txn = await get_confirmation_waiter(client).wait(tx_id, timeout_rounds)
+    print(
+        "Transaction {} confirmed in round {}.".format(
+            tx_id, pending_txn.get("confirmed-round")
+        )
+    )
+    return PendingTxnResponse(pending_txn)
+
+
+async def wait_for_group_confirmation(
+        client: AsyncAlgodClient, tx_ids: List[str], timeout_rounds: Optional[int] = None
+) -> List[PendingTxnResponse]:
+    pending_txns = await get_confirmation_waiter(client).wait_for_group(tx_ids, timeout_rounds)
+    print(
+        "Group of {} transactions confirmed in round {}.".format(
+            len(tx_ids), pending_txns[0].get("confirmed-round")
+        )
+    )
+    return [PendingTxnResponse(pending_txn) for pending_txn in pending_txns]
+
+
+async def fully_compile_contract(client: AsyncAlgodClient, contract: Expr) -> bytes:
+    teal = compileTeal(contract, mode=Mode.Application, version=5)
+    cache = get_compile_cache()
+    key = cache.key(teal, 5)
+    program = cache.get(key)
+    if program is None:
+        response = await client.compile(teal)
+        program = b64decode(response["result"])
+        cache.put(key, program)
+    return program
+
+
+async def get_app_global_state(
+        client: AsyncAlgodClient, app_id: int
+) -> Dict[bytes, Union[int, bytes]]:
+    app_info = await client.application_info(app_id)
+    return decode_state(app_info["params"]["global-state"])
+
+
+async def get_app_config(client: AsyncAlgodClient, app_id: int) -> AppConfig:
+    return await get_app_config_cache(client).get(app_id)
+
+
+async def get_app_local_state(
+        client: AsyncAlgodClient, app_id: int, sender_address: str
+) -> Dict[bytes, Union[int, bytes]]:
+    return decode_local_state(await get_account_snapshot(client, sender_address), app_id)
+
+
+async def get_balances(client: AsyncAlgodClient, account: str) -> Dict[int, int]:
+    return decode_balances(await get_account_snapshot(client, account))
+
+
+async def get_holdings(client: AsyncAlgodClient, address: str) -> Dict[Any, int]:
+    return {(address, asset_id): amount for asset_id, amount in (await get_balances(client, address)).items() if asset_id}
+
+
+async def is_opted_in_app(client: AsyncAlgodClient, app_id: int, user_address: str) -> bool:
+    return has_app_local_state(await get_account_snapshot(client, user_address), app_id)
+
+
+async def is_opted_in_asset(client: AsyncAlgodClient, asset_id: int, user_address: str) -> bool:
+    return has_asset_holding(await get_account_snapshot(client, user_address), asset_id)
+
+
+async def send_and_wait(client: AsyncAlgodClient, signed_txns: list, max_attempts: int = 8,
+                        backoff_base: float = 0.25, backoff_cap: float = 8.0,
+                        bumper: Optional[FeeBumper] = None) -> PendingTxnResponse:
+    """Send signed transactions as one group and wait for the first to confirm.
+
+    Transient failures are retried with jittered backoff and a group algod
+    already has counts as sent, as in submission_queue.SubmissionQueue.
+    The group is encoded once for all attempts. With a `bumper`, the group
+    it holds is sent instead of `signed_txns`, and signed again with a
+    higher fee whenever algod rejects its fee as too low.
+    """
+    group = EncodedGroup.encode(signed_txns) if bumper is None else bumper.encode()
+    attempt = 0
+    in_ledger = False
+    while True:
+        attempt += 1
+        try:
+            await send_raw_group(client, group.data)
+            break
+        except Exception as e:
+            if is_duplicate(e):
+                in_ledger = is_in_ledger(e)
+                break
+            if bumper is not None and is_low_fee(e):
+                group = bumper.bump(await get_suggested_params(client))
+                if group is None:
+                    raise SubmissionError(f"Fee budget exhausted: {e}")
+                continue
+            if not is_transient(e) or attempt >= max_attempts:
+                raise SubmissionError(str(e))
+            await asyncio.sleep(backoff(attempt, backoff_base, backoff_cap))
+    if bumper is not None:
+        bumper.commit()
+    try:
+        return await wait_for_confirmation(client, group.tx_ids[0])
+    except AlgodHTTPError as e:
+        if in_ledger and e.code == 404:
+            raise AlreadyInLedger(f"Group is already in the ledger, its confirmation is no longer available: {e}")
+        raise
+
+
+async def send_raw_group(client: AsyncAlgodClient, data: Any) -> str:
+    """Async counterpart of `raw_submit.send_raw_group`."""
+    response = await client.algod_request("POST", "/transactions", data=data, headers=RAW_HEADERS)
+    return response["txId"]
+
+
+async def execute_operations(client: AsyncAlgodClient, operations: List[Operation], ordered: bool = True,
+                             budget: Optional[FeeBudget] = DEFAULT_BUDGET) -> List[PendingTxnResponse]:
+    """Async counterpart of `utils.execute_operations`."""
+    sp = await get_suggested_params(client)
+    responses = []
+    for group in pack(operations, ordered):
+        builder = GroupBuilder.from_packed(group, sp=sp)
+        if budget is None:
+            responses.append(await send_and_wait(client, builder.sign().signed_transactions))
+        else:
+            responses.append(await send_and_wait(client, None, bumper=builder.bumper(budget)))
+    return responses
+
+
+async def optin_app(client: AsyncAlgodClient, app_id: int, sender: Account):
+    txn = transaction.ApplicationOptInTxn(
+        sender=sender.get_address(),
+        sp=await get_suggested_params(client),
+        index=app_id
+    )
+    await send_and_wait(client, [txn.sign(sender.get_private_key())])
+
+
+async def optin_app_rekeyed_address(client: AsyncAlgodClient, app_id: int, sender: Account, rekeyed_adr: str):
+    txn = transaction.ApplicationOptInTxn(
+        sender=rekeyed_adr,
+        sp=await get_suggested_params(client),
+        index=app_id
+    )
+    signers = SignerRegistry.from_accounts([sender], {sender.get_address(): [rekeyed_adr]})
+    await send_and_wait(client, [signers.sign(txn)])
+
+
+async def optout_app(client: AsyncAlgodClient, app_id: int, sender: Account):
+    txn = transaction.ApplicationClearStateTxn(
+        sender=sender.get_address(),
+        sp=await get_suggested_params(client),
+        index=app_id
+    )
+    await send_and_wait(client, [txn.sign(sender.get_private_key())])
+
+
+async def optin_asset(client: AsyncAlgodClient, asset_id: int, sender: Account):
+    txn = transaction.AssetOptInTxn(
+        sender=sender.get_address(),
+        sp=await get_suggested_params(client),
+        index=asset_id
+    )
+    await send_and_wait(client, [txn.sign(sender.get_private_key())])
+
+
+async def optin_assets(client: AsyncAlgodClient, asset_ids: List[int], sender: Account):
+    """Opt `sender` into every asset in `asset_ids`, 16 opt-ins per group."""
+    sp = await get_suggested_params(client)
+    operations = [
+        Operation([transaction.AssetOptInTxn(sender=sender.get_address(), sp=sp, index=asset_id)], sender)
+        for asset_id in asset_ids
+    ]
+    return await execute_operations(client, operations)
+
+
+async def generate_rekeyed_addresses(client: AsyncAlgodClient, funder: Account, app_id: int, optin_price: int,
+                                     count: int = 1) -> List[str]:
+    """Create `count` addresses rekeyed to `funder` and opted into `app_id`,
+    8 per group. See utils.generate_rekeyed_addresses."""
+    sp = await get_suggested_params(client)
+    addresses, operations = [], []
+    for _ in range(count):
+        address, operation = slot_operation(funder, app_id, optin_price, sp)
+        addresses.append(address)
+        operations.append(operation)
+    await execute_operations(client, operations)
+    return addresses
+
+
+async def create_slot(client: AsyncAlgodClient, owner: Account, app_id: int, optin_price: int,
+                      state: int = SLOT_FREE) -> str:
+    return (await create_slots(client, owner, app_id, optin_price, 1, state))[0]
+
+
+async def create_slots(client: AsyncAlgodClient, owner: Account, app_id: int, optin_price: int, count: int,
+                       state: int = SLOT_FREE) -> List[str]:
+    """Create and register `count` listing slots of `owner`. See utils.create_slots."""
+    registry = get_rekeyed_registry()
+    addresses = []
+    while len(addresses) < count:
+        batch = min(count - len(addresses), SLOTS_PER_GROUP)
+        for address in await generate_rekeyed_addresses(client, owner, app_id, optin_price, batch):
+            await asyncio.to_thread(registry.add, owner.get_address(), address, 1)
+            await asyncio.to_thread(registry.set_state, address, app_id, state)
+            addresses.append(address)
+    return addresses
+
+
+async def claim_slot(owner: Account, app_id: int) -> Optional[str]:
+    """Claim a free listing slot of `owner` for `app_id`.
+
+    Slots are made ready by the `slot_provisioner.SlotProvisioner` of a
+    sync client (see `utils.provision_slots`); None when none is ready.
+    """
+    return await asyncio.to_thread(get_rekeyed_registry().claim, owner.get_address(), app_id)
+
+
+async def charge_optin_price(client: AsyncAlgodClient, sender: Account, receiver: str, optin_price: int):
+    fund_account_txn = transaction.PaymentTxn(
+        sender=sender.get_address(),
+        receiver=receiver,
+        amt=optin_price,
+        sp=await get_suggested_params(client),
+    )
+    await send_and_wait(client, [fund_account_txn.sign(sender.get_private_key())])
+
+
+
+async def get_free_slot(client: AsyncAlgodClient, owner: Account, app_id: int, optin_price: int,
+                        token_key: bytes = b"TK_ID") -> Tuple[str, Dict[bytes, Any]]:
+    """Claim a listing slot of `owner` for `app_id` from the free-slot index. See utils.get_free_slot."""
+    address = await claim_slot(owner, app_id)
+    if address:
+        return address, {}
+
+    registry = get_rekeyed_registry()
+    while True:
+        addresses = await asyncio.to_thread(registry.unused, owner.get_address(), app_id, limit=SLOTS_PER_GROUP)
+        if not addresses:
+            break
+        for address in addresses:
+            # reserve the slot before looking it up, it stays in use if it holds a listing
+            if not await asyncio.to_thread(registry.index, address, app_id, SLOT_IN_USE):
+                continue
+            if not await is_opted_in_app(client, app_id, address):
+                # might have rekeyed address already but not optin app, we can use it
+                await execute_operations(client, [
+                    slot_optin_operation(owner, address, app_id, optin_price, await get_suggested_params(client))
+                ])
+                return address, {}
+            state = await get_app_local_state(client, app_id, address)
+            if not state.get(token_key):
+                return address, state
+
+    return await create_slot(client, owner, app_id, optin_price, state=SLOT_IN_USE), {}
+
+
+async def verify_slot(client: AsyncAlgodClient, address: str, app_id: int, token_key: bytes = b"TK_ID") -> int:
+    """Record the state of slot `address` in `app_id` read from the network. See utils.verify_slot."""
+    if not await is_opted_in_app(client, app_id, address):
+        state = SLOT_NEW
+    else:
+        state = SLOT_IN_USE if (await get_app_local_state(client, app_id, address)).get(token_key) else SLOT_FREE
+    await asyncio.to_thread(get_rekeyed_registry().mark, address, app_id, state)
+    return state
+
+
+async def release_slot(address: str, app_id: int) -> None:
+    """Record in the free-slot index that the listing of slot `address` in
+    `app_id` was closed by a confirmed operation. See utils.release_slot."""
+    await asyncio.to_thread(get_rekeyed_registry().mark, address, app_id, SLOT_FREE)
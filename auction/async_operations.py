@@ -0,0 +1,278 @@
+from typing import Tuple, List
+
+from algosdk import encoding
+from algosdk.future import transaction
+from algosdk.logic import get_application_address
+
+from account import Account
+from async_client import AsyncAlgodClient
+from async_utils import *
+from fee_estimator import estimate_fee
+from .contracts import approval_program, clear_state_program
+
+# min balance of a listing slot's local state in the app, plus its opt-in fee
+SLOT_OPTIN_PRICE = 100000 + 28500 * 8 + 50000 * 2 + 1000
+
+
+async def get_contracts(client: AsyncAlgodClient) -> Tuple[bytes, bytes]:
+    """Get the compiled TEAL contracts for the auction.
+
+    Args:
+        client: An async algod client that has the ability to compile TEAL programs.
+
+    Returns:
+        A tuple of 2 byte strings. The first is the approval program, and the
+        second is the clear state program.
+    """
+    approval = await fully_compile_contract(client, approval_program())
+    clear_state = await fully_compile_contract(client, clear_state_program())
+
+    return approval, clear_state
+
+
+async def create_auction_app(
+    client: AsyncAlgodClient,
+    creator: Account,
+    store_app_id: int,
+    staking_address: str,
+    team_wallet_address: str
+) -> int:
+    """Create a new auction. See operations.create_auction_app."""
+    approval, clear = await get_contracts(client)
+
+    global_schema = transaction.StateSchema(num_uints=1, num_byte_slices=2)
+    local_schema = transaction.StateSchema(num_uints=8, num_byte_slices=2)
+    sp = await get_suggested_params(client)
+
+    txn = transaction.ApplicationCreateTxn(
+        sender=creator.get_address(),
+        on_complete=transaction.OnComplete.NoOpOC,
+        approval_program=approval,
+        clear_program=clear,
+        global_schema=global_schema,
+        local_schema=local_schema,
+        foreign_apps=[store_app_id],
+        accounts=[staking_address, team_wallet_address],
+        sp=sp,
+    )
+    response = await send_and_wait(client, [txn.sign(creator.get_private_key())])
+    assert response.application_index is not None and response.application_index > 0
+
+    app_id = response.application_index
+    initial_funding_amount = (
+        # min account balance
+        100_000
+    )
+
+    initial_fund_app_txn = transaction.PaymentTxn(
+        sender=creator.get_address(),
+        receiver=get_application_address(appID=app_id),
+        amt=initial_funding_amount,
+        sp=sp,
+    )
+    await send_and_wait(client, [initial_fund_app_txn.sign(creator.get_private_key())])
+
+    return app_id
+
+
+async def setup_auction_app(
+    client: AsyncAlgodClient,
+    app_id: int,
+    seller: Account,
+    token_id: int,
+    token_amount: int,
+    start_time: int,
+    end_time: int,
+    reserve: int,
+    min_bid_increment: int
+) -> str:
+    """Create a new auction and return auction_index (rekeyed address).
+
+    See operations.setup_auction_app.
+    """
+    sp = await get_suggested_params(client)
+    app_config = await get_app_config(client, app_id)
+
+    # optin store app for saving information
+    store_app_id = app_config.store_app_id
+    if not await is_opted_in_app(client, store_app_id, seller.get_address()):
+        await optin_app(client, store_app_id, seller)
+
+    n_address = await get_usable_rekeyed_address(client=client, auther=seller, app_id=app_id)
+
+    funding_amount = (
+        # balance for the app to opt into asset
+        + 100_000
+        # optin asset min txn fee
+        + 1_000
+    )
+
+    app_address = get_application_address(app_id)
+    pay_txn = transaction.PaymentTxn(
+        sender=seller.get_address(),
+        receiver=app_address,
+        amt=funding_amount,
+        sp=sp,
+    )
+
+    app_args = [
+        b"setup",
+        start_time.to_bytes(8, "big"),
+        end_time.to_bytes(8, "big"),
+        reserve.to_bytes(8, "big"),
+        min_bid_increment.to_bytes(8, "big"),
+    ]
+
+    setup_txn = transaction.ApplicationCallTxn(
+        sender=seller.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=app_args,
+        foreign_assets=[token_id],
+        accounts=[n_address],
+        sp=sp,
+    )
+
+    fund_token_txn = transaction.AssetTransferTxn(
+        sender=seller.get_address(),
+        receiver=app_address,
+        index=token_id,
+        amt=token_amount,
+        sp=sp,
+    )
+
+    group = [pay_txn, setup_txn, fund_token_txn]
+    try:
+        fees = estimate_fee(approval_program, group, 1, local_state={n_address: {}})
+        # the app pays the asset opt in itself from the funding payment
+        await send_and_wait(client, GroupBuilder(group, seller, sp=sp, **fees.group_args(prefunded=True)).sign().signed_transactions)
+    except Exception:
+        # the slot was claimed for this auction, record what it holds
+        await verify_slot(client, n_address, app_id)
+        raise
+    return n_address
+
+
+async def get_usable_rekeyed_address(client: AsyncAlgodClient, auther: Account, app_id: int):
+    return (await get_free_slot(client, auther, app_id, SLOT_OPTIN_PRICE))[0]
+
+
+async def place_bid(client: AsyncAlgodClient,
+                    app_id: int,
+                    auction_index: str,
+                    bidder: Account,
+                    bid_amount: int) -> None:
+    """Place a bid on an active auction. See operations.place_bid."""
+    if not await is_opted_in_app(client, app_id, auction_index):
+        return False
+
+    app_local_state = await get_app_local_state(client, app_id, auction_index)
+    token_id = app_local_state[b"TK_ID"]
+    if token_id == 0: # invalid auction_index
+        return False
+
+    if any(app_local_state[b"LB_ADDR"]):
+        # if "bid_account" is not the zero address
+        prev_bid_leader = encoding.encode_address(app_local_state[b"LB_ADDR"])
+    else:
+        prev_bid_leader = None
+
+    suggested_params = await get_suggested_params(client)
+
+    app_address = get_application_address(app_id)
+    pay_txn = transaction.PaymentTxn(
+        sender=bidder.get_address(),
+        receiver=app_address,
+        amt=bid_amount,
+        sp=suggested_params,
+    )
+
+    app_call_txn = transaction.ApplicationCallTxn(
+        sender=bidder.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"bid"],
+        foreign_assets=[token_id],
+        # must include the previous lead bidder here to the app can refund that bidder's payment
+        accounts=[auction_index, prev_bid_leader] if prev_bid_leader is not None else [auction_index],
+        sp=suggested_params,
+    )
+
+    group = [pay_txn, app_call_txn]
+    # a bid the contract rejects raises here, before anything is sent
+    holdings = await get_holdings(client, app_address)
+    fees = estimate_fee(approval_program, group, 1, local_state={auction_index: app_local_state}, holdings=holdings)
+    # a bid or close already in the pool changes the lead this bid refunds
+    await get_pending_pool(client).check(app_id, auction_index)
+
+    store_app_id = (await get_app_config(client, app_id)).store_app_id
+    if not await is_opted_in_app(client, store_app_id, bidder.get_address()):
+        await optin_app(client, store_app_id, bidder)
+
+    if not await is_opted_in_asset(client, token_id, bidder.get_address()):
+        await optin_asset(client, token_id, bidder)
+
+    # the refund to the previous leader is paid from the fees held back from the bid
+    await send_and_wait(client, GroupBuilder(group, bidder, sp=suggested_params, **fees.group_args(prefunded=True)).sign().signed_transactions)
+
+
+async def close_auction(client: AsyncAlgodClient,
+                        app_id: int,
+                        auction_index: str,
+                        closer: Account):
+    """Close an auction. See operations.close_auction."""
+    app_config = await get_app_config(client, app_id)
+    sp = await get_suggested_params(client)
+
+    if not await is_opted_in_app(client, app_id, auction_index):
+        return False
+
+    accounts: List[str] = [auction_index]
+    token_id = 0
+    lead_bidder = None
+
+    auction_index_local_state = await get_app_local_state(client, app_id, auction_index)
+    if auction_index_local_state[b"TK_ID"] > 0:
+        token_id = auction_index_local_state[b"TK_ID"]
+
+    if any(auction_index_local_state[b"LB_ADDR"]):
+        lead_bidder = encoding.encode_address(auction_index_local_state[b"LB_ADDR"])
+
+    if token_id == 0:
+        return False
+
+    if lead_bidder != None:
+        accounts.append(lead_bidder)
+        accounts.append(app_config.staking_address)
+        accounts.append(app_config.team_wallet_address)
+
+    close_txn = transaction.ApplicationCallTxn(
+        sender=closer.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"close"],
+        accounts=accounts,
+        foreign_assets=[token_id],
+        sp=sp,
+    )
+
+    if len(accounts) == 4:
+        store_app_call_txn = transaction.ApplicationCallTxn(
+            sender=closer.get_address(),
+            index=app_config.store_app_id,
+            on_complete=transaction.OnComplete.NoOpOC,
+            app_args=[b"auction"],
+            accounts=[lead_bidder, auction_index],
+            foreign_apps=[app_id],
+            sp=sp,
+        )
+
+        group = [close_txn, store_app_call_txn]
+    else:
+        group = [close_txn]
+
+    fees = estimate_fee(approval_program, group, 0, local_state={auction_index: auction_index_local_state})
+    # the payouts to a lead bidder are paid from the fees held back from the bid
+    await send_and_wait(client, GroupBuilder(group, closer, sp=sp, **fees.group_args(prefunded=lead_bidder is not None)).sign().signed_transactions)
+    # the contract keeps the closed auction's local state, the slot is free again
+    await release_slot(auction_index, app_id)
@@ -1,4 +1,5 @@
 import os
+import time
 
 from typing import Tuple, List
 
@@ -13,6 +14,9 @@ from account import Account
 from utils import *
 from .contracts import approval_program, clear_state_program
 
+# min balance of a listing slot's local state in the app, plus its opt-in fee
+SLOT_OPTIN_PRICE = 100000 + 28500 * 8 + 50000 * 2 + 1000
+
 
 def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
     """Get the compiled TEAL contracts for the auction.
@@ -53,7 +57,7 @@ def create_auction_app(
 
     global_schema = transaction.StateSchema(num_uints=1, num_byte_slices=2)
     local_schema = transaction.StateSchema(num_uints=8, num_byte_slices=2)
-    sp = client.suggested_params()
+    sp = get_suggested_params(client)
     
     txn = transaction.ApplicationCreateTxn(
         sender=creator.get_address(),
@@ -124,11 +128,11 @@ def setup_auction_app(
         Auction index.
     """
     app_address = get_application_address(app_id)
-    sp = client.suggested_params()
-    app_global_state = get_app_global_state(client, app_id)
+    sp = get_suggested_params(client)
+    app_config = get_app_config(client, app_id)
     
     # optin store app for saving information    
-    store_app_id = app_global_state[b"SA_ID"]
+    store_app_id = app_config.store_app_id
     print(f"store_app_id", store_app_id)
     if is_opted_in_app(client, store_app_id, seller.get_address()) == False:
         print(f"seller {seller.get_address()} opt in app {store_app_id}")
@@ -177,45 +181,22 @@ def setup_auction_app(
         sp=sp,
     )
     
-    transaction.assign_group_id([pay_txn, setup_txn, fund_token_txn])
-    
-    signed_pay_txn = pay_txn.sign(seller.get_private_key())
-    signed_setup_txn = setup_txn.sign(seller.get_private_key())
-    signed_fund_token_txn = fund_token_txn.sign(seller.get_private_key())
-    
-    client.send_transactions([signed_pay_txn, signed_setup_txn, signed_fund_token_txn])
-    
-    wait_for_confirmation(client, signed_setup_txn.get_txid())
+    group = [pay_txn, setup_txn, fund_token_txn]
+    try:
+        fees = estimate_fee(approval_program, group, 1, local_state={n_address: {}})
+        # the app pays the asset opt in itself from the funding payment
+        GroupBuilder(group, seller, sp=sp, **fees.group_args(prefunded=True)).execute(client)
+    except Exception:
+        # the slot was claimed for this auction, record what it holds
+        verify_slot(client, n_address, app_id)
+        raise
     return n_address
 
     
 def get_usable_rekeyed_address(client: AlgodClient, auther: Account, app_id: int):
-    n_address = ""
-    rekeyed_addresses = get_rekeyed_addresses(auther.get_address()) # we can get this from network
-    for rekeyed_address in rekeyed_addresses:
-        if is_opted_in_app(client, app_id, rekeyed_address):
-            state = get_app_local_state(client, app_id, rekeyed_address)
-            print(f"local state of {rekeyed_address} :", state)
-            if b"TK_ID" in state and state[b"TK_ID"] == 0:
-                n_address = rekeyed_address
-        else:
-            # might have rekeyed address already but not optin app, we can use it
-            n_address = rekeyed_address
-            additional_balance = 100000 + 28500 * 8 + 50000 * 2 + 1000
-            charge_optin_price(client, auther, n_address, additional_balance)
-            optin_app_rekeyed_address(client, app_id, auther, n_address)
-            break
-    
-    # if not found, create one, and optin app for local state
-    if not n_address:
-        optin_price = 100000 + 28500 * 8 + 50000 * 2 + 1000
-        n_address = generate_rekeyed_address(client, auther, app_id, optin_price)
-        optin_app_rekeyed_address(client, app_id, auther, n_address)
-        set_rekeyed_address(auther.get_address(), n_address, 1)
-        
-    return n_address
+    return get_free_slot(client, auther, app_id, SLOT_OPTIN_PRICE)[0]
+
 
-    
 def place_bid(client: AlgodClient, 
               app_id: int, 
               auction_index: str,
@@ -229,59 +210,76 @@ def place_bid(client: AlgodClient,
         auction_index: seller's rekeyed address.
         bidder: The account providing the bid.
         bid_amount: The amount of the bid.
+
+    Raises:
+        PendingConflict: A call on the same auction is waiting in the pool.
+        Exception: The contract would reject the bid in the current state.
     """
     
     if (is_opted_in_app(client, app_id, auction_index) == False): 
         return False
     
-    app_global_state = get_app_global_state(client, app_id)
-    store_app_id = app_global_state[b"SA_ID"]
-    if (is_opted_in_app(client, store_app_id, bidder.get_address()) == False):
-        optin_app(client, store_app_id, bidder)
-    
     app_local_state = get_app_local_state(client, app_id, auction_index)
     token_id = app_local_state[b"TK_ID"]
     if token_id == 0: # invalid auction_index
         return False
+
+    # a bid the contract rejects raises here, before anything is sent
+    suggested_params = get_suggested_params(client)
+    holdings = get_holdings(client, get_application_address(app_id))
+    builder = _bid_group(app_id, auction_index, bidder, bid_amount, app_local_state, suggested_params, holdings=holdings)
+    # a bid or close already in the pool changes the lead this bid refunds
+    get_pending_pool(client).check(app_id, auction_index)
+
+    store_app_id = get_app_config(client, app_id).store_app_id
+    if (is_opted_in_app(client, store_app_id, bidder.get_address()) == False):
+        optin_app(client, store_app_id, bidder)
     
     if (is_opted_in_asset(client, token_id, bidder.get_address()) == False):
         optin_asset(client, token_id, bidder)
 
-    if any(app_local_state[b"LB_ADDR"]):
-        # if "bid_account" is not the zero address
-        prev_bid_leader = encoding.encode_address(app_local_state[b"LB_ADDR"])
-    else:
-        prev_bid_leader = None
+    builder.execute(client)
+    
 
-    suggested_params = client.suggested_params()
+def presign_bid(client: AlgodClient,
+                app_id: int,
+                auction_index: str,
+                bidder: Account,
+                bid_amount: int,
+                window: int = MAX_VALIDITY) -> PresignedGroup:
+    """Build and sign a bid ahead of time, for a bidding war.
 
-    app_address = get_application_address(app_id)
-    pay_txn = transaction.PaymentTxn(
-        sender=bidder.get_address(),
-        receiver=app_address,
-        amt=bid_amount,
-        sp=suggested_params,
-    )
-    
-    print('prev_bid_leader', prev_bid_leader)
-    app_call_txn = transaction.ApplicationCallTxn(
-        sender=bidder.get_address(),
-        index=app_id,
-        on_complete=transaction.OnComplete.NoOpOC,
-        app_args=[b"bid"],
-        foreign_assets=[token_id],
-        # must include the previous lead bidder here to the app can refund that bidder's payment
-        accounts=[auction_index, prev_bid_leader] if prev_bid_leader is not None else [auction_index],
-        sp=suggested_params,
-    )
-    
-    transaction.assign_group_id([pay_txn, app_call_txn])
-    signed_pay_txn = pay_txn.sign(bidder.get_private_key())
-    signed_app_call_txn = app_call_txn.sign(bidder.get_private_key())
-    client.send_transactions([signed_pay_txn, signed_app_call_txn])
+    The opt-ins `place_bid` may need are made now. The bid group is signed
+    over a `window` of rounds with a lease on its payment and kept valid in
+    the background, so `send()` on the returned template places the bid
+    with a single request. The group names the lead bidder it outbids, so
+    call `refresh()` on the template when the lead changes.
+
+    Args:
+        client: An Algod client.
+        app_id: The app ID of the auction.
+        auction_index: seller's rekeyed address.
+        bidder: The account providing the bid.
+        bid_amount: The amount of the bid.
+        window: Rounds each signed copy stays valid for.
+    """
+    store_app_id = get_app_config(client, app_id).store_app_id
+    if (is_opted_in_app(client, store_app_id, bidder.get_address()) == False):
+        optin_app(client, store_app_id, bidder)
+
+    token_id = get_app_local_state(client, app_id, auction_index)[b"TK_ID"]
+    if token_id == 0: # invalid auction_index
+        raise Exception(f"{auction_index} holds no auction")
+    if (is_opted_in_asset(client, token_id, bidder.get_address()) == False):
+        optin_asset(client, token_id, bidder)
+
+    def build(sp: transaction.SuggestedParams, lease: bytes) -> list:
+        app_local_state = get_app_local_state(client, app_id, auction_index)
+        builder = _bid_group(app_id, auction_index, bidder, bid_amount, app_local_state, sp, lease)
+        return builder.sign().signed_transactions
+
+    return PresignedGroup(client, build, window=window)
 
-    wait_for_confirmation(client, app_call_txn.get_txid())
-    
 
 def close_auction(client: AlgodClient, 
                   app_id: int, 
@@ -304,9 +302,9 @@ def close_auction(client: AlgodClient,
         closer: The account initiating the close transaction. This must be
             either the seller or creator.
     """
-    app_global_state = get_app_global_state(client, app_id)
-    print("app_global_state", app_global_state)
-    sp=client.suggested_params()
+    app_config = get_app_config(client, app_id)
+    print("app_config", app_config)
+    sp=get_suggested_params(client)
     
     if (is_opted_in_app(client, app_id, auction_index) == False): 
         return False
@@ -327,11 +325,10 @@ def close_auction(client: AlgodClient,
     
     if lead_bidder != None:
         accounts.append(lead_bidder)
-        accounts.append(encoding.encode_address(app_global_state[b"SA_ADDR"])) 
-        accounts.append(encoding.encode_address(app_global_state[b"TW_ADDR"]))
+        accounts.append(app_config.staking_address) 
+        accounts.append(app_config.team_wallet_address)
     print(accounts)
     
-    sp.fee = 2 * 1_000 # include inner txn
     close_txn = transaction.ApplicationCallTxn(
         sender=closer.get_address(),
         index=app_id,
@@ -343,8 +340,7 @@ def close_auction(client: AlgodClient,
     )
     
     if len(accounts) == 4:
-        store_app_id = app_global_state[b"SA_ID"]
-        sp.fee = 1_000
+        store_app_id = app_config.store_app_id
         store_app_call_txn = transaction.ApplicationCallTxn(
             sender=closer.get_address(),
             index=store_app_id,
@@ -355,16 +351,64 @@ def close_auction(client: AlgodClient,
             sp=sp,
         )
         
-        transaction.assign_group_id([close_txn, store_app_call_txn])
-        signed_close_txn = close_txn.sign(closer.get_private_key())
-        signed_store_app_call_txn = store_app_call_txn.sign(closer.get_private_key())
-        client.send_transactions([signed_close_txn, signed_store_app_call_txn])
-        
-        wait_for_confirmation(client, signed_close_txn.get_txid())
-        
+        group = [close_txn, store_app_call_txn]
     else:
-        signed_close_txn = close_txn.sign(closer.get_private_key())
-        client.send_transaction(signed_close_txn)
-        
-        wait_for_confirmation(client, signed_close_txn.get_txid())
+        group = [close_txn]
+    
+    fees = estimate_fee(approval_program, group, 0, local_state={auction_index: auction_index_local_state})
+    # the payouts to a lead bidder are paid from the fees held back from the bid
+    GroupBuilder(group, closer, sp=sp, **fees.group_args(prefunded=lead_bidder is not None)).execute(client)
+    # the contract keeps the closed auction's local state, the slot is free again
+    release_slot(auction_index, app_id)
+
+
+def is_auction_idle(client: AlgodClient, app_id: int, local_state: dict) -> bool:
+    """Whether the auction in a slot's `local_state` is over, for
+    `reclaim_slots`.
+
+    Closing an auction leaves its local state in place, so its token key
+    stays set. It is over once it has ended and the app no longer holds
+    its token, which `close_auction` paid out.
+    """
+    token_id = local_state.get(b"TK_ID")
+    if not token_id:
+        return True
+    if local_state.get(b"ET", 0) > time.time():
+        return False
+    return not get_balances(client, get_application_address(app_id)).get(token_id)
+
+
+def _bid_group(app_id: int, auction_index: str, bidder: Account, bid_amount: int,
+               app_local_state: dict, sp: transaction.SuggestedParams, lease: bytes = None,
+               holdings: dict = None) -> GroupBuilder:
+    if any(app_local_state[b"LB_ADDR"]):
+        # if "bid_account" is not the zero address
+        prev_bid_leader = encoding.encode_address(app_local_state[b"LB_ADDR"])
+    else:
+        prev_bid_leader = None
 
+    app_address = get_application_address(app_id)
+    pay_txn = transaction.PaymentTxn(
+        sender=bidder.get_address(),
+        receiver=app_address,
+        amt=bid_amount,
+        sp=sp,
+        lease=lease,
+    )
+    
+    print('prev_bid_leader', prev_bid_leader)
+    app_call_txn = transaction.ApplicationCallTxn(
+        sender=bidder.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"bid"],
+        foreign_assets=[app_local_state[b"TK_ID"]],
+        # must include the previous lead bidder here to the app can refund that bidder's payment
+        accounts=[auction_index, prev_bid_leader] if prev_bid_leader is not None else [auction_index],
+        sp=sp,
+    )
+    
+    group = [pay_txn, app_call_txn]
+    fees = estimate_fee(approval_program, group, 1, local_state={auction_index: app_local_state}, holdings=holdings)
+    # the refund to the previous leader is paid from the fees held back from the bid
+    return GroupBuilder(group, bidder, sp=sp, **fees.group_args(prefunded=True))
@@ -0,0 +1,266 @@
+from typing import Tuple, List
+
+from algosdk.future import transaction
+from algosdk.logic import get_application_address
+
+from account import Account
+from async_client import AsyncAlgodClient
+from async_utils import *
+from fee_estimator import estimate_fee
+from .contracts import approval_program, clear_state_program
+
+# min balance of a listing slot's local state in the app, plus its opt-in fee
+SLOT_OPTIN_PRICE = 100000 + 28500 * 3 + 50000 * 1 + 1000
+
+
+async def get_contracts(client: AsyncAlgodClient) -> Tuple[bytes, bytes]:
+    """Get the compiled TEAL contracts for the bidding.
+
+    Args:
+        client: An async algod client that has the ability to compile TEAL programs.
+
+    Returns:
+        A tuple of 2 byte strings. The first is the approval program, and the
+        second is the clear state program.
+    """
+    approval = await fully_compile_contract(client, approval_program())
+    clear_state = await fully_compile_contract(client, clear_state_program())
+
+    return approval, clear_state
+
+
+async def create_bidding_app(
+    client: AsyncAlgodClient,
+    creator: Account,
+    store_app_id: int,
+    staking_address: str,
+    team_wallet_address: str
+) -> int:
+    """Create a new bidding. See operations.create_bidding_app."""
+    approval, clear = await get_contracts(client)
+
+    global_schema = transaction.StateSchema(num_uints=1, num_byte_slices=2)
+    local_schema = transaction.StateSchema(num_uints=3, num_byte_slices=1)
+
+    sp = await get_suggested_params(client)
+
+    txn = transaction.ApplicationCreateTxn(
+        sender=creator.get_address(),
+        on_complete=transaction.OnComplete.NoOpOC,
+        approval_program=approval,
+        clear_program=clear,
+        global_schema=global_schema,
+        local_schema=local_schema,
+        app_args=[],
+        foreign_apps=[store_app_id],
+        accounts=[staking_address, team_wallet_address],
+        sp=sp,
+    )
+    response = await send_and_wait(client, [txn.sign(creator.get_private_key())])
+    assert response.application_index is not None and response.application_index > 0
+
+    app_id = response.application_index
+    initial_funding_amount = (
+        # min account balance
+        100_000
+    )
+
+    initial_fund_app_txn = transaction.PaymentTxn(
+        sender=creator.get_address(),
+        receiver=get_application_address(appID=app_id),
+        amt=initial_funding_amount,
+        sp=sp,
+    )
+    await send_and_wait(client, [initial_fund_app_txn.sign(creator.get_private_key())])
+
+    return app_id
+
+
+async def setup_bidding_app(
+    client: AsyncAlgodClient,
+    app_id: int,
+    funder: Account,
+    token_id: int,
+) -> None:
+    """Finish setting up an bidding. See operations.setup_bidding_app."""
+    app_address = get_application_address(app_id)
+    params = await get_suggested_params(client)
+
+    funding_amount = (
+        # opt into asset min balance
+        + 100_000
+    )
+    pay_txn = transaction.PaymentTxn(
+        sender=funder.get_address(),
+        receiver=app_address,
+        amt=funding_amount,
+        sp=params,
+    )
+
+    setup_txn = transaction.ApplicationCallTxn(
+        sender=funder.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"setup"],
+        foreign_assets=[token_id],
+        sp=params,
+    )
+
+    group = [pay_txn, setup_txn]
+    fees = estimate_fee(approval_program, group, 1)
+    await send_and_wait(client, GroupBuilder(group, funder, sp=params, **fees.group_args()).sign().signed_transactions)
+
+
+async def place_bid(client: AsyncAlgodClient, app_id: int, bidder: Account, token_id: int, bid_amount: int, bid_price: int, bid_index: str) -> str:
+    """Place or replace a bid on an active bidding. See operations.place_bid."""
+    app_address = get_application_address(app_id)
+    suggested_params = await get_suggested_params(client)
+
+    # optin asset for receiving the asset
+    if not await is_opted_in_asset(client, token_id, bidder.get_address()):
+        await optin_asset(client, token_id, bidder)
+
+    # optin store app for saving information
+    app_config = await get_app_config(client, app_id)
+    store_app_id = app_config.store_app_id
+    if not await is_opted_in_app(client, store_app_id, bidder.get_address()):
+        await optin_app(client, store_app_id, bidder)
+
+    tokens = [token_id]
+    n_address = bid_index
+    # if bid_index is empty, claim a free slot (its token id is 0) from the free-slot index
+    if not n_address:
+        n_address, _ = await get_free_slot(client, bidder, app_id, SLOT_OPTIN_PRICE)
+    else:
+        state = await get_app_local_state(client, app_id, bid_index)
+        if b"TK_ID" in state and state[b"TK_ID"] > 0:
+            tokens.append(state[b"TK_ID"])
+
+    pay_txn = transaction.PaymentTxn(
+        sender=bidder.get_address(),
+        receiver=app_address,
+        amt=bid_price + 4000, #4000 is for inner txns(1_000 is for asset txn, 3_000 is for split payment txn, this can be used as txn fee when canceling)
+        sp=suggested_params,
+    )
+
+    app_call_txn = transaction.ApplicationCallTxn(
+        sender=bidder.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"bid", bid_amount.to_bytes(8, "big")],
+        foreign_assets=tokens,
+        accounts=[n_address],
+        sp=suggested_params,
+    )
+
+    group = [pay_txn, app_call_txn]
+    try:
+        fees = estimate_fee(approval_program, group, 1)
+        # the bid payment carries the fees of the inner transactions
+        await send_and_wait(client, GroupBuilder(group, bidder, sp=suggested_params, **fees.group_args(prefunded=True)).sign().signed_transactions)
+    except Exception:
+        if not bid_index:
+            # the slot was claimed for this listing, record what it holds
+            await verify_slot(client, n_address, app_id)
+        raise
+    return n_address
+
+
+async def cancel_bid(client: AsyncAlgodClient, app_id: int, bidder: Account, bid_index: str) -> None:
+    """Cancel a bid on an active bidding. See operations.cancel_bid."""
+    if not await is_opted_in_app(client, app_id, bid_index):
+        return False
+
+    sp = await get_suggested_params(client)
+    app_call_txn = transaction.ApplicationCallTxn(
+        sender=bidder.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"cancel"],
+        accounts=[bid_index],
+        sp=sp,
+    )
+    fees = estimate_fee(approval_program, [app_call_txn], 0)
+    await send_and_wait(client, GroupBuilder([app_call_txn], bidder, sp=sp, **fees.group_args()).sign().signed_transactions)
+    # the contract cleared the listing, the slot is free again
+    await release_slot(bid_index, app_id)
+
+
+async def accept_bid(client: AsyncAlgodClient, app_id: int, seller: Account, bidder: str, bid_index: str) -> None:
+    """Accept on an active bidding. See operations.accept_bid."""
+    app_address = get_application_address(app_id)
+    sp = await get_suggested_params(client)
+    app_config = await get_app_config(client, app_id)
+
+    if not await is_opted_in_app(client, app_id, bid_index):
+        return False
+
+    app_bidder_local_state = await get_app_local_state(client, app_id, bid_index)
+    token_id = app_bidder_local_state[b"TK_ID"]
+    token_amount = app_bidder_local_state[b"TA"]
+    bid_price = app_bidder_local_state[b"TP"]
+    if (await get_balances(client, seller.get_address()))[token_id] < token_amount:
+        return False
+
+    # app optin asset for receiving the asset
+    if not await is_opted_in_asset(client, token_id, app_address):
+        await setup_bidding_app(client=client, app_id=app_id, funder=seller, token_id=token_id)
+
+    store_app_id = app_config.store_app_id
+    if not await is_opted_in_app(client, store_app_id, seller.get_address()):
+        await optin_app(client, store_app_id, seller)
+
+    asset_txn = transaction.AssetTransferTxn(
+        sender=seller.get_address(),
+        receiver=app_address,
+        index=token_id,
+        amt=token_amount,
+        sp=sp,
+    )
+
+    app_call_txn = transaction.ApplicationCallTxn(
+        sender=seller.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"accept", bid_price.to_bytes(8, "big")],
+        foreign_assets=[token_id],
+        # must include the bidder here to the app can refund that bidder's payment
+        accounts=[bidder,
+                  bid_index,
+                  app_config.staking_address,
+                  app_config.team_wallet_address],
+        sp=sp,
+    )
+
+    store_app_call_txn = transaction.ApplicationCallTxn(
+        sender=seller.get_address(),
+        sp=sp,
+        index=store_app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"sell"],
+        accounts=[bidder]
+    )
+
+    group = [asset_txn, app_call_txn, store_app_call_txn]
+    fees = estimate_fee(approval_program, group, 1, local_state={bid_index: app_bidder_local_state})
+    # the bid payment carries the fees of the inner transactions
+    await send_and_wait(client, GroupBuilder(group, seller, sp=sp, **fees.group_args(prefunded=True)).sign().signed_transactions)
+    # the contract cleared the listing, the slot is free again
+    await release_slot(bid_index, app_id)
+
+
+async def close_bidding(client: AsyncAlgodClient, app_id: int, closer: Account, assets: List[int]):
+    """Close an bidding. See operations.close_bidding."""
+    app_config = await get_app_config(client, app_id)
+
+    accounts: List[str] = [app_config.staking_address,
+                           app_config.team_wallet_address]
+
+    delete_txn = transaction.ApplicationDeleteTxn(
+        sender=closer.get_address(),
+        index=app_id,
+        accounts=accounts,
+        foreign_assets=assets,
+        sp=await get_suggested_params(client),
+    )
+    await send_and_wait(client, [delete_txn.sign(closer.get_private_key())])
@@ -13,6 +13,9 @@ from account import Account
 from utils import *
 from .contracts import approval_program, clear_state_program
 
+# min balance of a listing slot's local state in the app, plus its opt-in fee
+SLOT_OPTIN_PRICE = 100000 + 28500 * 3 + 50000 * 1 + 1000
+
 
 def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
     """Get the compiled TEAL contracts for the bidding.
@@ -56,7 +59,7 @@ def create_bidding_app(
         # encoding.decode_address(staking_address.get_address()),
         # encoding.decode_address(team_wallet_address.get_address()),
     ]
-    sp = client.suggested_params()
+    sp = get_suggested_params(client)
     
     txn = transaction.ApplicationCreateTxn(
         sender=creator.get_address(),
@@ -116,7 +119,7 @@ def setup_bidding_app(
         token_id: The asset ID.
     """
     app_address = get_application_address(app_id)
-    params = client.suggested_params()
+    params = get_suggested_params(client)
     
     funding_amount = (
         # opt into asset min balance
@@ -129,7 +132,6 @@ def setup_bidding_app(
         sp=params,
     )
 
-    params.fee = 2000 # min inapp txn fee for opt into asset + app call txn fee
     setup_txn = transaction.ApplicationCallTxn(
         sender=funder.get_address(),
         index=app_id,
@@ -139,13 +141,9 @@ def setup_bidding_app(
         sp=params,
     )
 
-    transaction.assign_group_id([pay_txn, setup_txn])
-    
-    signed_pay_txn = pay_txn.sign(funder.get_private_key())
-    signed_setup_txn = setup_txn.sign(funder.get_private_key())
-    
-    client.send_transactions([signed_pay_txn, signed_setup_txn])
-    wait_for_confirmation(client, signed_setup_txn.get_txid())
+    group = [pay_txn, setup_txn]
+    fees = estimate_fee(approval_program, group, 1)
+    GroupBuilder(group, funder, sp=params, **fees.group_args()).execute(client)
     
     
 def place_bid(client: AlgodClient, app_id: int, bidder: Account, token_id: int, bid_amount: int, bid_price: int, bid_index: str) -> str: 
@@ -161,7 +159,7 @@ def place_bid(client: AlgodClient, app_id: int, bidder: Account, token_id: int,
         bid_index: rekeyed address for replace bid
     """
     app_address = get_application_address(app_id)
-    suggested_params = client.suggested_params()
+    suggested_params = get_suggested_params(client)
     
     # optin asset for receiving the asset
     if is_opted_in_asset(client, token_id, bidder.get_address()) == False:
@@ -169,8 +167,8 @@ def place_bid(client: AlgodClient, app_id: int, bidder: Account, token_id: int,
         optin_asset(client, token_id, bidder)
     
     # optin store app for saving information
-    app_global_state = get_app_global_state(client, app_id)
-    store_app_id = app_global_state[b"SA_ID"]
+    app_config = get_app_config(client, app_id)
+    store_app_id = app_config.store_app_id
     print(f"store_app_id", store_app_id)
     if is_opted_in_app(client, store_app_id, bidder.get_address()) == False:
         print(f"bidder {bidder.get_address()} opt in app {store_app_id}")
@@ -178,31 +176,9 @@ def place_bid(client: AlgodClient, app_id: int, bidder: Account, token_id: int,
     
     tokens = [token_id]
     n_address = bid_index
-    # if bid_index is empty, find a usable(if the bid app local state's token id is 0) rekeyed address used in the past, 
+    # if bid_index is empty, claim a free slot (its token id is 0) from the free-slot index
     if not n_address:
-        unused_rekeyed_address = ""
-        rekeyed_addresses = get_rekeyed_addresses(bidder.get_address()) # we will get this from network
-        for rekeyed_address in rekeyed_addresses:
-            if is_opted_in_app(client, app_id, rekeyed_address):
-                state = get_app_local_state(client, app_id, rekeyed_address)
-                print(f"local state of {rekeyed_address} :", state)
-                if b"TK_ID" in state and state[b"TK_ID"] == 0:
-                    unused_rekeyed_address = rekeyed_address
-            else:
-                # might have rekeyed address already but not optin app, we can use it
-                unused_rekeyed_address = rekeyed_address
-                optin_price = 100000 + 28500 * 3 + 50000 * 1 + 1000
-                charge_optin_price(client, bidder, unused_rekeyed_address, optin_price)
-                optin_app_rekeyed_address(client, app_id, bidder, unused_rekeyed_address)
-                break
-        
-        # if not found, create one, and optin app for local state
-        n_address = unused_rekeyed_address
-        if not n_address:
-            optin_price = 100000 + 28500 * 3 + 50000 * 1 + 1000
-            n_address = generate_rekeyed_address(client, bidder, app_id, optin_price)
-            optin_app_rekeyed_address(client, app_id, bidder, n_address)
-            set_rekeyed_address(bidder.get_address(), n_address, 1)
+        n_address, _ = get_free_slot(client, bidder, app_id, SLOT_OPTIN_PRICE)
     else:
         state = get_app_local_state(client, app_id, bid_index)
         if b"TK_ID" in state and state[b"TK_ID"] > 0:
@@ -230,14 +206,16 @@ def place_bid(client: AlgodClient, app_id: int, bidder: Account, token_id: int,
     print(f"foreign_assets", tokens)
     print(f"accounts", [n_address])
     
-    transaction.assign_group_id([pay_txn, app_call_txn])
-    
-    signed_pay_txn = pay_txn.sign(bidder.get_private_key())
-    signed_app_call_txn = app_call_txn.sign(bidder.get_private_key())
-
-    client.send_transactions([signed_pay_txn, signed_app_call_txn])
-
-    wait_for_confirmation(client, app_call_txn.get_txid())
+    group = [pay_txn, app_call_txn]
+    try:
+        fees = estimate_fee(approval_program, group, 1)
+        # the bid payment carries the fees of the inner transactions
+        GroupBuilder(group, bidder, sp=suggested_params, **fees.group_args(prefunded=True)).execute(client)
+    except Exception:
+        if not bid_index:
+            # the slot was claimed for this listing, record what it holds
+            verify_slot(client, n_address, app_id)
+        raise
     return n_address
     
     
@@ -252,8 +230,7 @@ def cancel_bid(client: AlgodClient, app_id: int, bidder: Account, bid_index: str
     if (is_opted_in_app(client, app_id, bid_index) == False): 
         return False
     
-    sp = client.suggested_params()
-    sp.fee = 2 * 1_000
+    sp = get_suggested_params(client)
     app_call_txn = transaction.ApplicationCallTxn(
         sender=bidder.get_address(),
         index=app_id,
@@ -263,9 +240,10 @@ def cancel_bid(client: AlgodClient, app_id: int, bidder: Account, bid_index: str
         sp=sp,
     )
 
-    signed_app_call_txn = app_call_txn.sign(bidder.get_private_key())
-    client.send_transaction(signed_app_call_txn)
-    wait_for_confirmation(client, app_call_txn.get_txid())    
+    fees = estimate_fee(approval_program, [app_call_txn], 0)
+    GroupBuilder([app_call_txn], bidder, sp=sp, **fees.group_args()).execute(client)
+    # the contract cleared the listing, the slot is free again
+    release_slot(bid_index, app_id)
     
     # #do we need this store app opt out? cause the bidder might wants to bid again later ?
     # app_global_state = get_app_global_state(client, app_id)
@@ -287,8 +265,8 @@ def accept_bid(client: AlgodClient, app_id: int, seller: Account, bidder: str, b
         bidder: The account address offerring the bid.
     """
     app_address = get_application_address(app_id)
-    sp = client.suggested_params()
-    app_global_state = get_app_global_state(client, app_id)
+    sp = get_suggested_params(client)
+    app_config = get_app_config(client, app_id)
     
     if (is_opted_in_app(client, app_id, bid_index) == False): 
         return False
@@ -306,7 +284,7 @@ def accept_bid(client: AlgodClient, app_id: int, seller: Account, bidder: str, b
     if is_opted_in_asset(client, token_id, app_address) == False:
         setup_bidding_app(client=client, app_id=app_id, funder=seller, token_id=token_id)
     
-    store_app_id = app_global_state[b"SA_ID"]
+    store_app_id = app_config.store_app_id
     if is_opted_in_app(client, store_app_id, seller.get_address()) == False:
         optin_app(client, store_app_id, seller)
     
@@ -327,8 +305,8 @@ def accept_bid(client: AlgodClient, app_id: int, seller: Account, bidder: str, b
         # must include the bidder here to the app can refund that bidder's payment
         accounts=[bidder, 
                   bid_index, 
-                  encoding.encode_address(app_global_state[b"SA_ADDR"]), 
-                  encoding.encode_address(app_global_state[b"TW_ADDR"])],
+                  app_config.staking_address, 
+                  app_config.team_wallet_address],
         sp=sp,
     )
     
@@ -341,14 +319,12 @@ def accept_bid(client: AlgodClient, app_id: int, seller: Account, bidder: str, b
         accounts=[bidder]
     )
     
-    transaction.assign_group_id([asset_txn, app_call_txn, store_app_call_txn])
-    
-    signed_asset_txn = asset_txn.sign(seller.get_private_key())
-    signed_app_call_txn = app_call_txn.sign(seller.get_private_key())
-    signed_store_app_call_txn = store_app_call_txn.sign(seller.get_private_key())
-    
-    client.send_transactions([signed_asset_txn, signed_app_call_txn, signed_store_app_call_txn])
-    wait_for_confirmation(client, app_call_txn.get_txid())
+    group = [asset_txn, app_call_txn, store_app_call_txn]
+    fees = estimate_fee(approval_program, group, 1, local_state={bid_index: app_bidder_local_state})
+    # the bid payment carries the fees of the inner transactions
+    GroupBuilder(group, seller, sp=sp, **fees.group_args(prefunded=True)).execute(client)
+    # the contract cleared the listing, the slot is free again
+    release_slot(bid_index, app_id)
 
 
 def close_bidding(client: AlgodClient, app_id: int, closer: Account, assets: List[int]):
@@ -368,12 +344,12 @@ def close_bidding(client: AlgodClient, app_id: int, closer: Account, assets: Lis
         closer: The account initiating the close transaction. This must be
             the bidding creator.
     """
-    app_global_state = get_app_global_state(client, app_id)
+    app_config = get_app_config(client, app_id)
 
     print(b"assets", assets)
 
-    accounts: List[str] = [encoding.encode_address(app_global_state[b"SA_ADDR"]), 
-                           encoding.encode_address(app_global_state[b"TW_ADDR"])]
+    accounts: List[str] = [app_config.staking_address, 
+                           app_config.team_wallet_address]
     print(b"accounts", accounts)
     
     delete_txn = transaction.ApplicationDeleteTxn(
@@ -381,7 +357,7 @@ def close_bidding(client: AlgodClient, app_id: int, closer: Account, assets: Lis
         index=app_id,
         accounts=accounts,
         foreign_assets=assets,
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
     )
     signed_delete_txn = delete_txn.sign(closer.get_private_key())
     client.send_transaction(signed_delete_txn)
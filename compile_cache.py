@@ -0,0 +1,96 @@
+import hashlib
+import os
+import threading
+from base64 import b64decode
+from collections import OrderedDict
+from typing import Optional
+
+from algosdk.v2client.algod import AlgodClient
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".teal_cache")
+
+
+class CompileCache:
+    """Content-addressed cache of compiled TEAL bytecode.
+
+    Entries are keyed by a hash of the TEAL source and version, kept on disk
+    so they survive restarts, with an in-memory LRU in front of the disk.
+
+    Args:
+        directory: Where compiled programs are stored.
+        max_entries: Size of the in-memory LRU.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_entries: int = 64) -> None:
+        self.directory = directory
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+
+    @staticmethod
+    def key(teal: str, version: Optional[int] = None) -> str:
+        h = hashlib.sha256()
+        h.update(str(version).encode())
+        h.update(b"\x00")
+        h.update(teal.encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            program = self._entries.get(key)
+            if program is not None:
+                self._entries.move_to_end(key)
+                return program
+
+        try:
+            with open(self._path(key), "rb") as f:
+                program = f.read()
+        except FileNotFoundError:
+            return None
+
+        self._remember(key, program)
+        return program
+
+    def put(self, key: str, program: bytes) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # write to a temporary file first so readers never see a partial program
+        tmp_path = "{}.{}.{}.tmp".format(self._path(key), os.getpid(), threading.get_ident())
+        with open(tmp_path, "wb") as f:
+            f.write(program)
+        os.replace(tmp_path, self._path(key))
+        self._remember(key, program)
+
+    def compile(self, client: AlgodClient, teal: str, version: Optional[int] = None) -> bytes:
+        """Return the bytecode of `teal`, asking algod only on a cache miss."""
+        key = self.key(teal, version)
+        program = self.get(key)
+        if program is not None:
+            self.hits += 1
+            return program
+
+        self.misses += 1
+        response = client.compile(teal)
+        program = b64decode(response["result"])
+        self.put(key, program)
+        return program
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".bin")
+
+    def _remember(self, key: str, program: bytes) -> None:
+        with self._lock:
+            self._entries[key] = program
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_compile_cache = CompileCache()
+
+
+def get_compile_cache() -> CompileCache:
+    return _compile_cache
@@ -0,0 +1,271 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+from weakref import WeakKeyDictionary
+
+from algosdk.v2client.algod import AlgodClient
+
+from retry import backoff, is_transient
+
+
+# a transaction can not stay valid for more rounds than this
+DEFAULT_TIMEOUT_ROUNDS = 1000
+# transient failures in a row of the block-follow loop before every tracked
+# transaction is failed
+MAX_STATUS_FAILURES = 8
+
+logger = logging.getLogger(__name__)
+
+
+class ConfirmationTimeout(Exception):
+    """Raised when a transaction is not confirmed within the round budget."""
+
+
+class _Tracked:
+    def __init__(self, tx_id: str, timeout_rounds: int, deadline_round: Optional[int] = None) -> None:
+        self.tx_id = tx_id
+        self.timeout_rounds = timeout_rounds
+        self.deadline_round = deadline_round
+        self.future: Future = Future()
+        # the other transactions of its group, looked up once it is confirmed
+        self.followers: List["_Tracked"] = []
+
+
+class ConfirmationWaiter:
+    """Tracks many pending transactions against one block-follow loop.
+
+    A single background thread calls `status_after_block` once per round and
+    checks every tracked transaction, so any number of concurrent callers
+    share the same poller instead of each running their own. The thread
+    reads the current round each time it starts, and a transaction's round
+    budget is counted from the first round it is checked in.
+
+    Transient algod errors (transport errors, 5xx and 429 responses) are
+    retried: a failed lookup is made again the next round, and the loop
+    itself backs off and carries on, failing the tracked transactions only
+    after `MAX_STATUS_FAILURES` failures in a row or any other error.
+
+    A group commits atomically, so only its first transaction is looked up
+    every round. The others are looked up once it is confirmed, and share
+    its failure otherwise.
+
+    Args:
+        client: An algod client.
+        timeout_rounds: Number of rounds to wait before giving up on a
+            transaction.
+        backoff_base: Upper bound of the first retry delay, in seconds.
+        backoff_cap: Upper bound of any retry delay, in seconds.
+    """
+
+    def __init__(
+        self,
+        client: AlgodClient,
+        timeout_rounds: int = DEFAULT_TIMEOUT_ROUNDS,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 8.0,
+    ) -> None:
+        self.client = client
+        self.timeout_rounds = timeout_rounds
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.last_round: Optional[int] = None
+
+        self._lock = threading.Lock()
+        self._tracked: Dict[str, _Tracked] = dict()
+        # transactions of groups whose first transaction is tracked for them
+        self._following: Dict[str, _Tracked] = dict()
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        self._thread: Optional[threading.Thread] = None
+
+    def add_listener(self, listener: Callable[[str, Dict[str, Any]], None]) -> None:
+        """Register a callback invoked with (tx_id, pending_txn) on every confirmation."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def track(self, tx_id: str, timeout_rounds: Optional[int] = None, last_valid: Optional[int] = None) -> Future:
+        """Start tracking a transaction.
+
+        Args:
+            tx_id: The transaction ID.
+            timeout_rounds: Rounds to wait for the transaction, counted from
+                the first round it is checked in. Defaults to the waiter's
+                `timeout_rounds`.
+            last_valid: The last valid round of the transaction. When given,
+                it is the round the waiter gives up in instead.
+
+        Returns:
+            A future resolved with the pending transaction info once the
+            transaction is confirmed.
+        """
+        with self._lock:
+            return self._track(tx_id, timeout_rounds, last_valid).future
+
+    def track_group(
+        self, tx_ids: List[str], timeout_rounds: Optional[int] = None, last_valid: Optional[int] = None
+    ) -> Future:
+        """Start tracking every transaction of a group, see `track`.
+
+        Only the first transaction is looked up until it is confirmed.
+
+        Returns:
+            A future resolved with the list of pending transaction infos, in
+            the order of `tx_ids`, once all of them are confirmed.
+        """
+        with self._lock:
+            leader = self._track(tx_ids[0], timeout_rounds, last_valid)
+            futures = [leader.future]
+            for tx_id in tx_ids[1:]:
+                tracked = self._tracked.get(tx_id) or self._following.get(tx_id)
+                if tracked is None:
+                    tracked = _Tracked(tx_id, self.timeout_rounds if timeout_rounds is None else timeout_rounds,
+                                       last_valid)
+                    self._following[tx_id] = tracked
+                    leader.followers.append(tracked)
+                futures.append(tracked.future)
+        group_future: Future = Future()
+        remaining = [len(futures)]
+        remaining_lock = threading.Lock()
+
+        def on_done(future: Future) -> None:
+            if group_future.done():
+                return
+            error = future.exception()
+            if error is not None:
+                group_future.set_exception(error)
+                return
+            with remaining_lock:
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+            if finished:
+                group_future.set_result([f.result() for f in futures])
+
+        for future in futures:
+            future.add_done_callback(on_done)
+        return group_future
+
+    def _track(self, tx_id: str, timeout_rounds: Optional[int], last_valid: Optional[int]) -> _Tracked:
+        tracked = self._tracked.get(tx_id) or self._following.get(tx_id)
+        if tracked is None:
+            if timeout_rounds is None:
+                timeout_rounds = self.timeout_rounds
+            tracked = _Tracked(tx_id, timeout_rounds, last_valid)
+            self._tracked[tx_id] = tracked
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="confirmation-waiter", daemon=True)
+            self._thread.start()
+        return tracked
+
+    def wait(self, tx_id: str, timeout_rounds: Optional[int] = None) -> Dict[str, Any]:
+        return self.track(tx_id, timeout_rounds).result()
+
+    def wait_for_group(self, tx_ids: List[str], timeout_rounds: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.track_group(tx_ids, timeout_rounds).result()
+
+    def _run(self) -> None:
+        failures = 0
+        fresh = False
+        while True:
+            try:
+                if not fresh:
+                    self.last_round = self.client.status()["last-round"]
+                    fresh = True
+                with self._lock:
+                    tracked = list(self._tracked.values())
+                    if not tracked:
+                        self._thread = None
+                        return
+                for item in tracked:
+                    self._check(item)
+                status = self.client.status_after_block(self.last_round + 1)
+                self.last_round = status["last-round"]
+                failures = 0
+            except Exception as e:
+                failures += 1
+                if is_transient(e) and failures < MAX_STATUS_FAILURES:
+                    logger.warning("Confirmation waiter retrying after %s", e)
+                    time.sleep(backoff(failures, self.backoff_base, self.backoff_cap))
+                    continue
+                with self._lock:
+                    tracked = list(self._tracked.values()) + list(self._following.values())
+                    self._tracked.clear()
+                    self._following.clear()
+                    self._thread = None
+                for item in tracked:
+                    item.future.set_exception(e)
+                return
+
+    def _check(self, item: _Tracked) -> None:
+        if item.deadline_round is None:
+            item.deadline_round = self.last_round + item.timeout_rounds
+
+        try:
+            pending_txn = self.client.pending_transaction_info(item.tx_id)
+        except Exception as e:
+            if not is_transient(e):
+                self._finish(item, error=e)
+            # a transient failure is looked up again next round, or times out
+            elif self.last_round >= item.deadline_round:
+                self._finish(item, error=ConfirmationTimeout(
+                    "Transaction {} not confirmed by round {}".format(item.tx_id, item.deadline_round)
+                ))
+            return
+
+        if pending_txn.get("confirmed-round", 0) > 0:
+            self._finish(item, pending_txn=pending_txn)
+            self._look_up_followers(item)
+        elif pending_txn.get("pool-error"):
+            self._finish(item, error=Exception(pending_txn["pool-error"]))
+        elif self.last_round >= item.deadline_round:
+            self._finish(item, error=ConfirmationTimeout(
+                "Transaction {} not confirmed by round {}".format(item.tx_id, item.deadline_round)
+            ))
+
+    def _look_up_followers(self, item: _Tracked) -> None:
+        for follower in item.followers:
+            try:
+                pending_txn = self.client.pending_transaction_info(follower.tx_id)
+            except Exception as e:
+                logger.warning("Lookup of %s failed, tracking it on its own: %s", follower.tx_id, e)
+                pending_txn = {}
+            if pending_txn.get("confirmed-round", 0) > 0:
+                self._finish(follower, pending_txn=pending_txn)
+                self._look_up_followers(follower)
+                continue
+            # checked every round from now on, like any other transaction
+            with self._lock:
+                if self._following.pop(follower.tx_id, None) is follower:
+                    self._tracked[follower.tx_id] = follower
+
+    def _finish(self, item: _Tracked, pending_txn: Dict[str, Any] = None, error: Exception = None) -> None:
+        with self._lock:
+            self._tracked.pop(item.tx_id, None)
+            self._following.pop(item.tx_id, None)
+            listeners = list(self._listeners)
+        if error is not None:
+            item.future.set_exception(error)
+            # the group commits atomically, its other transactions fail with it
+            for follower in item.followers:
+                self._finish(follower, error=error)
+            return
+        for listener in listeners:
+            try:
+                listener(item.tx_id, pending_txn)
+            except Exception:
+                logger.exception("Confirmation listener failed for %s", item.tx_id)
+        item.future.set_result(pending_txn)
+
+
+_waiters: "WeakKeyDictionary[AlgodClient, ConfirmationWaiter]" = WeakKeyDictionary()
+_waiters_lock = threading.Lock()
+
+
+def get_confirmation_waiter(client: AlgodClient) -> ConfirmationWaiter:
+    """Return the confirmation waiter shared by everything using `client`."""
+    with _waiters_lock:
+        waiter = _waiters.get(client)
+        if waiter is None:
+            waiter = ConfirmationWaiter(client)
+            _waiters[client] = waiter
+        return waiter
@@ -0,0 +1,258 @@
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, List, Optional
+from weakref import WeakKeyDictionary
+
+from algosdk.future.transaction import SuggestedParams, assign_group_id
+from algosdk.v2client.algod import AlgodClient
+
+from presigned import LEASE_SIZE
+from raw_submit import EncodedGroup
+from suggested_params import get_params_provider
+
+
+# fragments of algod rejections meaning the fee is too low for the current load
+LOW_FEE_ERRORS = ("below threshold", "less than the minimum")
+# fragment of the rejection of a transaction whose lease is held by another
+OVERLAPPING_LEASE = "overlapping lease"
+
+
+def is_low_fee(e: Exception) -> bool:
+    """Whether algod rejected a group because its fee is too low."""
+    message = str(e).lower()
+    return any(fragment in message for fragment in LOW_FEE_ERRORS)
+
+
+def is_overlapping_lease(e: Exception) -> bool:
+    """Whether algod rejected a group because another group holds its lease."""
+    return OVERLAPPING_LEASE in str(e).lower()
+
+
+class FeeBudget:
+    """How far the fees of groups may be bumped.
+
+    A budget can be shared by many groups: `max_total` then bounds the
+    extra fees all of their bumps add together.
+
+    Args:
+        max_multiplier: Largest fee of a group, as a multiple of its first fee.
+        max_fee: Largest fee of a group, in microAlgos.
+        max_bumps: Times a group may be signed again with a higher fee.
+        factor: Multiplier applied to the fee of a group on every bump.
+        max_total: Largest sum of the extra fees of all bumps, in microAlgos.
+    """
+
+    def __init__(
+        self,
+        max_multiplier: float = 10.0,
+        max_fee: Optional[int] = None,
+        max_bumps: int = 4,
+        factor: float = 2.0,
+        max_total: Optional[int] = None,
+    ) -> None:
+        if factor <= 1:
+            raise Exception("The bump factor must be above 1")
+        self.max_multiplier = max_multiplier
+        self.max_fee = max_fee
+        self.max_bumps = max_bumps
+        self.factor = factor
+        self.max_total = max_total
+        self.spent = 0
+
+        self._lock = threading.Lock()
+
+    def limit(self, initial_fee: int) -> int:
+        """The largest fee a group first priced at `initial_fee` may pay."""
+        limit = int(initial_fee * self.max_multiplier)
+        if self.max_fee is not None:
+            limit = min(limit, self.max_fee)
+        return limit
+
+    def reserve(self, extra: int) -> bool:
+        """Take `extra` microAlgos from `max_total`, if that much is left."""
+        with self._lock:
+            if self.max_total is not None and self.spent + extra > self.max_total:
+                return False
+            self.spent += extra
+            return True
+
+    def release(self, extra: int) -> None:
+        """Give back `extra` microAlgos taken by `reserve`."""
+        with self._lock:
+            self.spent -= extra
+
+
+# what `utils.GroupBuilder.execute` bumps within unless told otherwise
+DEFAULT_BUDGET = FeeBudget()
+
+
+class FeeBumper:
+    """Signs a group again with a higher fee until the budget runs out.
+
+    Only the fee of the transaction at `fee_payer` grows. The group
+    carries a lease, the one a transaction already has or else a random
+    one put on the fee payer, and keeps its validity window on every bump,
+    so at most one of the signed versions can ever be confirmed.
+
+    A bump is provisional: `commit` it once algod accepts the new version,
+    or `rollback` to the fee of the version it last accepted. The lease
+    also means a group already in a node's pool can not be re-priced:
+    algod rejects every other version with an overlapping lease until the
+    pooled one is confirmed or dropped, so a bump only helps a group that
+    was rejected for its fee or that the node let go of.
+
+    Args:
+        transactions: The transactions of the group, priced and grouped.
+        sign: Signs the transactions, returning them in group order.
+        fee_payer: Group index of the transaction paying the fee.
+        budget: Limits of the bumps.
+        required: Returns the total fee the group needs at the given params,
+            which a bump pays at least.
+    """
+
+    def __init__(
+        self,
+        transactions: List[Any],
+        sign: Callable[[List[Any]], List[Any]],
+        fee_payer: int,
+        budget: FeeBudget,
+        required: Optional[Callable[[SuggestedParams], int]] = None,
+    ) -> None:
+        self.transactions = transactions
+        self.sign = sign
+        self.fee_payer = fee_payer
+        self.budget = budget
+        self.required = required
+        self.fee = sum(txn.fee for txn in transactions)
+        self.limit = budget.limit(self.fee)
+        self.bumps = 0
+        # fees before each bump not accepted by algod yet
+        self._provisional: List[int] = []
+        if not any(txn.lease for txn in transactions):
+            transactions[fee_payer].lease = os.urandom(LEASE_SIZE)
+            self._regroup()
+
+    def encode(self) -> EncodedGroup:
+        """Sign the group at its current fee."""
+        return EncodedGroup.encode(self.sign(self.transactions))
+
+    def bump(self, sp: Optional[SuggestedParams] = None) -> Optional[EncodedGroup]:
+        """Sign the group again with a higher fee.
+
+        Args:
+            sp: Current params; the group pays at least what they ask for.
+
+        Returns:
+            The newly signed group, or None once the budget allows no
+            higher fee. It stays provisional until `commit` or `rollback`.
+        """
+        if self.bumps >= self.budget.max_bumps:
+            return None
+        fee = math.ceil(self.fee * self.budget.factor)
+        if self.required is not None and sp is not None:
+            fee = max(fee, self.required(sp))
+        fee = min(fee, self.limit)
+        if fee <= self.fee or not self.budget.reserve(fee - self.fee):
+            return None
+        self._provisional.append(self.fee)
+        self._set_fee(fee)
+        self.bumps += 1
+        return self.encode()
+
+    def commit(self) -> None:
+        """Keep the bumps made since the last commit, algod accepted the group."""
+        self._provisional.clear()
+
+    def rollback(self) -> None:
+        """Undo the bumps made since the last commit and give their fees back
+        to the budget, algod rejected the group they signed."""
+        if not self._provisional:
+            return
+        fee = self._provisional[0]
+        self.budget.release(self.fee - fee)
+        self.bumps -= len(self._provisional)
+        self._provisional.clear()
+        self._set_fee(fee)
+
+    def _set_fee(self, fee: int) -> None:
+        self.transactions[self.fee_payer].fee += fee - self.fee
+        self.fee = fee
+        self._regroup()
+
+    def _regroup(self) -> None:
+        for txn in self.transactions:
+            txn.group = None
+        assign_group_id(self.transactions)
+
+
+class Congestion:
+    """What the node reported about its load.
+
+    Args:
+        fee_per_byte: The per-byte fee of the suggested params, 0 while
+            the flat minimum fee is enough.
+        pending: Transactions waiting in the node's pool.
+        congested: Whether either is high enough to bump fees for.
+    """
+
+    def __init__(self, fee_per_byte: int, pending: int, congested: bool) -> None:
+        self.fee_per_byte = fee_per_byte
+        self.pending = pending
+        self.congested = congested
+
+
+class CongestionMonitor:
+    """Tells whether the network is congested, asking the node at most once
+    every `interval` seconds.
+
+    The network counts as congested when the suggested params switch from
+    the flat minimum fee to a per-byte fee, or when the node's transaction
+    pool holds at least `pool_threshold` transactions.
+
+    Args:
+        client: An algod client.
+        pool_threshold: Pending transactions from which the pool counts as
+            congested.
+        interval: Seconds a reading is reused for.
+    """
+
+    def __init__(self, client: AlgodClient, pool_threshold: int = 10_000, interval: float = 5.0) -> None:
+        self.client = client
+        self.pool_threshold = pool_threshold
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._congestion: Optional[Congestion] = None
+        self._read_at = 0.0
+
+    def congestion(self) -> Congestion:
+        with self._lock:
+            if self._congestion is not None and time.monotonic() - self._read_at < self.interval:
+                return self._congestion
+        sp = get_params_provider(self.client).get()
+        fee_per_byte = 0 if sp.flat_fee else sp.fee
+        pending = self.client.pending_transactions(max_txns=1).get("total-transactions", 0)
+        congestion = Congestion(fee_per_byte, pending, fee_per_byte > 0 or pending >= self.pool_threshold)
+        with self._lock:
+            self._congestion = congestion
+            self._read_at = time.monotonic()
+        return congestion
+
+    def congested(self) -> bool:
+        return self.congestion().congested
+
+
+_monitors: "WeakKeyDictionary[AlgodClient, CongestionMonitor]" = WeakKeyDictionary()
+_monitors_lock = threading.Lock()
+
+
+def get_congestion_monitor(client: AlgodClient) -> CongestionMonitor:
+    """Return the congestion monitor shared by everything using `client`."""
+    with _monitors_lock:
+        monitor = _monitors.get(client)
+        if monitor is None:
+            monitor = CongestionMonitor(client)
+            _monitors[client] = monitor
+        return monitor
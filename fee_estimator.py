@@ -0,0 +1,706 @@
+import ast
+import base64
+import threading
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from algosdk import constants, encoding
+from algosdk.logic import get_application_address
+from pyteal import Expr, TxnField
+from pyteal.ast.app import AppField
+from pyteal.ast.itxn import InnerTxnAction
+
+
+# loops in the contracts walk the foreign arrays of one transaction, which
+# hold at most this many references together
+_MAX_LOOP = 8
+
+_MIN_BALANCE = 100_000
+
+# pyteal OnComplete names by the value algosdk uses for them
+_ON_COMPLETE = ["NoOp", "OptIn", "CloseOut", "ClearState", "UpdateApplication", "DeleteApplication"]
+
+
+class _Unknown:
+    def __repr__(self) -> str:
+        return "UNKNOWN"
+
+
+UNKNOWN = _Unknown()
+
+# an expression that is false because the fee it compares is ours to choose
+_CHOSEN_FALSE = _Unknown()
+
+# group index of the call when only its method is known
+_THIS = _Unknown()
+
+
+class _Fee:
+    """The fee, or sum of fees, of transactions at these group indices."""
+
+    def __init__(self, indices: FrozenSet[int]) -> None:
+        self.indices = indices
+
+
+class FeeEstimate:
+    """What an app call needs to be paid for the path the contract will take.
+
+    `inner_txns` is the number of inner transactions the call submits: the
+    largest count over the approving paths that the given state leaves
+    open, so it is exact when the state decides every branch. `paths` lists
+    every distinct count still possible. `requirements` are the fee
+    assertions of the contract as (group indices, minimum total fee of
+    those transactions).
+
+    Args:
+        index: Group index of the app call.
+        paths: Inner transaction counts of the approving paths.
+        requirements: Fee assertions the path made.
+    """
+
+    def __init__(self, index: int, paths: List[int], requirements: List[Tuple[FrozenSet[int], int]]) -> None:
+        self.index = index
+        self.paths = sorted(set(paths))
+        self.inner_txns = self.paths[-1]
+        self.requirements = requirements
+
+    @property
+    def min_fees(self) -> Dict[int, int]:
+        """Smallest fee each transaction must carry to satisfy the contract."""
+        min_fees: Dict[int, int] = dict()
+        for indices, amount in sorted(self.requirements, key=lambda r: len(r[0])):
+            paid = sum(min_fees.get(i, 0) for i in indices)
+            if paid < amount:
+                first = min(indices)
+                min_fees[first] = min_fees.get(first, 0) + amount - paid
+        return min_fees
+
+    @property
+    def fee_payer(self) -> int:
+        """The transaction the contract wants the fee on, else the app call."""
+        min_fees = self.min_fees
+        if min_fees:
+            return max(min_fees, key=lambda i: min_fees[i])
+        return self.index
+
+    def fee(self, group_size: int, min_fee: int = constants.min_txn_fee) -> int:
+        """Return the exact fee of a group of `group_size` holding the call."""
+        return max((group_size + self.inner_txns) * min_fee, sum(self.min_fees.values()))
+
+    def group_args(self, prefunded: bool = False) -> Dict[str, Any]:
+        """Keyword arguments that price a `utils.GroupBuilder` with this estimate.
+
+        Args:
+            prefunded: The group already sends the app the fees of its inner
+                transactions, which the app then pays itself, so only the
+                outer transactions and the fee assertions are paid for.
+        """
+        return {
+            "inner_txns": {} if prefunded else {self.index: self.inner_txns},
+            "min_fees": self.min_fees,
+            "fee_payer": self.fee_payer,
+        }
+
+
+class ContractFees:
+    """Inner transaction and fee analysis of one PyTeal approval program.
+
+    The program is walked once per question the way the AVM would run it.
+    Values that depend on the calling group, on the local and global state
+    or on the app's holdings are taken from what the caller knows; a branch
+    on anything else is explored both ways. Every `InnerTxnBuilder.Begin`
+    and `Next` on the path counts one inner transaction, so a `Submit` of a
+    grouped inner call is counted per transaction.
+
+    Args:
+        program: The approval program.
+    """
+
+    def __init__(self, program: Expr) -> None:
+        self.program = program
+        self._bodies: Dict[Tuple[int, ...], Any] = dict()
+        self._lock = threading.Lock()
+
+    def methods(self) -> List[bytes]:
+        """Return the method names the program dispatches on."""
+        names: List[bytes] = []
+        for e in _walk(self.program):
+            if type(e).__name__ == "BinaryExpr" and e.op.value.value == "==":
+                for a, b in ((e.argLeft, e.argRight), (e.argRight, e.argLeft)):
+                    if (type(a).__name__ == "TxnaExpr" and a.field == TxnField.application_args
+                            and a.index == 0 and type(b).__name__ == "Bytes"):
+                        name = _bytes_value(b)
+                        if name not in names:
+                            names.append(name)
+        return names
+
+    def inner_txn_counts(self) -> Dict[str, List[int]]:
+        """Return the possible inner transaction counts of every method.
+
+        Nothing but the method name is known, so each list holds the count
+        of every approving branch of that method.
+        """
+        counts = dict()
+        for method in self.methods():
+            context = _Context(None, _THIS, app_args=[method])
+            counts[method.decode()] = sorted(set(path.inner for path in self._approving(context)))
+        return counts
+
+    def estimate(
+        self,
+        group: List[Any],
+        index: int,
+        local_state: Optional[Dict[str, Dict[bytes, Any]]] = None,
+        global_state: Optional[Dict[bytes, Any]] = None,
+        balances: Optional[Dict[str, int]] = None,
+        holdings: Optional[Dict[Tuple[str, int], int]] = None,
+        timestamp: Optional[int] = None,
+        min_fee: int = constants.min_txn_fee,
+    ) -> FeeEstimate:
+        """Estimate the fee of the app call at `group[index]`.
+
+        Args:
+            group: The unsigned transactions in group order.
+            index: Group index of the call to this program.
+            local_state: This app's local state by address, as returned by
+                `get_app_local_state`.
+            global_state: This app's global state.
+            balances: ALGO balance by address.
+            holdings: Asset balance by (address, asset ID); an asset the
+                address is not opted into is left out of a known address.
+            timestamp: Latest block timestamp.
+            min_fee: The network's minimum fee.
+
+        Raises:
+            Exception: When every path the state leaves open rejects the call.
+        """
+        context = _Context(group, index, local_state=local_state, global_state=global_state,
+                           balances=balances, holdings=holdings, timestamp=timestamp, min_fee=min_fee)
+        paths = self._approving(context)
+        if not paths:
+            raise Exception(f"App call {index} of the group would be rejected")
+        requirements = []
+        for path in paths:
+            for requirement in path.requirements:
+                if requirement not in requirements:
+                    requirements.append(requirement)
+        return FeeEstimate(index, [path.inner for path in paths], requirements)
+
+    def _approving(self, context: "_Context") -> List["_Path"]:
+        return [path for path, outcome in _Run(self, context).run(self.program, _Path()) if outcome == _APPROVE]
+
+    def _body(self, call: Any) -> Any:
+        key = (id(call.subroutine),) + tuple(id(arg) for arg in call.args)
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is None:
+                # keep the call alive so the ids in the key are not reused
+                body = self._bodies[key] = (call.subroutine.implementation(*call.args), call)
+        return body[0]
+
+
+_contracts: Dict[Callable[[], Expr], ContractFees] = dict()
+_contracts_lock = threading.Lock()
+
+
+def get_contract_fees(approval_program: Callable[[], Expr]) -> ContractFees:
+    """Return the shared analysis of the program built by `approval_program`."""
+    with _contracts_lock:
+        contract = _contracts.get(approval_program)
+        if contract is None:
+            contract = _contracts[approval_program] = ContractFees(approval_program())
+        return contract
+
+
+def estimate_fee(approval_program: Callable[[], Expr], group: List[Any], index: int, **state) -> FeeEstimate:
+    """Estimate the fee of the call at `group[index]`, see `ContractFees.estimate`."""
+    return get_contract_fees(approval_program).estimate(group, index, **state)
+
+
+_APPROVE = "approve"
+_REJECT = "reject"
+
+
+class _Path:
+    def __init__(self) -> None:
+        self.env: Dict[Any, Any] = dict()
+        self.inner = 0
+        self.requirements: List[Tuple[FrozenSet[int], int]] = []
+
+    def fork(self) -> "_Path":
+        path = _Path()
+        path.env = dict(self.env)
+        path.inner = self.inner
+        path.requirements = list(self.requirements)
+        return path
+
+
+class _Context:
+    def __init__(
+        self,
+        group: Optional[List[Any]],
+        index: Any,
+        app_args: Optional[List[bytes]] = None,
+        local_state: Optional[Dict[str, Dict[bytes, Any]]] = None,
+        global_state: Optional[Dict[bytes, Any]] = None,
+        balances: Optional[Dict[str, int]] = None,
+        holdings: Optional[Dict[Tuple[str, int], int]] = None,
+        timestamp: Optional[int] = None,
+        min_fee: int = constants.min_txn_fee,
+    ) -> None:
+        self.group = group
+        self.index = index
+        self.app_args = app_args
+        self.local_state = local_state or dict()
+        self.global_state = global_state
+        self.balances = balances or dict()
+        self.holdings = holdings or dict()
+        self.timestamp = timestamp
+        self.min_fee = min_fee
+
+        self.app_id = UNKNOWN
+        if group is not None:
+            self.app_id = getattr(group[index], "index", UNKNOWN) or UNKNOWN
+
+    def txn_field(self, i: Any, field: TxnField, item: Any = None) -> Any:
+        if field == TxnField.fee:
+            return _Fee(frozenset([i])) if isinstance(i, int) else UNKNOWN
+        if field == TxnField.group_index:
+            return i
+        if self.group is None:
+            return self._method_field(i, field, item)
+        if not isinstance(i, int) or not 0 <= i < len(self.group):
+            return UNKNOWN
+        txn = self.group[i]
+
+        if field == TxnField.sender:
+            return encoding.decode_address(txn.sender)
+        if field == TxnField.type_enum:
+            return txn.type
+        if field in (TxnField.receiver, TxnField.asset_receiver):
+            return encoding.decode_address(txn.receiver) if getattr(txn, "receiver", None) else UNKNOWN
+        if field == TxnField.amount:
+            return getattr(txn, "amt", UNKNOWN)
+        if field == TxnField.asset_amount:
+            return getattr(txn, "amount", UNKNOWN)
+        if field in (TxnField.xfer_asset, TxnField.application_id):
+            return getattr(txn, "index", UNKNOWN)
+        if field == TxnField.on_completion:
+            on_complete = getattr(txn, "on_complete", None)
+            return UNKNOWN if on_complete is None else _ON_COMPLETE[int(on_complete)]
+
+        arrays = {
+            TxnField.application_args: getattr(txn, "app_args", None) or [],
+            TxnField.accounts: [txn.sender] + list(getattr(txn, "accounts", None) or []),
+            TxnField.assets: list(getattr(txn, "foreign_assets", None) or []),
+            TxnField.applications: [getattr(txn, "index", 0)] + list(getattr(txn, "foreign_apps", None) or []),
+        }
+        lengths = {
+            TxnField.num_app_args: TxnField.application_args,
+            TxnField.num_accounts: TxnField.accounts,
+            TxnField.num_assets: TxnField.assets,
+            TxnField.num_applications: TxnField.applications,
+        }
+        if field in lengths:
+            # accounts and applications count the implicit sender and app at 0
+            offset = 1 if lengths[field] in (TxnField.accounts, TxnField.applications) else 0
+            return len(arrays[lengths[field]]) - offset
+        if field in arrays:
+            array = arrays[field]
+            if not isinstance(item, int) or not 0 <= item < len(array):
+                return UNKNOWN
+            value = array[item]
+            if field == TxnField.accounts:
+                return encoding.decode_address(value)
+            if field == TxnField.application_args and isinstance(value, str):
+                return value.encode()
+            return value
+        return UNKNOWN
+
+    def global_field(self, name: str) -> Any:
+        if name == "min_txn_fee":
+            return self.min_fee
+        if name == "min_balance":
+            return _MIN_BALANCE
+        if name == "zero_address":
+            return bytes(32)
+        if name == "group_size":
+            return UNKNOWN if self.group is None else len(self.group)
+        if name == "latest_timestamp":
+            return UNKNOWN if self.timestamp is None else self.timestamp
+        if name == "current_app_id":
+            return self.app_id
+        if name == "current_app_address" and isinstance(self.app_id, int):
+            return encoding.decode_address(get_application_address(self.app_id))
+        return UNKNOWN
+
+    def account(self, value: Any) -> Any:
+        """Resolve an address or an index into Txn.accounts to an address."""
+        if isinstance(value, int):
+            value = self.txn_field(self.index, TxnField.accounts, value)
+        if isinstance(value, bytes) and len(value) == 32:
+            return encoding.encode_address(value)
+        return UNKNOWN
+
+    def _method_field(self, i: Any, field: TxnField, item: Any) -> Any:
+        # only the dispatch of the call is known
+        if i is not _THIS:
+            return UNKNOWN
+        if field == TxnField.application_args and item == 0 and self.app_args:
+            return self.app_args[0]
+        if field == TxnField.on_completion:
+            return "NoOp"
+        if field == TxnField.application_id:
+            return 1
+        return UNKNOWN
+
+
+class _Run:
+    def __init__(self, contract: ContractFees, context: _Context) -> None:
+        self.contract = contract
+        self.context = context
+
+    def run(self, e: Any, path: _Path) -> List[Tuple[_Path, Any]]:
+        """Run `e` as a statement and return each resulting path with its outcome."""
+        kind = type(e).__name__
+        if e is None:
+            return [(path, None)]
+        if kind == "Seq":
+            results = [(path, None)]
+            for arg in e.args:
+                results = [
+                    result
+                    for p, outcome in results
+                    for result in ([(p, outcome)] if outcome is not None else self.run(arg, p))
+                ]
+            return results
+        if kind == "If":
+            return self._branch(e.cond, path, e.thenBranch, e.elseBranch)
+        if kind == "Cond":
+            return self._cond(e.args, path)
+        if kind == "ExitProgram":
+            return [(path, _APPROVE if _truth(self.eval(e.success, path)) is not False else _REJECT)]
+        if kind == "Return":
+            value = self.eval(e.value, path) if e.value is not None else None
+            return [(path, ("return", value))]
+        if kind == "Assert":
+            for cond in e.cond:
+                if _truth(self.eval(cond, path)) is False:
+                    return [(path, _REJECT)]
+            return [(path, None)]
+        if kind == "InnerTxnActionExpr":
+            if e.action in (InnerTxnAction.Begin, InnerTxnAction.Next):
+                path.inner += 1
+            return [(path, None)]
+        if kind == "InnerTxnFieldExpr":
+            return [(path, None)]
+        if kind == "For":
+            return self._loop(e, path)
+        if kind == "SubroutineCall":
+            results = self.run(self.contract._body(e), path)
+            # returning from the subroutine resumes the caller
+            return [(p, None if isinstance(outcome, tuple) else outcome) for p, outcome in results]
+        self.eval(e, path)
+        return [(path, None)]
+
+    def eval(self, e: Any, path: _Path) -> Any:
+        """Evaluate `e` on `path`, UNKNOWN when the context does not decide it."""
+        kind = type(e).__name__
+        context = self.context
+        if kind == "Int":
+            return e.value
+        if kind == "EnumInt":
+            return e.name
+        if kind == "Bytes":
+            return _bytes_value(e)
+        if kind == "TxnExpr":
+            return context.txn_field(context.index, e.field)
+        if kind == "GtxnExpr":
+            return context.txn_field(self._index(e.txnIndex, path), e.field)
+        if kind == "TxnaExpr":
+            return context.txn_field(context.index, e.field, self._index(e.index, path))
+        if kind == "GtxnaExpr":
+            return context.txn_field(self._index(e.txnIndex, path), e.field, self._index(e.index, path))
+        if kind == "Global":
+            return context.global_field(e.field.name)
+        if kind == "App":
+            return self._app(e, path)
+        if kind == "ScratchLoad":
+            return path.env.get(e.slot, UNKNOWN)
+        if kind == "ScratchStore":
+            path.env[e.slot] = self.eval(e.value, path)
+            return None
+        if kind == "MaybeValue":
+            return self._maybe(e, path)
+        if kind == "UnaryExpr":
+            return self._unary(e.op.value.value, self.eval(e.arg, path))
+        if kind == "BinaryExpr":
+            return self._binary(e.op.value.value, e.argLeft, e.argRight, path)
+        if kind == "NaryExpr":
+            return self._nary(e.op.value.value, e.args, path)
+        if kind == "SubroutineCall":
+            return self._call(e, path)
+        return UNKNOWN
+
+    def _branch(self, cond: Any, path: _Path, then: Any, otherwise: Any) -> List[Tuple[_Path, Any]]:
+        truth = _truth(self.eval(cond, path))
+        if truth is True:
+            return self.run(then, path)
+        if truth is False:
+            return self.run(otherwise, path)
+        return self.run(then, path.fork()) + self.run(otherwise, path)
+
+    def _cond(self, args: List[List[Any]], path: _Path) -> List[Tuple[_Path, Any]]:
+        results = []
+        for cond, body in args:
+            truth = _truth(self.eval(cond, path))
+            if truth is True:
+                return results + self.run(body, path)
+            if truth is None:
+                results += self.run(body, path.fork())
+        # no branch matched, the program errs
+        return results + [(path, _REJECT)]
+
+    def _loop(self, e: Any, path: _Path) -> List[Tuple[_Path, Any]]:
+        results = []
+        pending = self.run(e.start, path)
+        for _ in range(_MAX_LOOP):
+            running = []
+            for p, outcome in pending:
+                if outcome is not None:
+                    results.append((p, outcome))
+                    continue
+                truth = _truth(self.eval(e.cond, p))
+                if truth is not True:
+                    results.append((p.fork() if truth is None else p, None))
+                if truth is not False:
+                    for q, body_outcome in self.run(e.doBlock, p):
+                        if body_outcome is None:
+                            running += self.run(e.step, q)
+                        else:
+                            results.append((q, body_outcome))
+            pending = _distinct(running)
+            if not pending:
+                break
+        return _distinct(results + pending)
+
+    def _call(self, e: Any, path: _Path) -> Any:
+        results = self.run(self.contract._body(e), path.fork())
+        values = [outcome[1] for _, outcome in results if isinstance(outcome, tuple)]
+        if len(results) == 1:
+            # a single path: keep what the subroutine did
+            p = results[0][0]
+            path.env, path.inner, path.requirements = p.env, p.inner, p.requirements
+        elif results:
+            path.inner = max(p.inner for p, _ in results)
+        if values and all(value == values[0] for value in values):
+            return values[0]
+        return UNKNOWN
+
+    def _index(self, e: Any, path: _Path) -> Any:
+        return e if isinstance(e, int) else self.eval(e, path)
+
+    def _app(self, e: Any, path: _Path) -> Any:
+        context = self.context
+        args = [self.eval(arg, path) for arg in e.args]
+        if e.field == AppField.localGet:
+            address = context.account(args[0])
+            if address is UNKNOWN or args[1] is UNKNOWN:
+                return UNKNOWN
+            key = ("local", address, args[1])
+            if key in path.env:
+                return path.env[key]
+            state = context.local_state.get(address)
+            return UNKNOWN if state is None else state.get(args[1], 0)
+        if e.field == AppField.globalGet:
+            key = ("global", args[0])
+            if key in path.env:
+                return path.env[key]
+            if context.global_state is None or args[0] is UNKNOWN:
+                return UNKNOWN
+            return context.global_state.get(args[0], 0)
+        if e.field == AppField.localPut:
+            address = context.account(args[0])
+            if address is not UNKNOWN and args[1] is not UNKNOWN:
+                path.env[("local", address, args[1])] = args[2]
+        elif e.field == AppField.globalPut:
+            if args[0] is not UNKNOWN:
+                path.env[("global", args[0])] = args[1]
+        elif e.field == AppField.localDel:
+            address = context.account(args[0])
+            if address is not UNKNOWN and args[1] is not UNKNOWN:
+                path.env[("local", address, args[1])] = 0
+        elif e.field == AppField.globalDel:
+            if args[0] is not UNKNOWN:
+                path.env[("global", args[0])] = 0
+        elif e.field == AppField.optedIn:
+            address = context.account(args[0])
+            if address is not UNKNOWN and address in context.local_state:
+                return 1
+        return UNKNOWN
+
+    def _maybe(self, e: Any, path: _Path) -> None:
+        has_value, value = UNKNOWN, UNKNOWN
+        if e.op.value.value == "asset_holding_get" and e.immediate_args == ["AssetBalance"]:
+            address = self.context.account(self.eval(e.args[0], path))
+            asset_id = self.eval(e.args[1], path)
+            holdings = self.context.holdings
+            if (address, asset_id) in holdings:
+                has_value, value = 1, holdings[(address, asset_id)]
+            elif any(holder == address for holder, _ in holdings):
+                has_value, value = 0, 0
+        value_slot, has_value_slot = e.output_slots[0], e.output_slots[1]
+        path.env[value_slot] = value
+        path.env[has_value_slot] = has_value
+        return None
+
+    def _unary(self, op: str, value: Any) -> Any:
+        if op == "!":
+            if value is _CHOSEN_FALSE:
+                return 1
+            truth = _truth(value)
+            return UNKNOWN if truth is None else int(not truth)
+        if value is UNKNOWN or isinstance(value, _Fee):
+            return UNKNOWN
+        if op == "btoi" and isinstance(value, bytes):
+            return int.from_bytes(value, "big")
+        if op == "itob" and isinstance(value, int):
+            return value.to_bytes(8, "big")
+        if op == "len" and isinstance(value, bytes):
+            return len(value)
+        if op == "balance":
+            address = self.context.account(value)
+            return self.context.balances.get(address, UNKNOWN)
+        return UNKNOWN
+
+    def _binary(self, op: str, left_expr: Any, right_expr: Any, path: _Path) -> Any:
+        left = self.eval(left_expr, path)
+        right = self.eval(right_expr, path)
+        if isinstance(left, _Fee) or isinstance(right, _Fee):
+            return self._fee_compare(op, left, right, path)
+        if left is UNKNOWN or right is UNKNOWN or left is _CHOSEN_FALSE or right is _CHOSEN_FALSE:
+            return UNKNOWN
+        try:
+            if op == "==":
+                return int(left == right)
+            if op == "!=":
+                return int(left != right)
+            if op == "<":
+                return int(left < right)
+            if op == ">":
+                return int(left > right)
+            if op == "<=":
+                return int(left <= right)
+            if op == ">=":
+                return int(left >= right)
+            if op == "-":
+                return left - right
+            if op == "/":
+                return left // right
+            if op == "%":
+                return left % right
+        except (TypeError, ZeroDivisionError):
+            pass
+        return UNKNOWN
+
+    def _fee_compare(self, op: str, left: Any, right: Any, path: _Path) -> Any:
+        # the fee is not read from the context: it is what we are choosing,
+        # so the comparison goes the way that lets the call through
+        if isinstance(right, _Fee):
+            flipped = {">=": "<=", ">": "<", "<=": ">=", "<": ">"}
+            if op not in flipped:
+                return UNKNOWN
+            left, right, op = right, left, flipped[op]
+        if not isinstance(right, int):
+            return UNKNOWN
+        if op in (">=", "<"):
+            path.requirements.append((left.indices, right))
+        elif op in (">", "<="):
+            path.requirements.append((left.indices, right + 1))
+        else:
+            return UNKNOWN
+        return 1 if op in (">=", ">") else _CHOSEN_FALSE
+
+    def _nary(self, op: str, args: List[Any], path: _Path) -> Any:
+        if op == "&&":
+            mark = len(path.requirements)
+            result = 1
+            for arg in args:
+                truth = _truth(value := self.eval(arg, path))
+                if value is _CHOSEN_FALSE:
+                    return _CHOSEN_FALSE
+                if truth is False:
+                    # the other requirements of a false conjunction do not apply
+                    del path.requirements[mark:]
+                    return 0
+                if truth is None:
+                    result = UNKNOWN
+            return result
+        if op == "||":
+            result = 0
+            for arg in args:
+                mark = len(path.requirements)
+                value = self.eval(arg, path)
+                truth = _truth(value)
+                if truth is True:
+                    return 1
+                if truth is False and value is not _CHOSEN_FALSE:
+                    del path.requirements[mark:]
+                else:
+                    result = UNKNOWN
+            return result
+
+        values = [self.eval(arg, path) for arg in args]
+        if all(isinstance(value, _Fee) for value in values) and op == "+":
+            return _Fee(frozenset().union(*(value.indices for value in values)))
+        if any(not isinstance(value, (int, bytes)) for value in values):
+            return UNKNOWN
+        if op == "+":
+            return sum(values)
+        if op == "*":
+            result = 1
+            for value in values:
+                result *= value
+            return result
+        if op == "concat":
+            return b"".join(values)
+        return UNKNOWN
+
+
+def _distinct(results: List[Tuple[_Path, Any]]) -> List[Tuple[_Path, Any]]:
+    # paths that differ only in how they got here behave the same from now on
+    seen = dict()
+    for path, outcome in results:
+        key = (outcome, path.inner, tuple(path.requirements), frozenset(path.env.items()))
+        seen.setdefault(key, (path, outcome))
+    return list(seen.values())
+
+
+def _truth(value: Any) -> Optional[bool]:
+    if value is _CHOSEN_FALSE:
+        return False
+    if value is UNKNOWN or isinstance(value, _Fee) or value is None:
+        return None
+    if isinstance(value, str):
+        return True
+    return bool(value)
+
+
+def _bytes_value(e: Any) -> bytes:
+    if e.base == "utf8":
+        return ast.literal_eval(e.byte_str).encode()
+    if e.base == "base16":
+        return bytes.fromhex(e.byte_str[2:] if e.byte_str.startswith("0x") else e.byte_str)
+    if e.base == "base32":
+        return base64.b32decode(e.byte_str + "=" * (-len(e.byte_str) % 8))
+    return base64.b64decode(e.byte_str)
+
+
+def _walk(e: Any):
+    yield e
+    for value in vars(e).values():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for item in values:
+            items = item if isinstance(item, (list, tuple)) else [item]
+            for child in items:
+                if isinstance(child, Expr):
+                    yield from _walk(child)
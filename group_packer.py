@@ -0,0 +1,205 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+from algosdk import constants
+
+
+MAX_GROUP_SIZE = constants.tx_group_limit
+# per app call: at most this many accounts, and this many accounts, assets
+# and apps together
+MAX_ACCOUNTS = 4
+MAX_REFERENCES = 8
+
+# where an operation may sit in a group
+ANYWHERE = "anywhere"
+# the contract reads Gtxn[0], the operation must open its group
+FIRST = "first"
+# the contract asserts the group size, the operation gets a group to itself
+ALONE = "alone"
+
+
+class References:
+    """The foreign arrays of one app call, in the order the contract indexes them.
+
+    Args:
+        accounts: Addresses for Txn.accounts[1:].
+        assets: Asset IDs for Txn.assets.
+        apps: App IDs for Txn.applications[1:].
+    """
+
+    def __init__(self, accounts: Sequence[str] = (), assets: Sequence[int] = (), apps: Sequence[int] = ()) -> None:
+        self.accounts = list(accounts)
+        self.assets = list(assets)
+        self.apps = list(apps)
+
+    def __len__(self) -> int:
+        return len(self.accounts) + len(self.assets) + len(self.apps)
+
+    def check(self) -> None:
+        if len(self.accounts) > MAX_ACCOUNTS:
+            raise Exception(f"An app call references at most {MAX_ACCOUNTS} accounts, got {len(self.accounts)}")
+        if len(self) > MAX_REFERENCES:
+            raise Exception(f"An app call holds at most {MAX_REFERENCES} references, got {len(self)}")
+
+    def apply(self, txn: Any) -> None:
+        txn.accounts = self.accounts or None
+        txn.foreign_assets = self.assets or None
+        txn.foreign_apps = self.apps or None
+
+
+class Operation:
+    """One logical operation: transactions that go out together and in order.
+
+    The fee fields are those of `utils.GroupBuilder`, indexed within the
+    operation; `fee_estimator.FeeEstimate.group_args` fills them in.
+
+    Args:
+        transactions: The unsigned transactions in order.
+        signers: An Account, a list of Accounts, or a map from sender address
+            to the signer, as `utils.GroupBuilder` takes them.
+        references: Map from index in `transactions` to the References of
+            that app call. They are written to the transaction and checked
+            against the per-call limits; app calls left out are checked as
+            they are.
+        inner_txns: Map from index to the number of inner transactions.
+        min_fees: Map from index to the smallest fee that transaction must carry.
+        fee_payer: Index of the transaction paying the pooled fee, used when
+            the operation opens its group.
+        position: ANYWHERE, FIRST or ALONE.
+    """
+
+    def __init__(
+        self,
+        transactions: List[Any],
+        signers: Any,
+        references: Optional[Dict[int, References]] = None,
+        inner_txns: Optional[Dict[int, int]] = None,
+        min_fees: Optional[Dict[int, int]] = None,
+        fee_payer: int = 0,
+        position: str = ANYWHERE,
+    ) -> None:
+        if not transactions:
+            raise Exception("An operation needs at least one transaction")
+        if len(transactions) > MAX_GROUP_SIZE:
+            raise Exception(f"An operation holds at most {MAX_GROUP_SIZE} transactions")
+        if position not in (ANYWHERE, FIRST, ALONE):
+            raise Exception(f"Unknown position {position}")
+        self.transactions = transactions
+        self.signers = signers
+        self.inner_txns = dict(inner_txns or {})
+        self.min_fees = dict(min_fees or {})
+        self.fee_payer = fee_payer
+        self.position = position
+
+        references = references or {}
+        for i, txn in enumerate(transactions):
+            if i in references:
+                references[i].check()
+                references[i].apply(txn)
+            elif txn.type == constants.appcall_txn:
+                _references_of(txn).check()
+
+    def __len__(self) -> int:
+        return len(self.transactions)
+
+
+class PackedGroup:
+    """Operations packed into one atomic group, in group order."""
+
+    def __init__(self) -> None:
+        self.operations: List[Operation] = []
+        self.transactions: List[Any] = []
+        self.inner_txns: Dict[int, int] = dict()
+        self.min_fees: Dict[int, int] = dict()
+
+    def __len__(self) -> int:
+        return len(self.transactions)
+
+    @property
+    def fee_payer(self) -> int:
+        return self.operations[0].fee_payer
+
+    @property
+    def signers(self) -> List[Any]:
+        return [operation.signers for operation in self.operations]
+
+    def fits(self, operation: Operation) -> bool:
+        if len(self) + len(operation) > MAX_GROUP_SIZE:
+            return False
+        if operation.position != ANYWHERE or any(op.position == ALONE for op in self.operations):
+            return not self.operations
+        return True
+
+    def add(self, operation: Operation) -> None:
+        offset = len(self.transactions)
+        self.operations.append(operation)
+        self.transactions.extend(operation.transactions)
+        for i, count in operation.inner_txns.items():
+            self.inner_txns[offset + i] = count
+        for i, fee in operation.min_fees.items():
+            self.min_fees[offset + i] = fee
+
+
+def pack(operations: Sequence[Operation], ordered: bool = True) -> List[PackedGroup]:
+    """Pack operations into the fewest groups of at most 16 transactions.
+
+    Every group is atomic: one failing operation fails the others packed
+    with it.
+
+    Args:
+        operations: The operations to send.
+        ordered: Keep the order of the stream, so that an operation never
+            lands in an earlier group, or earlier in a group, than one
+            queued before it. This is what an opt-in followed by a
+            transfer of the same asset needs. The stream is cut greedily,
+            which gives the fewest groups for that order. When False,
+            operations are placed first-fit, largest first, and keep their
+            stream order within each group.
+    """
+    if ordered:
+        groups = [PackedGroup()]
+        for operation in operations:
+            if not groups[-1].fits(operation):
+                groups.append(PackedGroup())
+            groups[-1].add(operation)
+        return [group for group in groups if group.operations]
+
+    positions = {id(operation): i for i, operation in enumerate(operations)}
+    # FIRST and ALONE operations each open a group, place them before the rest
+    placed = sorted(operations, key=lambda op: (op.position == ANYWHERE, -len(op), positions[id(op)]))
+    bins: List[List[Operation]] = []
+    sizes: List[int] = []
+    for operation in placed:
+        for i, ops in enumerate(bins):
+            if _fits(ops, sizes[i], operation):
+                ops.append(operation)
+                sizes[i] += len(operation)
+                break
+        else:
+            bins.append([operation])
+            sizes.append(len(operation))
+
+    groups = []
+    for ops in bins:
+        group = PackedGroup()
+        for operation in sorted(ops, key=lambda op: (op.position == ANYWHERE, positions[id(op)])):
+            group.add(operation)
+        groups.append(group)
+    return groups
+
+
+def chunks(items: Sequence[Any], size: int) -> List[List[Any]]:
+    """Split `items` into lists of at most `size`, e.g. assets per app call."""
+    return [list(items[i:i + size]) for i in range(0, len(items), size)]
+
+
+def _fits(ops: List[Operation], size: int, operation: Operation) -> bool:
+    if size + len(operation) > MAX_GROUP_SIZE:
+        return False
+    if any(op.position == ALONE for op in ops) or operation.position == ALONE:
+        return False
+    # a FIRST operation only goes in a group that has none yet
+    return operation.position != FIRST or all(op.position != FIRST for op in ops)
+
+
+def _references_of(txn: Any) -> References:
+    return References(txn.accounts or (), txn.foreign_assets or (), txn.foreign_apps or ())
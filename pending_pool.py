@@ -0,0 +1,174 @@
+import threading
+import time
+from typing import Any, Collection, Dict, Iterator, List, Optional, Set, Tuple
+from weakref import WeakKeyDictionary
+
+import msgpack
+from algosdk import encoding
+from algosdk.v2client.algod import AlgodClient
+
+from raw_submit import txid_of
+from single_flight import SingleFlight
+
+
+# pending transactions a reading of the pool is capped at by default, algod
+# returns them highest fee first
+MAX_PENDING_TXNS = 2000
+
+
+class PendingConflict(Exception):
+    """Raised instead of sending a group that a pending transaction would make fail."""
+
+
+class PendingCall:
+    """An app call waiting in the node's transaction pool.
+
+    Args:
+        txn: The decoded transaction fields, its ID is hashed from them
+            the first time `tx_id` is read.
+        sender: The sender address.
+        method: The first app argument, b"" when there is none.
+    """
+
+    def __init__(self, txn: Dict[str, Any], sender: str, method: bytes) -> None:
+        self.txn = txn
+        self.sender = sender
+        self.method = method
+        self._tx_id: Optional[str] = None
+
+    @property
+    def tx_id(self) -> str:
+        if self._tx_id is None:
+            self._tx_id = txid_of(msgpack.packb(encoding._sort_dict(self.txn), use_bin_type=True))
+        return self._tx_id
+
+    def __repr__(self) -> str:
+        return f"{self.method.decode(errors='replace')} {self.tx_id} from {self.sender}"
+
+
+def index_pending(response: bytes, app_ids: Optional[Collection[int]] = None) -> Dict[Tuple[int, str], List[PendingCall]]:
+    """Index the app calls of a msgpack `/transactions/pending` response.
+
+    The response is decoded one transaction at a time, and only calls to
+    `app_ids`, or to any app when it is None, are kept.
+
+    Returns:
+        The calls by (app ID, address), for every address a call sends from
+        or passes in its accounts, so by the auction or trading index it
+        acts on.
+    """
+    calls: Dict[Tuple[int, str], List[PendingCall]] = dict()
+    for signed_txn in _top_transactions(response):
+        txn = signed_txn["txn"]
+        app_id = txn.get("apid")
+        if not app_id or txn.get("type") != "appl" or (app_ids is not None and app_id not in app_ids):
+            continue
+        args = txn.get("apaa") or [b""]
+        sender = encoding.encode_address(txn["snd"])
+        call = PendingCall(txn, sender, args[0])
+        addresses = {sender}
+        addresses.update(encoding.encode_address(address) for address in txn.get("apat") or [])
+        for address in addresses:
+            calls.setdefault((app_id, address), []).append(call)
+    return calls
+
+
+class PendingPool:
+    """The app calls waiting in the node's transaction pool.
+
+    The pool is read in one msgpack request and indexed by app and by the
+    addresses each call touches, so checking a slot for competing calls is
+    a dictionary lookup. Only calls to apps that have been checked are
+    indexed; checking a new app reads the pool again. A reading is shared
+    for `max_age` seconds by every check, and concurrent checks wait for
+    the same read, which runs outside the lock.
+
+    A reading takes at most `max_txns` transactions, so a congested pool of
+    tens of thousands costs no more than a busy one; calls beyond them, the
+    lowest paying, are not seen.
+
+    Args:
+        client: An algod client.
+        max_age: Seconds a reading of the pool is reused for.
+        max_txns: Largest number of pending transactions to read, 0 for all.
+    """
+
+    def __init__(self, client: AlgodClient, max_age: float = 0.5, max_txns: int = MAX_PENDING_TXNS) -> None:
+        self.client = client
+        self.max_age = max_age
+        self.max_txns = max_txns
+        self.reads = 0
+
+        self._lock = threading.Lock()
+        self._calls: Optional[Dict[Tuple[int, str], List[PendingCall]]] = None
+        self._read_at = 0.0
+        self._app_ids: Set[int] = set()
+        self._flight = SingleFlight()
+
+    def calls(self, app_id: int, address: str) -> List[PendingCall]:
+        """Pending calls to `app_id` sent from or passing `address`."""
+        with self._lock:
+            if app_id not in self._app_ids:
+                self._app_ids.add(app_id)
+                self._calls = None
+            calls = self._calls
+            if calls is not None and time.monotonic() - self._read_at > self.max_age:
+                calls = None
+            app_ids = frozenset(self._app_ids)
+        if calls is None:
+            # a read already in flight for other apps does not index this one
+            calls = self._flight.run(app_ids, lambda: self._fetch(app_ids), label="pending")
+        return list(calls.get((app_id, address), ()))
+
+    def check(self, app_id: int, address: str) -> None:
+        """Raise `PendingConflict` if a pending call to `app_id` acts on `address`."""
+        check_conflicts(app_id, address, self.calls(app_id, address))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._calls = None
+
+    def _fetch(self, app_ids: Collection[int]) -> Dict[Tuple[int, str], List[PendingCall]]:
+        response = self.client.pending_transactions(self.max_txns, response_format="msgpack")
+        calls = index_pending(response, app_ids)
+        with self._lock:
+            self._calls = calls
+            self._read_at = time.monotonic()
+            self.reads += 1
+        return calls
+
+
+def check_conflicts(app_id: int, address: str, calls: List[PendingCall]) -> None:
+    if calls:
+        raise PendingConflict(f"{address} of app {app_id} is changed by pending calls: {calls}")
+
+
+_pools: "WeakKeyDictionary[AlgodClient, PendingPool]" = WeakKeyDictionary()
+_pools_lock = threading.Lock()
+
+
+def get_pending_pool(client: AlgodClient) -> PendingPool:
+    """Return the pending pool reader shared by everything using `client`."""
+    with _pools_lock:
+        pool = _pools.get(client)
+        if pool is None:
+            pool = PendingPool(client)
+            _pools[client] = pool
+        return pool
+
+
+def _top_transactions(response: bytes) -> Iterator[Dict[str, Any]]:
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(response)
+    for _ in range(unpacker.read_map_header()):
+        if unpacker.unpack() != "top-transactions":
+            unpacker.skip()
+            continue
+        try:
+            count = unpacker.read_array_header()
+        except ValueError:
+            # nil when the pool is empty
+            unpacker.skip()
+            continue
+        for _ in range(count):
+            yield unpacker.unpack()
@@ -0,0 +1,286 @@
+import http.client
+import json
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib import parse
+
+from algosdk import constants, error
+from algosdk.v2client.algod import AlgodClient, api_version_path_prefix
+
+from rate_limit import DEFAULT_RETRY_AFTER, RateLimiter, endpoint_class
+from single_flight import SingleFlight
+
+
+# algod holds wait-for-block-after requests open for up to a minute
+LONG_POLL_PATH = "/status/wait-for-block-after"
+LONG_POLL_TIMEOUT = 70.0
+
+# 429 responses are retried this many times before they reach the caller
+MAX_THROTTLE_RETRIES = 5
+
+# errors meaning a kept-alive connection was closed by the server while idle
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+
+class ConnectionPool:
+    """Thread-safe pool of persistent HTTP connections to one host.
+
+    Args:
+        url: Base URL of the host, e.g. "https://node.example.com:443".
+        size: Maximum number of connections open at once.
+        timeout: Default socket timeout in seconds.
+    """
+
+    def __init__(self, url: str, size: int = 10, timeout: float = 30.0) -> None:
+        parsed = parse.urlsplit(url)
+        self.scheme = parsed.scheme or "http"
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.base_path = parsed.path.rstrip("/")
+        self.size = size
+        self.timeout = timeout
+        self.opened = 0
+
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """Return a connection and whether it was reused from the pool."""
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._connect(), False
+
+    def release(self, conn: http.client.HTTPConnection, reusable: bool = True) -> None:
+        if reusable:
+            self._idle.put(conn)
+        else:
+            conn.close()
+        self._slots.release()
+
+    def replace(self, conn: http.client.HTTPConnection) -> http.client.HTTPConnection:
+        """Close a broken connection and open a new one in the same slot."""
+        conn.close()
+        return self._connect()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _connect(self) -> http.client.HTTPConnection:
+        self.opened += 1
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+
+class LatencyStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed: float, failed: bool = False) -> None:
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        if failed:
+            self.errors += 1
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean": self.mean,
+            "max": self.max,
+        }
+
+
+def endpoint_name(method: str, requrl: str) -> str:
+    """Collapse ids and addresses in a request path, e.g. "GET /v2/accounts/{}"."""
+    segments = []
+    for segment in requrl.split("?")[0].split("/"):
+        if segment.isdigit() or len(segment) >= 26:
+            segment = "{}"
+        segments.append(segment)
+    return "{} {}".format(method, "/".join(segments))
+
+
+class PooledAlgodClient(AlgodClient):
+    """Drop-in AlgodClient that reuses keep-alive connections.
+
+    Requests go through a thread-safe `ConnectionPool`, so the TCP and TLS
+    handshakes are paid once per connection instead of once per call.
+    Every request can take a `timeout` keyword, and latency is recorded per
+    endpoint. With a `RateLimiter` requests wait for a token of their
+    endpoint class before they are sent, and 429 responses pause that class
+    and are resent rather than raised. Without one a 429 is resent after
+    its Retry-After period all the same. Identical GET requests that are in
+    flight at the same time share one round trip and one decoded response.
+
+    Args:
+        algod_token: algod API token.
+        algod_address: algod address.
+        headers: Extra headers for all requests.
+        pool_size: Maximum number of open connections.
+        timeout: Default per-request timeout in seconds.
+        rate_limiter: Optional client-side rate limiter.
+        coalesce_reads: Share concurrent identical GET requests.
+    """
+
+    def __init__(
+        self,
+        algod_token: str,
+        algod_address: str,
+        headers: Optional[Dict[str, str]] = None,
+        pool_size: int = 10,
+        timeout: float = 30.0,
+        rate_limiter: Optional[RateLimiter] = None,
+        coalesce_reads: bool = True,
+    ) -> None:
+        super().__init__(algod_token, algod_address, headers)
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.single_flight = SingleFlight() if coalesce_reads else None
+        self.pool = ConnectionPool(algod_address, size=pool_size, timeout=timeout)
+
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, LatencyStats] = dict()
+
+    def algod_request(
+        self,
+        method,
+        requrl,
+        params=None,
+        data=None,
+        headers=None,
+        response_format="json",
+        timeout=None,
+    ):
+        header = {"User-Agent": "py-algorand-sdk"}
+        if self.headers:
+            header.update(self.headers)
+        if headers:
+            header.update(headers)
+        if requrl not in constants.no_auth:
+            header.update({constants.algod_auth_header: self.algod_token})
+
+        klass = endpoint_class(method, requrl)
+        if requrl not in constants.unversioned_paths:
+            requrl = api_version_path_prefix + requrl
+        if timeout is None:
+            timeout = LONG_POLL_TIMEOUT if LONG_POLL_PATH in requrl else self.timeout
+        if params:
+            requrl = requrl + "?" + parse.urlencode(params)
+
+        name = endpoint_name(method, requrl)
+        if method == "GET" and self.single_flight is not None:
+            key = (requrl, response_format, tuple(sorted(header.items())))
+            return self.single_flight.run(
+                key,
+                lambda: self._request(method, requrl, data, header, response_format, timeout, klass, name),
+                label=name,
+            )
+        return self._request(method, requrl, data, header, response_format, timeout, klass, name)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return latency counters keyed by endpoint."""
+        with self._stats_lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def _request(self, method, requrl, data, header, response_format, timeout, klass, name):
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(klass)
+            start = time.monotonic()
+            try:
+                status, body, retry_after = self._send(
+                    method, self.pool.base_path + requrl, data, header, timeout
+                )
+            except Exception:
+                self._record(name, time.monotonic() - start, failed=True)
+                raise
+            self._record(name, time.monotonic() - start, failed=status >= 400)
+            if status != 429 or attempt == MAX_THROTTLE_RETRIES:
+                break
+            if self.rate_limiter is not None:
+                self.rate_limiter.throttle(klass, retry_after)
+            else:
+                time.sleep(retry_after or DEFAULT_RETRY_AFTER)
+
+        if status >= 400:
+            message = body.decode("utf-8")
+            try:
+                message = json.loads(message)["message"]
+            finally:
+                raise error.AlgodHTTPError(message, status)
+        if response_format == "json":
+            try:
+                return json.loads(body)
+            except Exception as e:
+                raise error.AlgodResponseError(
+                    "Failed to parse JSON response from algod"
+                ) from e
+        return body
+
+    def _send(self, method, path, data, header, timeout) -> Tuple[int, bytes, Optional[float]]:
+        conn, reused = self.pool.acquire()
+        reusable = False
+        try:
+            while True:
+                try:
+                    _set_timeout(conn, timeout)
+                    conn.request(method, path, body=data, headers=header)
+                    resp = conn.getresponse()
+                    body = resp.read()
+                    reusable = not resp.will_close
+                    return resp.status, body, _retry_after(resp)
+                except _STALE_CONNECTION_ERRORS:
+                    # only retry if the server dropped an idle connection
+                    if not reused:
+                        raise
+                    conn = self.pool.replace(conn)
+                    reused = False
+        finally:
+            self.pool.release(conn, reusable)
+
+    def _record(self, name: str, elapsed: float, failed: bool = False) -> None:
+        with self._stats_lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = LatencyStats()
+                self._stats[name] = stats
+            stats.add(elapsed, failed)
+
+
+def _retry_after(resp: http.client.HTTPResponse) -> Optional[float]:
+    try:
+        return float(resp.getheader("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _set_timeout(conn: http.client.HTTPConnection, timeout: float) -> None:
+    conn.timeout = timeout
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout)
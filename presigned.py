@@ -0,0 +1,198 @@
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional
+from weakref import WeakKeyDictionary
+
+from algosdk.future.transaction import SuggestedParams
+from algosdk.v2client.algod import AlgodClient
+
+from confirmation import get_confirmation_waiter
+from raw_submit import EncodedGroup, send_raw_group
+from suggested_params import get_params_provider
+
+
+# the protocol's limit on last valid minus first valid
+MAX_VALIDITY = 1000
+LEASE_SIZE = 32
+
+logger = logging.getLogger(__name__)
+
+
+class PresignedGroup:
+    """A group built and signed ahead of time, so that sending it is one request.
+
+    `build(sp, lease)` returns the signed transactions of the group. It is
+    called with params whose validity window spans `window` rounds, and
+    with a lease that stays the same for the life of the template. The
+    builder puts the lease on one transaction of the group, so at most one
+    signed copy of the template can ever be confirmed, however many
+    refreshes were signed.
+
+    The template is rebuilt by the client's `TemplateRefresher` once its
+    last valid round is `refresh_margin` rounds away. Call `refresh` after
+    a state change the group depends on, e.g. a new lead bidder. Once the
+    template has been sent it is spent and no longer refreshed, since a
+    refreshed copy could confirm again after the sent one expires.
+
+    Args:
+        client: An algod client.
+        build: Builds and signs the group for the given params and lease.
+        window: Rounds the signed group stays valid for.
+        refresh_margin: Rounds before the last valid round at which the
+            group is rebuilt.
+    """
+
+    def __init__(
+        self,
+        client: AlgodClient,
+        build: Callable[[SuggestedParams, bytes], List[Any]],
+        window: int = MAX_VALIDITY,
+        refresh_margin: int = 50,
+    ) -> None:
+        if not 0 < refresh_margin < window <= MAX_VALIDITY:
+            raise Exception(f"Need 0 < refresh_margin < window <= {MAX_VALIDITY}")
+        self.client = client
+        self.build = build
+        self.window = window
+        self.refresh_margin = refresh_margin
+        self.lease = os.urandom(LEASE_SIZE)
+        self.spent = False
+        self.refreshes = 0
+        self.error: Optional[Exception] = None
+
+        self._lock = threading.Lock()
+        self._signed: List[Any] = []
+        self._encoded: Optional[EncodedGroup] = None
+        self.refresh()
+        get_template_refresher(client).add(self)
+
+    @property
+    def signed_transactions(self) -> List[Any]:
+        with self._lock:
+            return list(self._signed)
+
+    @property
+    def tx_ids(self) -> List[str]:
+        return self._encoded.tx_ids
+
+    @property
+    def last_valid(self) -> int:
+        return self._encoded.last_valid
+
+    def refresh(self) -> None:
+        """Build and sign the group again with a fresh validity window."""
+        if self.spent:
+            raise Exception("The template was sent or cancelled already")
+        sp = get_params_provider(self.client).get()
+        sp.last = sp.first + self.window
+        signed_txns = self.build(sp, self.lease)
+        encoded = EncodedGroup.encode(signed_txns)
+        with self._lock:
+            # sent or cancelled while this copy was built, it must not replace the sent one
+            if self.spent:
+                raise Exception("The template was sent or cancelled already")
+            self._signed = signed_txns
+            self._encoded = encoded
+            self.refreshes += 1
+            self.error = None
+
+    def due(self, current_round: int) -> bool:
+        return not self.spent and current_round >= self.last_valid - self.refresh_margin
+
+    def send(self) -> EncodedGroup:
+        """Send the signed group as it is.
+
+        The template is spent once algod accepts it; a failed send leaves
+        it valid to be sent again.
+
+        Returns:
+            The group as it was sent.
+        """
+        with self._lock:
+            if self.spent:
+                raise Exception("The template was sent or cancelled already")
+            encoded = self._encoded
+        send_raw_group(self.client, encoded.data)
+        with self._lock:
+            self.spent = True
+        return encoded
+
+    def send_and_wait(self) -> List[Dict[str, Any]]:
+        """Send the group and wait for it to be confirmed."""
+        encoded = self.send()
+        waiter = get_confirmation_waiter(self.client)
+        return waiter.track_group(encoded.tx_ids, last_valid=encoded.last_valid).result()
+
+    def cancel(self) -> None:
+        """Stop refreshing the template."""
+        with self._lock:
+            self.spent = True
+        get_template_refresher(self.client).remove(self)
+
+
+class TemplateRefresher:
+    """One background thread keeping every template of a client valid.
+
+    Every `interval` seconds it reads the current round once and rebuilds
+    the templates that are due. A failed rebuild is kept on the template's
+    `error` and retried on the next pass.
+    """
+
+    def __init__(self, client: AlgodClient, interval: float = 5.0) -> None:
+        self.client = client
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._templates: "weakref.WeakSet[PresignedGroup]" = weakref.WeakSet()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, template: PresignedGroup) -> None:
+        with self._lock:
+            self._templates.add(template)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="template-refresher", daemon=True)
+                self._thread.start()
+
+    def remove(self, template: PresignedGroup) -> None:
+        with self._lock:
+            self._templates.discard(template)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                templates = [template for template in self._templates if not template.spent]
+                if not templates:
+                    self._thread = None
+                    return
+            try:
+                current_round = self.client.status()["last-round"]
+            except Exception as e:
+                logger.warning("Template refresh skipped: %s", e)
+                continue
+            for template in templates:
+                if not template.due(current_round):
+                    continue
+                try:
+                    template.refresh()
+                except Exception as e:
+                    # a template sent meanwhile is no longer refreshed
+                    if not template.spent:
+                        template.error = e
+
+
+_refreshers: "WeakKeyDictionary[AlgodClient, TemplateRefresher]" = WeakKeyDictionary()
+_refreshers_lock = threading.Lock()
+
+
+def get_template_refresher(client: AlgodClient) -> TemplateRefresher:
+    """Return the template refresher shared by everything using `client`."""
+    with _refreshers_lock:
+        refresher = _refreshers.get(client)
+        if refresher is None:
+            refresher = TemplateRefresher(client)
+            _refreshers[client] = refresher
+        return refresher
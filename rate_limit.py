@@ -0,0 +1,255 @@
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+# endpoint classes, each with its own token bucket
+SUBMIT = "submit"
+STATUS = "status"
+READ = "read"
+
+# priorities, lower goes first
+PRIORITY_SUBMIT = 0
+PRIORITY_CONFIRM = 1
+PRIORITY_INTERACTIVE = 2
+PRIORITY_BACKGROUND = 3
+
+# (requests per second, burst) for each endpoint class
+DEFAULT_LIMITS: Dict[str, Tuple[float, int]] = {
+    SUBMIT: (10.0, 10),
+    STATUS: (10.0, 10),
+    READ: (25.0, 50),
+}
+
+_DEFAULT_PRIORITY = {
+    SUBMIT: PRIORITY_SUBMIT,
+    STATUS: PRIORITY_CONFIRM,
+    READ: PRIORITY_INTERACTIVE,
+}
+
+# seconds to back off after a 429 that carries no Retry-After header
+DEFAULT_RETRY_AFTER = 1.0
+
+# priority of the calls made by the current thread or task, see `priority`
+_priority: "contextvars.ContextVar[Optional[int]]" = contextvars.ContextVar("priority", default=None)
+
+
+def endpoint_class(method: str, requrl: str) -> str:
+    """Classify an unversioned algod path, e.g. "/transactions/params"."""
+    if method == "POST" and requrl == "/transactions":
+        return SUBMIT
+    if requrl.startswith(("/status", "/transactions/pending", "/transactions/params")):
+        return STATUS
+    return READ
+
+
+@contextlib.contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Run the calls made by this thread, or this asyncio task, inside the
+    block at `level`.
+
+    Bulk jobs wrap their work in `priority(PRIORITY_BACKGROUND)` so that
+    interactive calls sharing the client are scheduled ahead of them.
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority(klass: str) -> int:
+    level = _priority.get()
+    default = _DEFAULT_PRIORITY[klass]
+    if level is None:
+        return default
+    if klass == READ:
+        return level
+    # a background thread still submits and confirms ahead of any read
+    return min(level, default)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available, 0 if one is available now."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def pause(self, now: float, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = self.paused_until
+
+
+class RateLimiter:
+    """Client-side token buckets with a priority queue per endpoint class.
+
+    `acquire` blocks until the caller may send; among callers waiting on the
+    same bucket the lowest priority value goes first, then arrival order.
+    A 429 from the server is reported through `throttle`, which empties the
+    bucket and pauses it for the Retry-After period, so the request is
+    delayed and resent instead of failing.
+
+    `backlog` and `delay` let bulk jobs see the pressure and pace
+    themselves before they are queued.
+
+    Args:
+        limits: (requests per second, burst) per endpoint class.
+            Classes left out are not limited.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, int]]] = None) -> None:
+        if limits is None:
+            limits = DEFAULT_LIMITS
+        self._buckets = {klass: TokenBucket(rate, burst) for klass, (rate, burst) in limits.items()}
+        self._waiting: Dict[str, list] = {klass: [] for klass in self._buckets}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+        self.acquired = 0
+        self.delayed = 0
+        self.waited = 0.0
+        self.throttled = 0
+
+    def acquire(self, klass: str, level: Optional[int] = None) -> float:
+        """Wait for a token of `klass` and return the seconds spent waiting."""
+        bucket = self._buckets.get(klass)
+        if bucket is None:
+            return 0.0
+        if level is None:
+            level = current_priority(klass)
+
+        waiting = self._waiting[klass]
+        entry = (level, next(self._seq))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(waiting, entry)
+            self._cond.notify_all()
+            try:
+                while True:
+                    timeout = None
+                    if waiting[0] == entry:
+                        timeout = bucket.delay(time.monotonic())
+                        if timeout <= 0:
+                            bucket.take()
+                            break
+                    self._cond.wait(timeout)
+            finally:
+                waiting.remove(entry)
+                heapq.heapify(waiting)
+                self._cond.notify_all()
+
+            waited = time.monotonic() - start
+            self.acquired += 1
+            if waited > 0.001:
+                self.delayed += 1
+                self.waited += waited
+        return waited
+
+    def throttle(self, klass: str, retry_after: Optional[float] = None) -> None:
+        """Record a 429 for `klass` and hold its bucket for `retry_after` seconds."""
+        bucket = self._buckets.get(klass)
+        with self._cond:
+            self.throttled += 1
+            if bucket is not None:
+                bucket.pause(time.monotonic(), retry_after or DEFAULT_RETRY_AFTER)
+            self._cond.notify_all()
+
+    def backlog(self) -> Dict[str, int]:
+        """Return the number of callers queued on each endpoint class."""
+        with self._cond:
+            return {klass: len(waiting) for klass, waiting in self._waiting.items()}
+
+    def delay(self, klass: str) -> float:
+        """Estimate how long a request of `klass` queued now would wait."""
+        bucket = self._buckets.get(klass)
+        if bucket is None:
+            return 0.0
+        with self._cond:
+            ahead = len(self._waiting[klass])
+            return bucket.delay(time.monotonic()) + ahead / bucket.rate
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "acquired": self.acquired,
+                "delayed": self.delayed,
+                "waited": self.waited,
+                "throttled": self.throttled,
+                "backlog": {klass: len(waiting) for klass, waiting in self._waiting.items()},
+            }
+
+
+class AsyncRateLimiter(RateLimiter):
+    """asyncio counterpart of `RateLimiter`, for the clients of one event loop.
+
+    `acquire` is a coroutine and the waiting callers are scheduled the same
+    way: by priority, then arrival order. `throttle`, `backlog`, `delay` and
+    `stats` are those of `RateLimiter`.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, int]]] = None) -> None:
+        super().__init__(limits)
+        self._async_cond: Optional[asyncio.Condition] = None
+
+    async def acquire(self, klass: str, level: Optional[int] = None) -> float:
+        """Wait for a token of `klass` and return the seconds spent waiting."""
+        bucket = self._buckets.get(klass)
+        if bucket is None:
+            return 0.0
+        if level is None:
+            level = current_priority(klass)
+        if self._async_cond is None:
+            self._async_cond = asyncio.Condition()
+
+        cond = self._async_cond
+        waiting = self._waiting[klass]
+        entry = (level, next(self._seq))
+        start = time.monotonic()
+        async with cond:
+            heapq.heappush(waiting, entry)
+            cond.notify_all()
+            try:
+                while True:
+                    timeout = None
+                    if waiting[0] == entry:
+                        timeout = bucket.delay(time.monotonic())
+                        if timeout <= 0:
+                            bucket.take()
+                            break
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                waiting.remove(entry)
+                heapq.heapify(waiting)
+                cond.notify_all()
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self.acquired += 1
+            if waited > 0.001:
+                self.delayed += 1
+                self.waited += waited
+        return waited
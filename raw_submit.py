@@ -0,0 +1,260 @@
+import base64
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import msgpack
+from algosdk import constants, encoding
+from algosdk.v2client.algod import AlgodClient
+
+
+RAW_HEADERS = {"Content-Type": "application/x-binary"}
+
+_TXN_KEY = msgpack.packb("txn", use_bin_type=True)
+
+try:
+    hashlib.new("sha512_256")
+    _SHA512_256 = True
+except ValueError:
+    # OpenSSL without SHA-512/256, fall back to the SDK's pure implementation
+    _SHA512_256 = False
+
+
+def encode_signed(signed_txn: Any) -> Tuple[bytes, str]:
+    """Canonical msgpack of a signed transaction, as algod expects it, and its ID.
+
+    The inner transaction is encoded once and used for both, where
+    `msgpack_encode` followed by `get_txid` would encode it twice.
+    """
+    encoded, txn = _encode_parts(signed_txn)
+    return encoded, txid_of(txn)
+
+
+def encode_txn(txn: Any) -> bytes:
+    """Canonical msgpack of an unsigned transaction."""
+    return msgpack.packb(encoding._sort_dict(txn.dictify()), use_bin_type=True)
+
+
+def assemble_signed(fields: Dict[str, Any], txn: bytes) -> bytes:
+    """Encode a signed transaction from its signature fields and encoded `txn`."""
+    fields = encoding._sort_dict(fields)
+    # "txn" sorts after "lsig", "msig", "sgnr" and "sig", so it goes last
+    head = msgpack.packb(fields, use_bin_type=True)
+    return bytes([0x80 | (len(fields) + 1)]) + head[1:] + _TXN_KEY + txn
+
+
+def txid_of(txn: bytes) -> str:
+    """The ID of the transaction encoded as `txn`."""
+    data = constants.txid_prefix + txn
+    digest = hashlib.new("sha512_256", data).digest() if _SHA512_256 else encoding.checksum(data)
+    return base64.b32encode(digest).decode().rstrip("=")
+
+
+class EncodedGroup:
+    """A signed group kept as the bytes algod receives.
+
+    Args:
+        data: The concatenated encoded transactions.
+        tx_ids: The transaction IDs, in group order. None to hash them from
+            `txns` the first time they are read.
+        last_valid: The last round in which the whole group is valid.
+        txns: The encoded unsigned transactions, when `tx_ids` is None.
+    """
+
+    def __init__(self, data: Any, tx_ids: Optional[List[str]], last_valid: int,
+                 txns: Optional[List[bytes]] = None) -> None:
+        self.data = data
+        self.last_valid = last_valid
+        self._tx_ids = tx_ids
+        self._txns = txns
+
+    @property
+    def tx_ids(self) -> List[str]:
+        if self._tx_ids is None:
+            self._tx_ids = [txid_of(txn) for txn in self._txns]
+            self._txns = None
+        return self._tx_ids
+
+    @classmethod
+    def encode(cls, signed_txns: Sequence[Any]) -> "EncodedGroup":
+        """Encode a signed group; its IDs are only hashed once they are read,
+        so a group can be posted before any of that work is done."""
+        parts = [_encode_parts(signed_txn) for signed_txn in signed_txns]
+        return cls(
+            b"".join(encoded for encoded, _ in parts),
+            None,
+            min(signed_txn.transaction.last_valid_round for signed_txn in signed_txns),
+            [txn for _, txn in parts],
+        )
+
+
+class EncodedBatch:
+    """Many signed groups encoded into one buffer.
+
+    Each group is a `memoryview` of the shared buffer, so handing a group to
+    `send_raw_group` copies nothing.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+        self.tx_ids: List[List[str]] = []
+        self.last_valid: List[int] = []
+        self._offsets: List[int] = [0]
+
+    def add(self, signed_txns: Sequence[Any]) -> None:
+        tx_ids = []
+        for signed_txn in signed_txns:
+            encoded, tx_id = encode_signed(signed_txn)
+            self.buffer += encoded
+            tx_ids.append(tx_id)
+        self._offsets.append(len(self.buffer))
+        self.tx_ids.append(tx_ids)
+        self.last_valid.append(min(signed_txn.transaction.last_valid_round for signed_txn in signed_txns))
+
+    def add_encoded(self, encoded_txns: Sequence[Tuple[bytes, str]], last_valid: int) -> None:
+        """Add a group from (encoded signed transaction, ID) pairs."""
+        for data, _ in encoded_txns:
+            self.buffer += data
+        self._offsets.append(len(self.buffer))
+        self.tx_ids.append([tx_id for _, tx_id in encoded_txns])
+        self.last_valid.append(last_valid)
+
+    def extend(self, other: "EncodedBatch") -> None:
+        base = len(self.buffer)
+        self.buffer += other.buffer
+        self._offsets.extend(base + offset for offset in other._offsets[1:])
+        self.tx_ids.extend(other.tx_ids)
+        self.last_valid.extend(other.last_valid)
+
+    def __len__(self) -> int:
+        return len(self.tx_ids)
+
+    def __getitem__(self, i: int) -> EncodedGroup:
+        view = memoryview(self.buffer)[self._offsets[i]:self._offsets[i + 1]]
+        return EncodedGroup(view, self.tx_ids[i], self.last_valid[i])
+
+    def __iter__(self) -> Iterator[EncodedGroup]:
+        return (self[i] for i in range(len(self)))
+
+
+def encode_groups(groups: Sequence[Sequence[Any]], workers: int = 0, chunk_size: int = 256) -> EncodedBatch:
+    """Encode thousands of signed groups into one `EncodedBatch`.
+
+    Args:
+        groups: Lists of signed transactions, one per group.
+        workers: Processes to encode in, 0 to encode in this process.
+        chunk_size: Groups encoded per task when `workers` is set.
+    """
+    if not workers:
+        return _encode_chunk(groups)
+    chunks = [groups[i:i + chunk_size] for i in range(0, len(groups), chunk_size)]
+    batch = EncodedBatch()
+    with ProcessPoolExecutor(workers) as executor:
+        for part in executor.map(_encode_chunk, chunks):
+            batch.extend(part)
+    return batch
+
+
+def send_raw_group(client: AlgodClient, data: Any) -> str:
+    """Post an encoded group to algod as it is and return the first transaction ID.
+
+    Unlike `send_transactions` this neither encodes the transactions nor
+    round-trips them through base64.
+    """
+    return client.algod_request("POST", "/transactions", data=data, headers=RAW_HEADERS)["txId"]
+
+
+def _encode_parts(signed_txn: Any) -> Tuple[bytes, bytes]:
+    fields = signed_txn.dictify()
+    txn = msgpack.packb(encoding._sort_dict(fields.pop("txn")), use_bin_type=True)
+    return assemble_signed(fields, txn), txn
+
+
+def _encode_chunk(groups: Sequence[Sequence[Any]]) -> EncodedBatch:
+    batch = EncodedBatch()
+    for signed_txns in groups:
+        batch.add(signed_txns)
+    return batch
+
+
+class _NullAlgod(AlgodClient):
+    """Accepts submissions without sending them, to time the client side alone."""
+
+    def __init__(self) -> None:
+        super().__init__("a" * 64, "http://localhost")
+        self.posted = bytearray()
+
+    def algod_request(self, method, requrl, params=None, data=None, headers=None, response_format="json"):
+        self.posted += data
+        return {"txId": ""}
+
+
+def benchmark(groups: int = 2000, group_size: int = 4, workers: Optional[int] = None) -> None:
+    """Time `TransactionGroup.submit` against raw submission, end to end.
+
+    Both sides start from signed groups. `submit` is compared with
+    `EncodedGroup.encode` followed by `send_raw_group`, then both again
+    with the transaction IDs that confirmation tracking needs: `get_txid`
+    on the old path, `EncodedGroup.tx_ids` on the raw one. Resends and
+    batch encoding with `encode_groups` are timed on top.
+    """
+    from algosdk import account
+    from algosdk.future import transaction
+
+    from utils import TransactionGroup
+
+    private_key, address = account.generate_account()
+    sp = transaction.SuggestedParams(1000, 1, 1000, "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=", flat_fee=True)
+    signed_groups = []
+    for g in range(groups):
+        txns = [transaction.PaymentTxn(address, sp, address, g * group_size + i) for i in range(group_size)]
+        group = TransactionGroup(txns)
+        group.signed_transactions = [txn.sign(private_key) for txn in group.transactions]
+        signed_groups.append(group)
+
+    client = _NullAlgod()
+    start = time.perf_counter()
+    for group in signed_groups:
+        group.submit(client)
+    submit_time = time.perf_counter() - start
+    start = time.perf_counter()
+    old_ids = [[txn.get_txid() for txn in group.transactions] for group in signed_groups]
+    txid_time = time.perf_counter() - start
+
+    raw_client = _NullAlgod()
+    start = time.perf_counter()
+    encoded_groups = []
+    for group in signed_groups:
+        encoded = EncodedGroup.encode(group.signed_transactions)
+        send_raw_group(raw_client, encoded.data)
+        encoded_groups.append(encoded)
+    raw_time = time.perf_counter() - start
+    start = time.perf_counter()
+    raw_ids = [encoded.tx_ids for encoded in encoded_groups]
+    raw_txid_time = time.perf_counter() - start
+    assert raw_client.posted == client.posted
+    assert raw_ids == old_ids
+
+    resend_client = _NullAlgod()
+    start = time.perf_counter()
+    for encoded in encoded_groups:
+        send_raw_group(resend_client, encoded.data)
+    resend_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    encode_groups([group.signed_transactions for group in signed_groups], workers=workers or 0)
+    batch_time = time.perf_counter() - start
+
+    print(f"{groups} groups of {group_size} transactions, {len(client.posted)} bytes")
+    print(f"submit:                   {submit_time * 1000:8.1f} ms")
+    print(f"encode + send_raw_group:  {raw_time * 1000:8.1f} ms  ({submit_time / raw_time:.2f}x)")
+    print(f"submit + get_txid:        {(submit_time + txid_time) * 1000:8.1f} ms")
+    print(f"encode + send + tx_ids:   {(raw_time + raw_txid_time) * 1000:8.1f} ms  "
+          f"({(submit_time + txid_time) / (raw_time + raw_txid_time):.2f}x)")
+    print(f"resend encoded:           {resend_time * 1000:8.1f} ms  ({submit_time / resend_time:.1f}x)")
+    print(f"encode_groups:            {batch_time * 1000:8.1f} ms  (workers={workers or 0})")
+
+
+if __name__ == "__main__":
+    benchmark()
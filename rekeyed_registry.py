@@ -0,0 +1,339 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rekeyed_addresses.db")
+# the registry before it moved to SQLite, imported once into a new database
+LEGACY_JSON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rekeyed_addresses.json")
+
+# states of a slot in one app
+SLOT_NEW = 0
+SLOT_FREE = 1
+SLOT_IN_USE = 2
+# being closed by the reclaimer, see `RekeyedRegistry.reserve_idle`
+SLOT_CLOSING = 3
+
+# app ID under which a slot never used with any app is reserved as closing
+NO_APP = 0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slots (
+    address TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    optedin INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS slots_owner ON slots (owner, created_at, address);
+CREATE TABLE IF NOT EXISTS slot_apps (
+    address TEXT NOT NULL,
+    app_id INTEGER NOT NULL,
+    owner TEXT NOT NULL,
+    state INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (address, app_id)
+);
+CREATE INDEX IF NOT EXISTS slot_apps_lookup ON slot_apps (owner, app_id, state, created_at, address);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class RekeyedRegistry:
+    """SQLite registry of the rekeyed addresses each owner uses as listing slots.
+
+    Every slot is a rekeyed account signed for by its owner. `slots` keeps
+    the owner and creation time of each; `slot_apps` keeps its state in
+    every app it was used with: new (not opted in), free (opted in, no
+    listing), in use, or closing while the reclaimer recovers its
+    balance. Both are indexed by owner, app, state and creation time, so
+    lookups stay logarithmic however many slots an owner holds.
+
+    Writes run in `BEGIN IMMEDIATE` transactions on a WAL database, so any
+    number of threads and processes can update it at once; `claim` moves a
+    slot from one state to another atomically, so no two callers get the
+    same slot. Each thread keeps its own connection.
+
+    A new database imports `legacy_json`, the registry's former
+    rekeyed_addresses.json, once.
+
+    Args:
+        path: The database file.
+        legacy_json: A JSON registry to import into a new database.
+        timeout: Seconds to wait for another writer to finish.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, legacy_json: Optional[str] = LEGACY_JSON_PATH,
+                 timeout: float = 30.0) -> None:
+        self.path = path
+        self.timeout = timeout
+
+        self._local = threading.local()
+        self._read().executescript(_SCHEMA)
+        if legacy_json is not None and os.path.exists(legacy_json):
+            self.import_json(legacy_json)
+
+    def add(self, owner: str, address: str, optedin: int = 0) -> None:
+        """Register `address` as a slot of `owner`, or update its opted-in flag."""
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO slots (address, owner, optedin, created_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (address) DO UPDATE SET owner = excluded.owner, optedin = excluded.optedin",
+                (address, owner, optedin, time.time()),
+            )
+            conn.execute("UPDATE slot_apps SET owner = ? WHERE address = ?", (owner, address))
+
+    def remove(self, address: str) -> None:
+        with self._write() as conn:
+            conn.execute("DELETE FROM slot_apps WHERE address = ?", (address,))
+            conn.execute("DELETE FROM slots WHERE address = ?", (address,))
+
+    def addresses(self, owner: str) -> List[str]:
+        """The slots of `owner`, oldest first."""
+        rows = self._read().execute(
+            "SELECT address FROM slots WHERE owner = ? ORDER BY created_at, address", (owner,)
+        )
+        return [address for address, in rows]
+
+    def owner(self, address: str) -> Optional[str]:
+        row = self._read().execute("SELECT owner FROM slots WHERE address = ?", (address,)).fetchone()
+        return row[0] if row else None
+
+    def all(self) -> Dict[str, Dict[str, int]]:
+        """Every slot as {owner: {address: optedin}}, the shape of the former JSON file."""
+        result: Dict[str, Dict[str, int]] = dict()
+        for owner, address, optedin in self._read().execute(
+                "SELECT owner, address, optedin FROM slots ORDER BY owner, created_at, address"):
+            result.setdefault(owner, dict())[address] = optedin
+        return result
+
+    def set_state(self, address: str, app_id: int, state: int) -> None:
+        """Record the state of slot `address` in `app_id`."""
+        now = time.time()
+        with self._write() as conn:
+            row = conn.execute("SELECT owner FROM slots WHERE address = ?", (address,)).fetchone()
+            if row is None:
+                raise Exception(f"{address} is not a registered slot")
+            conn.execute(
+                "INSERT INTO slot_apps (address, app_id, owner, state, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (address, app_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                (address, app_id, row[0], state, now, now),
+            )
+
+    def index(self, address: str, app_id: int, state: int) -> bool:
+        """Record the state of slot `address` in `app_id` unless it is already
+        indexed there, so that one caller only gets to look a slot up.
+
+        Returns:
+            Whether the state was recorded.
+        """
+        now = time.time()
+        with self._write() as conn:
+            row = conn.execute("SELECT owner FROM slots WHERE address = ?", (address,)).fetchone()
+            if row is None:
+                raise Exception(f"{address} is not a registered slot")
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO slot_apps (address, app_id, owner, state, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (address, app_id, row[0], state, now, now),
+            )
+            return cursor.rowcount > 0
+
+    def mark(self, address: str, app_id: int, state: int) -> bool:
+        """Record the state of slot `address` in `app_id` if it is already
+        indexed there.
+
+        Returns:
+            Whether the slot was indexed in `app_id`.
+        """
+        with self._write() as conn:
+            cursor = conn.execute(
+                "UPDATE slot_apps SET state = ?, updated_at = ? WHERE address = ? AND app_id = ?",
+                (state, time.time(), address, app_id),
+            )
+            return cursor.rowcount > 0
+
+    def state(self, address: str, app_id: int) -> Optional[int]:
+        """The state of slot `address` in `app_id`, None if it was never used with it."""
+        row = self._read().execute(
+            "SELECT state FROM slot_apps WHERE address = ? AND app_id = ?", (address, app_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def find(self, owner: str, app_id: int, state: int, limit: int = 1) -> List[str]:
+        """Slots of `owner` in `state` for `app_id`, oldest first."""
+        rows = self._read().execute(
+            "SELECT address FROM slot_apps WHERE owner = ? AND app_id = ? AND state = ? "
+            "ORDER BY created_at, address LIMIT ?",
+            (owner, app_id, state, limit),
+        )
+        return [address for address, in rows]
+
+    def unused(self, owner: str, app_id: int, limit: int = 1) -> List[str]:
+        """Slots of `owner` never used with `app_id`, oldest first."""
+        # each candidate is probed on the (address, app_id) primary key
+        rows = self._read().execute(
+            "SELECT s.address FROM slots s "
+            "LEFT JOIN slot_apps a ON a.address = s.address AND a.app_id = ? "
+            "WHERE s.owner = ? AND a.address IS NULL AND NOT EXISTS "
+            "(SELECT 1 FROM slot_apps c WHERE c.address = s.address AND c.state = ?) "
+            "ORDER BY s.created_at, s.address LIMIT ?",
+            (app_id, owner, SLOT_CLOSING, limit),
+        )
+        return [address for address, in rows]
+
+    def reserve_idle(self, owner: str, before: float, keep: int = 0, limit: int = 1) -> List[str]:
+        """Atomically mark idle slots of `owner` as closing, oldest first.
+
+        A slot is idle when it was registered before `before` and is new or
+        free in every app it was used with, if any, none of its states
+        having changed since `before`. The `keep` newest free slots of every
+        app stay out of it. A slot never used with any app, such as one
+        imported from the JSON registry, is reserved under `NO_APP`.
+
+        Returns:
+            The reserved slots, which `claim` and `unused` no longer return.
+        """
+        with self._write() as conn:
+            rows = conn.execute(
+                "WITH ranked AS ("
+                "  SELECT address, state, updated_at, ROW_NUMBER() OVER "
+                "    (PARTITION BY app_id, state ORDER BY created_at DESC, address DESC) AS rank "
+                "  FROM slot_apps WHERE owner = ?"
+                ") "
+                "SELECT address FROM slots WHERE owner = ? AND created_at < ? "
+                "AND address NOT IN (SELECT address FROM ranked WHERE state NOT IN (?, ?) "
+                "  OR updated_at >= ? OR (state = ? AND rank <= ?)) "
+                "ORDER BY created_at, address LIMIT ?",
+                (owner, owner, before, SLOT_NEW, SLOT_FREE, before, SLOT_FREE, keep, limit),
+            ).fetchall()
+            addresses = [address for address, in rows]
+            now = time.time()
+            conn.executemany(
+                "UPDATE slot_apps SET state = ?, updated_at = ? WHERE address = ?",
+                [(SLOT_CLOSING, now, address) for address in addresses],
+            )
+            conn.executemany(
+                "INSERT INTO slot_apps (address, app_id, owner, state, created_at, updated_at) "
+                "SELECT ?, ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM slot_apps WHERE address = ?)",
+                [(address, NO_APP, owner, SLOT_CLOSING, now, now, address) for address in addresses],
+            )
+        return addresses
+
+    def unreserve(self, address: str) -> None:
+        """Give back a slot `reserve_idle` returned but that was not closed.
+
+        Its states are forgotten, so the next listing in each app looks the
+        slot up on the network again.
+        """
+        with self._write() as conn:
+            conn.execute("DELETE FROM slot_apps WHERE address = ? AND state = ?", (address, SLOT_CLOSING))
+
+    def claim(self, owner: str, app_id: int, state: int = SLOT_FREE, new_state: int = SLOT_IN_USE) -> Optional[str]:
+        """Atomically move the oldest slot of `owner` in `state` to `new_state`.
+
+        Returns:
+            The claimed slot, or None when `owner` has none in `state`.
+        """
+        with self._write() as conn:
+            row = conn.execute(
+                "SELECT address FROM slot_apps WHERE owner = ? AND app_id = ? AND state = ? "
+                "ORDER BY created_at, address LIMIT 1",
+                (owner, app_id, state),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE slot_apps SET state = ?, updated_at = ? WHERE address = ? AND app_id = ?",
+                (new_state, time.time(), row[0], app_id),
+            )
+            return row[0]
+
+    def count(self, owner: str, app_id: Optional[int] = None, state: Optional[int] = None) -> int:
+        if app_id is None:
+            query, args = "SELECT COUNT(*) FROM slots WHERE owner = ?", (owner,)
+        elif state is None:
+            query, args = "SELECT COUNT(*) FROM slot_apps WHERE owner = ? AND app_id = ?", (owner, app_id)
+        else:
+            query = "SELECT COUNT(*) FROM slot_apps WHERE owner = ? AND app_id = ? AND state = ?"
+            args = (owner, app_id, state)
+        return self._read().execute(query, args).fetchone()[0]
+
+    def import_json(self, path: str) -> int:
+        """Import a JSON registry of {owner: {address: optedin}}, once per database.
+
+        Returns:
+            The number of slots imported, 0 if the file was imported before.
+        """
+        with open(path, "r") as f:
+            legacy = json.load(f)
+        key = "imported:" + os.path.abspath(path)
+        imported = 0
+        now = time.time()
+        with self._write() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return 0
+            for owner, addresses in legacy.items():
+                for address, optedin in addresses.items():
+                    # keep the order of the file as the creation order
+                    conn.execute(
+                        "INSERT OR IGNORE INTO slots (address, owner, optedin, created_at) VALUES (?, ?, ?, ?)",
+                        (address, owner, optedin, now + imported * 1e-6),
+                    )
+                    imported += 1
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, str(imported)))
+        return imported
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _read(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # a connection must not be used by a process forked after it was opened
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _write(self) -> "_Transaction":
+        return _Transaction(self._read())
+
+
+class _Transaction:
+    """A `BEGIN IMMEDIATE` transaction, holding the write lock from the start."""
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+
+
+_registry: Optional[RekeyedRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_rekeyed_registry() -> RekeyedRegistry:
+    """Return the registry shared by the process, opening it on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = RekeyedRegistry()
+        return _registry
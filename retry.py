@@ -0,0 +1,23 @@
+import http.client
+import random
+
+from algosdk.error import AlgodHTTPError
+
+
+# fragments of algod rejections worth retrying as they are
+TRANSIENT_ERRORS = ("pool have reached capacity", "pool is full", "timed out", "timeout")
+
+
+def is_transient(e: Exception) -> bool:
+    """Whether the same request may succeed if it is made again."""
+    if isinstance(e, AlgodHTTPError):
+        if e.code is None or e.code == 429 or e.code >= 500:
+            return True
+        message = str(e).lower()
+        return any(fragment in message for fragment in TRANSIENT_ERRORS)
+    return isinstance(e, (OSError, EOFError, http.client.HTTPException))
+
+
+def backoff(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff for retry number `attempt`, counted from 1."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
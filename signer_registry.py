@@ -0,0 +1,112 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+from algosdk import account
+from algosdk.future.transaction import LogicSigTransaction
+
+from account import Account
+from signing_engine import SigningEngine
+
+
+class SignerRegistry:
+    """Knows what signs for every address a group may send from.
+
+    Signers are kept by the address they sign as: an Account, a private
+    key, or a LogicSig / LogicSigAccount, whose address is computed once
+    when it is added. Senders rekeyed to another address are mapped to it,
+    so a rekeyed address is signed by whatever signs for its auth address.
+    `sign_group` then signs any group, whatever mix of accounts, rekeyed
+    addresses and logic signatures it sends from, in a single pass.
+    """
+
+    def __init__(self) -> None:
+        self._signers: Dict[str, Any] = dict()
+        self._auth: Dict[str, str] = dict()
+
+    @classmethod
+    def from_accounts(
+        cls,
+        accounts: Iterable[Account],
+        rekeyed_addresses: Optional[Dict[str, Dict[str, int]]] = None,
+        logicsigs: Iterable[Any] = (),
+    ) -> "SignerRegistry":
+        """Build a registry from accounts and the rekeyed address registry.
+
+        Args:
+            accounts: The accounts to sign with.
+            rekeyed_addresses: Map from owner address to its rekeyed
+                addresses, as `utils.read_rekeyed_addresses` returns it.
+                Every rekeyed address is signed by its owner.
+            logicsigs: Logic signatures to sign with.
+        """
+        registry = cls()
+        for acct in accounts:
+            registry.add(acct)
+        for logicsig in logicsigs:
+            registry.add(logicsig)
+        for owner, addresses in (rekeyed_addresses or {}).items():
+            for address in addresses:
+                registry.add_rekeyed(address, owner)
+        return registry
+
+    def add(self, signer: Any, address: Optional[str] = None) -> str:
+        """Register an Account, a private key or a logic signature and return its address."""
+        if address is None:
+            if isinstance(signer, Account):
+                address = signer.get_address()
+            elif isinstance(signer, str):
+                address = account.address_from_private_key(signer)
+            else:
+                address = signer.address()
+        self._signers[address] = signer
+        return address
+
+    def add_rekeyed(self, address: str, auth_address: str) -> None:
+        """Sign `address` with whatever signs for `auth_address`."""
+        self._auth[address] = auth_address
+
+    def update(self, other: "SignerRegistry") -> None:
+        """Add the signers and rekeys of `other`."""
+        self._signers.update(other._signers)
+        self._auth.update(other._auth)
+
+    def auth_address(self, sender: str) -> str:
+        return self._auth.get(sender, sender)
+
+    def get(self, sender: str, default: Any = None) -> Any:
+        """The signer for transactions sent from `sender`."""
+        return self._signers.get(self._auth.get(sender, sender), default)
+
+    def __contains__(self, sender: str) -> bool:
+        return self.auth_address(sender) in self._signers
+
+    def sign(self, txn: Any) -> Any:
+        signer = self.get(txn.sender)
+        if signer is None:
+            raise Exception(f"No signer for {txn.sender}")
+        if isinstance(signer, Account):
+            return txn.sign(signer.get_private_key())
+        if isinstance(signer, str):
+            return txn.sign(signer)
+        return LogicSigTransaction(txn, signer)
+
+    def sign_transactions(self, txns: Iterable[Any]) -> List[Any]:
+        return [self.sign(txn) for txn in txns]
+
+    def sign_group(self, group: Any) -> Any:
+        """Sign the unsigned transactions of a `utils.TransactionGroup` in one pass."""
+        for i, txn in enumerate(group.transactions):
+            if group.signed_transactions[i] is None:
+                group.signed_transactions[i] = self.sign(txn)
+        return group
+
+    def engine(self, workers: Optional[int] = None) -> SigningEngine:
+        """A `SigningEngine` holding the same keys, logic signatures and rekeys."""
+        private_keys, logicsigs = [], []
+        for signer in self._signers.values():
+            if isinstance(signer, Account):
+                private_keys.append(signer.get_private_key())
+            elif isinstance(signer, str):
+                private_keys.append(signer)
+            else:
+                logicsigs.append(signer)
+        return SigningEngine(private_keys, logicsigs, auth=self._auth, workers=workers)
@@ -0,0 +1,219 @@
+import base64
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from algosdk import account, constants, encoding
+from algosdk.future.transaction import LogicSigTransaction, SignedTransaction
+from nacl.signing import SigningKey
+
+from raw_submit import EncodedBatch, assemble_signed, encode_txn, txid_of
+
+
+# transactions per task sent to a worker
+DEFAULT_CHUNK_SIZE = 512
+
+
+class _Signer:
+    """The keys and logic signatures one process signs with."""
+
+    def __init__(self, private_keys: Sequence[str], logicsigs: Sequence[Any]) -> None:
+        self.keys: Dict[str, SigningKey] = dict()
+        for private_key in private_keys:
+            self.keys[account.address_from_private_key(private_key)] = SigningKey(
+                base64.b64decode(private_key)[:constants.key_len_bytes]
+            )
+        # a LogicSigAccount wraps the LogicSig that goes on the transaction
+        self.logicsigs = {
+            logicsig.address(): getattr(logicsig, "lsig", logicsig).dictify() for logicsig in logicsigs
+        }
+
+    def sign(self, signer: str, txn: Any, encode: bool) -> Tuple[Optional[bytes], Optional[bytes], Optional[str]]:
+        """Sign `txn` as `signer`.
+
+        Returns:
+            The signature, or None for a logic signature, and when `encode`
+            is set the encoded signed transaction and its ID.
+        """
+        txn_bytes = encode_txn(txn)
+        signature = None
+        if signer in self.keys:
+            signature = self.keys[signer].sign(constants.txid_prefix + txn_bytes).signature
+        if not encode:
+            return signature, None, None
+        if signature is not None:
+            fields = {"sig": signature}
+        else:
+            fields = {"lsig": self.logicsigs[signer]}
+        if signer != txn.sender:
+            fields["sgnr"] = encoding.decode_address(signer)
+        return signature, assemble_signed(fields, txn_bytes), txid_of(txn_bytes)
+
+
+# the signer of a worker process, set once by the pool initializer
+_worker: Optional[_Signer] = None
+
+
+def _init_worker(private_keys: Sequence[str], logicsigs: Sequence[Any]) -> None:
+    global _worker
+    _worker = _Signer(private_keys, logicsigs)
+
+
+def _sign_chunk(items: Sequence[Tuple[str, Any]], encode: bool) -> List[Tuple[Optional[bytes], Optional[bytes], Optional[str]]]:
+    return [_worker.sign(signer, txn, encode) for signer, txn in items]
+
+
+class SigningEngine:
+    """Signs large batches of transactions over a pool of processes.
+
+    The private keys and logic signatures are handed to every worker once,
+    when the pool starts; tasks carry only the transactions and the address
+    to sign each with. Every worker keeps one ed25519 signing key per
+    account instead of deriving it again for each transaction, and encodes
+    each transaction once. With `workers=0` the same work runs in the
+    calling process.
+
+    Transactions are signed by their sender, or by the address `auth` maps
+    the sender to when it was rekeyed. Transactions from the address of a
+    logic signature are signed with it.
+
+    Args:
+        private_keys: Private keys of the signing accounts.
+        logicsigs: LogicSigAccounts to sign with.
+        auth: Map from sender to the address it is rekeyed to.
+        workers: Number of worker processes, 0 to sign in this process.
+        chunk_size: Transactions per task.
+    """
+
+    def __init__(
+        self,
+        private_keys: Sequence[str] = (),
+        logicsigs: Sequence[Any] = (),
+        auth: Optional[Dict[str, str]] = None,
+        workers: Optional[int] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> None:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.auth = dict(auth or {})
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.logicsigs = {logicsig.address(): logicsig for logicsig in logicsigs}
+        self.addresses = {account.address_from_private_key(private_key) for private_key in private_keys}
+        self.signed = 0
+
+        self._local: Optional[_Signer] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        if workers:
+            self._pool = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                             initargs=(list(private_keys), list(logicsigs)))
+        else:
+            self._local = _Signer(private_keys, logicsigs)
+
+    def signer_of(self, txn: Any) -> str:
+        """The address that signs `txn`."""
+        signer = self.auth.get(txn.sender, txn.sender)
+        if signer not in self.addresses and signer not in self.logicsigs:
+            raise Exception(f"No signer for {txn.sender}")
+        return signer
+
+    def sign(self, txns: Sequence[Any]) -> List[Any]:
+        """Sign transactions, returning SignedTransactions and LogicSigTransactions in order."""
+        signers = [self.signer_of(txn) for txn in txns]
+        results = self._run(list(zip(signers, txns)), encode=False)
+        signed_txns = []
+        for signer, txn, (signature, _, _) in zip(signers, txns, results):
+            if signature is None:
+                signed_txns.append(LogicSigTransaction(txn, self.logicsigs[signer]))
+            else:
+                authorizing_address = signer if signer != txn.sender else None
+                signed_txns.append(SignedTransaction(txn, base64.b64encode(signature).decode(), authorizing_address))
+        return signed_txns
+
+    def sign_groups(self, groups: Sequence[Any]) -> None:
+        """Sign every transaction of many `utils.TransactionGroup`s in one pass."""
+        txns = [txn for group in groups for txn in group.transactions]
+        signed_txns = iter(self.sign(txns))
+        for group in groups:
+            group.signed_transactions = [next(signed_txns) for _ in group.transactions]
+
+    def sign_encoded(self, groups: Sequence[Sequence[Any]]) -> EncodedBatch:
+        """Sign groups of transactions straight into the bytes algod receives.
+
+        The workers encode the signed transactions themselves, so nothing
+        is encoded again before `raw_submit.send_raw_group`.
+
+        Args:
+            groups: Lists of unsigned transactions with their group IDs set.
+        """
+        items = [(self.signer_of(txn), txn) for group in groups for txn in group]
+        results = iter(self._run(items, encode=True))
+        batch = EncodedBatch()
+        for group in groups:
+            batch.add_encoded([next(results)[1:] for _ in group], min(txn.last_valid_round for txn in group))
+        return batch
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self) -> "SigningEngine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _run(self, items: List[Tuple[str, Any]], encode: bool) -> List[Tuple[Optional[bytes], Optional[bytes], Optional[str]]]:
+        self.signed += len(items)
+        if self._pool is None:
+            return [self._local.sign(signer, txn, encode) for signer, txn in items]
+        # at least a few tasks per worker so that they finish together
+        size = max(1, min(self.chunk_size, -(-len(items) // (self.workers * 4))))
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        results = []
+        for part in self._pool.map(_sign_chunk, chunks, [encode] * len(chunks)):
+            results.extend(part)
+        return results
+
+
+def benchmark(count: int = 10_000, accounts: int = 8, workers: Optional[int] = None) -> None:
+    """Time `txn.sign` one by one against the engine, in process and pooled."""
+    from algosdk.future import transaction
+
+    keys = [account.generate_account()[0] for _ in range(accounts)]
+    addresses = [account.address_from_private_key(key) for key in keys]
+    logicsig = transaction.LogicSigAccount(b"\x05\x81\x01")
+    sp = transaction.SuggestedParams(1000, 1, 1000, "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=", flat_fee=True)
+    senders = addresses + [logicsig.address()]
+    txns = [transaction.PaymentTxn(senders[i % len(senders)], sp, addresses[0], i) for i in range(count)]
+    by_address = dict(zip(addresses, keys))
+
+    start = time.perf_counter()
+    for txn in txns:
+        if txn.sender == logicsig.address():
+            LogicSigTransaction(txn, logicsig)
+        else:
+            txn.sign(by_address[txn.sender])
+    baseline = time.perf_counter() - start
+    print(f"{count} transactions, {accounts} accounts and a logic signature")
+    print(f"txn.sign one by one:      {baseline:7.2f} s  {count / baseline:9.0f} txn/s")
+
+    for n in (0, workers or os.cpu_count() or 1):
+        with SigningEngine(keys, [logicsig], workers=n) as engine:
+            if n:
+                # start the workers before timing
+                engine.sign(txns[:n])
+            start = time.perf_counter()
+            engine.sign(txns)
+            elapsed = time.perf_counter() - start
+            start = time.perf_counter()
+            engine.sign_encoded([txns[i:i + 4] for i in range(0, count, 4)])
+            encoded = time.perf_counter() - start
+        print(f"engine, workers={n}:       {elapsed:7.2f} s  {count / elapsed:9.0f} txn/s"
+              f"  (encoded: {count / encoded:9.0f} txn/s)")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Lets concurrent threads asking for the same key share one call.
+
+    The first caller for a key runs `fetch`; callers arriving while it is in
+    flight wait for it and get the same result, or the same exception. The
+    result is shared, so callers must not mutate it. Nothing is cached once
+    the call has returned.
+
+    `calls` counts every request and `shared` those answered by another
+    caller's fetch, i.e. the requests saved. `saved` breaks `shared` down by
+    the label passed to `run`.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.shared = 0
+        self.saved: Dict[str, int] = dict()
+
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _Call] = dict()
+
+    def run(self, key: Hashable, fetch: Callable[[], Any], label: str = "") -> Any:
+        with self._lock:
+            self.calls += 1
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._inflight[key] = call
+            else:
+                self.shared += 1
+                self.saved[label] = self.saved.get(label, 0) + 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fetch()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"calls": self.calls, "shared": self.shared, "saved": dict(self.saved)}
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of `SingleFlight` for coroutines on one loop."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.shared = 0
+        self.saved: Dict[str, int] = dict()
+
+        self._inflight: Dict[Hashable, asyncio.Future] = dict()
+
+    async def run(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], label: str = "") -> Any:
+        self.calls += 1
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fetch())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.shared += 1
+            self.saved[label] = self.saved.get(label, 0) + 1
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "shared": self.shared, "saved": dict(self.saved)}
@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from algosdk.v2client.algod import AlgodClient
+
+from rekeyed_registry import SLOT_FREE, SLOT_IN_USE, RekeyedRegistry, get_rekeyed_registry
+from retry import backoff
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Pool:
+    def __init__(self, create: Callable[[int], List[str]], target: int) -> None:
+        self.create = create
+        self.target = target
+        self.failures = 0
+        self.retry_at = 0.0
+        self.used_at = time.monotonic()
+        # held while slots of the pair are created, by the thread or a taker
+        self.filling = threading.Lock()
+
+
+class SlotProvisioner:
+    """Keeps free listing slots ready for the (owner, app) pairs it is asked to.
+
+    Nothing is provisioned until `ensure` is called for a pair, see
+    `utils.provision_slots`; `take` claims ready slots of any pair.
+
+    Creating a slot takes a confirmed group of its own. A background thread
+    does that ahead of time, creating the missing slots in bulk, so that
+    the registry holds `target` free, funded and opted-in slots for each
+    pair, and a new listing only claims one with `take` and sends its own
+    group. The thread tops the pools up whenever a slot is taken, and
+    checks them every `interval` seconds, which also picks up slots other
+    processes took. A `take` that finds no slot ready fills the pool
+    itself, waiting for a fill already running rather than creating slots
+    of its own, unless the pair is backing off after a failure.
+
+    Every ready slot holds its app's opt-in price, so a pair locks up to
+    `target` times that price of its owner's ALGO until the slots are used
+    or reclaimed. A pair nobody took a slot from for `idle_after` seconds
+    is dropped, and the thread exits once no pairs are left. A failed
+    creation is logged and retried with jittered exponential backoff; the
+    pair is dropped after `max_failures` failures in a row.
+
+    Args:
+        client: An algod client.
+        target: Free slots to keep per pair, unless `ensure` says otherwise.
+        interval: Seconds between checks of the pools.
+        registry: The registry the slots are kept in.
+        idle_after: Seconds without a `take` or `ensure` after which a
+            pair is dropped.
+        max_failures: Failed creations in a row after which a pair is
+            dropped.
+        backoff_base: Upper bound of the first retry delay, in seconds.
+        backoff_cap: Upper bound of any retry delay, in seconds.
+    """
+
+    def __init__(self, client: AlgodClient, target: int = 4, interval: float = 30.0,
+                 registry: Optional[RekeyedRegistry] = None, idle_after: float = 3600.0,
+                 max_failures: int = 5, backoff_base: float = 5.0, backoff_cap: float = 300.0) -> None:
+        self.client = client
+        self.target = target
+        self.interval = interval
+        self.registry = registry or get_rekeyed_registry()
+        self.idle_after = idle_after
+        self.max_failures = max_failures
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.created = 0
+        self.taken = 0
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pools: Dict[Tuple[str, int], _Pool] = dict()
+        self._thread: Optional[threading.Thread] = None
+
+    def ensure(self, owner: str, app_id: int, create: Callable[[int], List[str]],
+               target: Optional[int] = None) -> None:
+        """Keep free slots of `owner` ready for `app_id`.
+
+        Args:
+            owner: The address the slots are rekeyed to.
+            app_id: The app the slots are opted into.
+            create: Creates the given number of slots in bulk, registers
+                them as free and returns them.
+            target: Free slots to keep, the provisioner's `target` if None.
+        """
+        with self._lock:
+            pool = self._pools.get((owner, app_id))
+            if pool is None:
+                self._pools[(owner, app_id)] = _Pool(create, self.target if target is None else target)
+            else:
+                pool.used_at = time.monotonic()
+                if target is not None:
+                    pool.target = target
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="slot-provisioner", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def take(self, owner: str, app_id: int) -> Optional[str]:
+        """Claim a free slot of `owner` for `app_id`.
+
+        When none is ready and the pair is kept, the pool is filled first.
+
+        Returns:
+            The slot, None if none is ready and the pool could not be
+            filled now.
+        """
+        address = self.registry.claim(owner, app_id, SLOT_FREE, SLOT_IN_USE)
+        with self._lock:
+            pool = self._pools.get((owner, app_id))
+            if pool is not None:
+                pool.used_at = time.monotonic()
+        if address is None and pool is not None:
+            self._fill(owner, app_id, pool)
+            address = self.registry.claim(owner, app_id, SLOT_FREE, SLOT_IN_USE)
+        if address is not None:
+            with self._lock:
+                self.taken += 1
+            self._wake.set()
+        return address
+
+    def ready(self, owner: str, app_id: int) -> int:
+        return self.registry.count(owner, app_id, SLOT_FREE)
+
+    def remove(self, owner: str, app_id: int) -> None:
+        """Stop keeping slots ready for the pair."""
+        with self._lock:
+            self._pools.pop((owner, app_id), None)
+        self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            now = time.monotonic()
+            with self._lock:
+                for key, pool in list(self._pools.items()):
+                    if now - pool.used_at > self.idle_after:
+                        del self._pools[key]
+                if not self._pools:
+                    self._thread = None
+                    return
+                pools = list(self._pools.items())
+            for (owner, app_id), pool in pools:
+                self._fill(owner, app_id, pool)
+
+    def _fill(self, owner: str, app_id: int, pool: _Pool) -> None:
+        with pool.filling:
+            if time.monotonic() < pool.retry_at:
+                return
+            missing = pool.target - self.registry.count(owner, app_id, SLOT_FREE)
+            if missing <= 0:
+                return
+            try:
+                created = pool.create(missing)
+            except Exception as e:
+                pool.failures += 1
+                pool.retry_at = time.monotonic() + backoff(pool.failures, self.backoff_base, self.backoff_cap)
+                logger.warning("Slot provisioning for %s in app %s failed (%d in a row): %s",
+                               owner, app_id, pool.failures, e)
+                if pool.failures >= self.max_failures:
+                    logger.error("Giving up slot provisioning for %s in app %s", owner, app_id)
+                    with self._lock:
+                        if self._pools.get((owner, app_id)) is pool:
+                            del self._pools[(owner, app_id)]
+                return
+            pool.failures = 0
+            pool.retry_at = 0.0
+            with self._lock:
+                self.created += len(created)
+
+
+_provisioners: "WeakKeyDictionary[AlgodClient, SlotProvisioner]" = WeakKeyDictionary()
+_provisioners_lock = threading.Lock()
+
+
+def get_slot_provisioner(client: AlgodClient) -> SlotProvisioner:
+    """Return the slot provisioner shared by everything using `client`."""
+    with _provisioners_lock:
+        provisioner = _provisioners.get(client)
+        if provisioner is None:
+            provisioner = SlotProvisioner(client)
+            _provisioners[client] = provisioner
+        return provisioner
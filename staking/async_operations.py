@@ -0,0 +1,183 @@
+from typing import Tuple
+from algosdk.future import transaction
+
+from async_client import AsyncAlgodClient
+from async_utils import GroupBuilder, estimate_fee, fully_compile_contract, get_app_config, get_suggested_params, send_and_wait
+from utils import get_app_address
+from account import Account
+from time import time
+from .contracts import approval_program, clear_state_program
+
+
+async def get_contracts(client: AsyncAlgodClient) -> Tuple[bytes, bytes]:
+    """Get the compiled TEAL contracts for the staking.
+
+    Args:
+        client: An async algod client that has the ability to compile TEAL programs.
+
+    Returns:
+        A tuple of 2 byte strings. The first is the approval program, and the
+        second is the clear state program.
+    """
+    approval = await fully_compile_contract(client, approval_program())
+    clear_state = await fully_compile_contract(client, clear_state_program())
+
+    return approval, clear_state
+
+
+async def create_staking_app(client: AsyncAlgodClient, creator: Account, token_id: int, token_app_id: int) -> int:
+    approval, clear = await get_contracts(client)
+
+    global_schema = transaction.StateSchema(num_uints=5, num_byte_slices=0)
+    local_schema = transaction.StateSchema(num_uints=4, num_byte_slices=0)
+
+    txn = transaction.ApplicationCreateTxn(
+        sender=creator.get_address(),
+        on_complete=transaction.OnComplete.NoOpOC,
+        approval_program=approval,
+        clear_program=clear,
+        global_schema=global_schema,
+        local_schema=local_schema,
+        foreign_assets=[token_id],
+        foreign_apps=[token_app_id],
+        sp=await get_suggested_params(client)
+    )
+
+    response = await send_and_wait(client, [txn.sign(creator.get_private_key())])
+    assert response.application_index is not None and response.application_index > 0
+    app_id = response.application_index
+    print(f"App ID: {app_id}")
+    print(f"App address: {get_app_address(app_id)}")
+
+    funding_amount = (
+        # account min balance
+        100_000
+        # optin asset
+        + 100_000
+        # optin txn
+        + 1_000
+    )
+    txn = transaction.PaymentTxn(
+        sender=creator.get_address(),
+        sp=await get_suggested_params(client),
+        receiver=get_app_address(app_id),
+        amt=funding_amount,  # min balance of the application
+    )
+
+    await send_and_wait(client, [txn.sign(creator.get_private_key())])
+    return app_id
+
+
+async def setup_app(client: AsyncAlgodClient, app_id: int, creator: Account):
+    app_config = await get_app_config(client, app_id)
+
+    txn = transaction.ApplicationCallTxn(
+        sender=creator.get_address(),
+        sp=await get_suggested_params(client),
+        index=app_id,
+        app_args=[b"setup"],
+        foreign_assets=[app_config.token_id],
+        on_complete=transaction.OnComplete.NoOpOC,
+    )
+
+    await send_and_wait(client, [txn.sign(creator.get_private_key())])
+
+
+async def set_timelock(client: AsyncAlgodClient, app_id: int, creator: Account):
+    txn = transaction.ApplicationCallTxn(
+        sender=creator.get_address(),
+        sp=await get_suggested_params(client),
+        index=app_id,
+        app_args=[b"set_timelock", int(time()).to_bytes(8, "big")],
+        on_complete=transaction.OnComplete.NoOpOC,
+    )
+
+    await send_and_wait(client, [txn.sign(creator.get_private_key())])
+
+
+async def stake_token(client: AsyncAlgodClient, app_id: int, sender: Account, amount: int):
+    app_config = await get_app_config(client, app_id)
+    sp = await get_suggested_params(client)
+
+    transfer_call_txn = transaction.ApplicationCallTxn(
+        sender=sender.get_address(),
+        sp=sp,
+        index=app_config.token_app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[
+            b"transfer",
+            amount.to_bytes(8, 'big'),
+        ],
+    )
+    call_txn = transaction.ApplicationCallTxn(
+        sender=sender.get_address(),
+        sp=sp,
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[
+            b"stake",
+            amount.to_bytes(8, 'big'),
+        ],
+    )
+    group = [transfer_call_txn, call_txn]
+    # the staking app asserts the fee of the token app transfer and its inner txns
+    fees = estimate_fee(approval_program, group, 1)
+    await send_and_wait(client, GroupBuilder(group, sender, sp=sp, **fees.group_args()).sign().signed_transactions)
+
+
+async def withdraw_token(client: AsyncAlgodClient, app_id: int, sender: Account, amount: int):
+    sp = await get_suggested_params(client)
+    app_config = await get_app_config(client, app_id)
+
+    transfer_call_txn = transaction.ApplicationCallTxn(
+        sender=sender.get_address(),
+        sp=sp,
+        index=app_config.token_app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[
+            b"transfer",
+            amount.to_bytes(8, 'big'),
+        ],
+    )
+    call_txn = transaction.ApplicationCallTxn(
+        sender=sender.get_address(),
+        sp=sp,
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[
+            b"withdraw",
+            amount.to_bytes(8, 'big'),
+        ],
+        foreign_assets=[app_config.token_id]
+    )
+
+    group = [transfer_call_txn, call_txn]
+    # the staking app asserts the fee of the token app transfer and its inner txns
+    fees = estimate_fee(approval_program, group, 1)
+    await send_and_wait(client, GroupBuilder(group, sender, sp=sp, **fees.group_args()).sign().signed_transactions)
+
+
+async def claim_rewards(client: AsyncAlgodClient, app_id: int, sender: Account):
+    app_config = await get_app_config(client, app_id)
+
+    call_txn = transaction.ApplicationCallTxn(
+        sender=sender.get_address(),
+        sp=await get_suggested_params(client),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[
+            b"claim",
+        ],
+        foreign_assets=[app_config.token_id]
+    )
+
+    await send_and_wait(client, [call_txn.sign(sender.get_private_key())])
+
+
+async def delete_staking_app(client: AsyncAlgodClient, app_id: int, closer: Account):
+    delete_txn = transaction.ApplicationDeleteTxn(
+        sender=closer.get_address(),
+        index=app_id,
+        sp=await get_suggested_params(client),
+    )
+    await send_and_wait(client, [delete_txn.sign(closer.get_private_key())])
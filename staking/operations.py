@@ -3,7 +3,7 @@ from typing import Tuple
 from algosdk.future import transaction
 from algosdk.v2client.algod import AlgodClient
 
-from utils import fully_compile_contract, get_app_address, get_app_global_state, wait_for_confirmation
+from utils import GroupBuilder, estimate_fee, fully_compile_contract, get_app_address, get_app_config, get_suggested_params, wait_for_confirmation
 from account import Account
 from time import time
 from .contracts import approval_program, clear_state_program
@@ -40,7 +40,7 @@ def create_staking_app(client: AlgodClient, creator: Account, token_id: int, tok
         local_schema=local_schema,
         foreign_assets=[token_id],
         foreign_apps=[token_app_id],
-        sp=client.suggested_params()
+        sp=get_suggested_params(client)
     )
     
     signed_txn = txn.sign(creator.get_private_key())
@@ -62,7 +62,7 @@ def create_staking_app(client: AlgodClient, creator: Account, token_id: int, tok
     )
     txn = transaction.PaymentTxn(
         sender=creator.get_address(),
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         receiver=get_app_address(app_id),
         amt=funding_amount,  # min balance of the application
     )
@@ -75,12 +75,12 @@ def create_staking_app(client: AlgodClient, creator: Account, token_id: int, tok
 
 
 def setup_app(client: AlgodClient, app_id: int, creator: Account):
-    globalState = get_app_global_state(client, app_id)
-    token_id = globalState[b"TK_ID"]
+    app_config = get_app_config(client, app_id)
+    token_id = app_config.token_id
     
     txn = transaction.ApplicationCallTxn(
         sender=creator.get_address(),
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         index=app_id,
         app_args=[b"setup"],
         foreign_assets=[token_id],
@@ -96,7 +96,7 @@ def setup_app(client: AlgodClient, app_id: int, creator: Account):
 def set_timelock(client: AlgodClient, app_id: int, creator: Account):
     txn = transaction.ApplicationCallTxn(
         sender=creator.get_address(),
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         index=app_id,
         app_args=[b"set_timelock", int(time()).to_bytes(8, "big")],
         on_complete=transaction.OnComplete.NoOpOC,
@@ -109,21 +109,19 @@ def set_timelock(client: AlgodClient, app_id: int, creator: Account):
 
 
 def stake_token(client: AlgodClient, app_id: int, sender: Account, amount: int):
-    globalState = get_app_global_state(client, app_id)
-    sp = client.suggested_params()
+    app_config = get_app_config(client, app_id)
+    sp = get_suggested_params(client)
     
-    sp.fee = 3 * 1_000
     transfer_call_txn = transaction.ApplicationCallTxn(
         sender=sender.get_address(),
         sp=sp,
-        index=globalState[b"TA"],
+        index=app_config.token_app_id,
         on_complete=transaction.OnComplete.NoOpOC,
         app_args=[
             b"transfer",
             amount.to_bytes(8, 'big'),
         ],
     )
-    sp.fee = 1_000
     call_txn = transaction.ApplicationCallTxn(
         sender=sender.get_address(),
         sp=sp,
@@ -134,32 +132,27 @@ def stake_token(client: AlgodClient, app_id: int, sender: Account, amount: int):
             amount.to_bytes(8, 'big'),
         ],
     )
-    transaction.assign_group_id([transfer_call_txn, call_txn])
-    
-    signed_transfer_call_txn = transfer_call_txn.sign(sender.get_private_key())
-    signed_call_txn = call_txn.sign(sender.get_private_key())
-    tx_id = client.send_transactions([signed_transfer_call_txn, signed_call_txn])
-    
-    wait_for_confirmation(client, tx_id)
+    group = [transfer_call_txn, call_txn]
+    # the staking app asserts the fee of the token app transfer and its inner txns
+    fees = estimate_fee(approval_program, group, 1)
+    GroupBuilder(group, sender, sp=sp, **fees.group_args()).execute(client)
 
 
 def withdraw_token(client: AlgodClient, app_id: int, sender: Account, amount: int):
-    sp = client.suggested_params()
-    globalState = get_app_global_state(client, app_id)
-    token_id = globalState[b"TK_ID"]
+    sp = get_suggested_params(client)
+    app_config = get_app_config(client, app_id)
+    token_id = app_config.token_id
     
-    sp.fee = 3 * 1_000
     transfer_call_txn = transaction.ApplicationCallTxn(
         sender=sender.get_address(),
         sp=sp,
-        index=globalState[b"TA"],
+        index=app_config.token_app_id,
         on_complete=transaction.OnComplete.NoOpOC,
         app_args=[
             b"transfer",
             amount.to_bytes(8, 'big'),
         ],
     )
-    sp.fee = 1_000
     call_txn = transaction.ApplicationCallTxn(
         sender=sender.get_address(),
         sp=sp,
@@ -172,22 +165,19 @@ def withdraw_token(client: AlgodClient, app_id: int, sender: Account, amount: in
         foreign_assets=[token_id]
     )
     
-    transaction.assign_group_id([transfer_call_txn, call_txn])
-    
-    signed_transfer_call_txn = transfer_call_txn.sign(sender.get_private_key())
-    signed_call_txn = call_txn.sign(sender.get_private_key())
-    tx_id = client.send_transactions([signed_transfer_call_txn, signed_call_txn])
-    
-    wait_for_confirmation(client, tx_id)
+    group = [transfer_call_txn, call_txn]
+    # the staking app asserts the fee of the token app transfer and its inner txns
+    fees = estimate_fee(approval_program, group, 1)
+    GroupBuilder(group, sender, sp=sp, **fees.group_args()).execute(client)
         
 
 def claim_rewards(client: AlgodClient, app_id: int, sender: Account):
-    globalState = get_app_global_state(client, app_id)
-    token_id = globalState[b"TK_ID"]
+    app_config = get_app_config(client, app_id)
+    token_id = app_config.token_id
     
     call_txn = transaction.ApplicationCallTxn(
         sender=sender.get_address(),
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         index=app_id,
         on_complete=transaction.OnComplete.NoOpOC,
         app_args=[
@@ -206,7 +196,7 @@ def delete_staking_app(client: AlgodClient, app_id: int, closer: Account):
     delete_txn = transaction.ApplicationDeleteTxn(
         sender=closer.get_address(),
         index=app_id,
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
     )
     signed_delete_txn = delete_txn.sign(closer.get_private_key())
     client.send_transaction(signed_delete_txn)
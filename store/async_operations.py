@@ -0,0 +1,70 @@
+from typing import Tuple
+from algosdk.future import transaction
+
+from .contracts import approval_program, clear_state_program
+
+from async_client import AsyncAlgodClient
+from async_utils import fully_compile_contract, get_suggested_params, send_and_wait
+from utils import get_app_address
+from account import Account
+
+async def get_contracts(client: AsyncAlgodClient) -> Tuple[bytes, bytes]:
+    """Get the compiled TEAL contracts for the store.
+
+    Args:
+        client: An async algod client that has the ability to compile TEAL programs.
+
+    Returns:
+        A tuple of 2 byte strings. The first is the approval program, and the
+        second is the clear state program.
+    """
+    approval = await fully_compile_contract(client, approval_program())
+    clear_state = await fully_compile_contract(client, clear_state_program())
+
+    return approval, clear_state
+
+
+async def create_store_app(client: AsyncAlgodClient, creator: Account) -> int:
+    approval, clear = await get_contracts(client=client)
+
+    global_schema = transaction.StateSchema(num_uints=6, num_byte_slices=0)
+    local_schema = transaction.StateSchema(num_uints=2, num_byte_slices=0)
+
+    txn = transaction.ApplicationCreateTxn(
+        sender=creator.get_address(),
+        on_complete=transaction.OnComplete.NoOpOC,
+        approval_program=approval,
+        clear_program=clear,
+        global_schema=global_schema,
+        local_schema=local_schema,
+        sp=await get_suggested_params(client)
+    )
+
+    response = await send_and_wait(client, [txn.sign(creator.get_private_key())])
+    assert response.application_index is not None and response.application_index > 0
+    app_id = response.application_index
+    print(f"Store App ID: {app_id}")
+    print(f"Store App address: {get_app_address(app_id)}")
+
+    txn = transaction.PaymentTxn(
+        sender=creator.get_address(),
+        sp=await get_suggested_params(client),
+        receiver=get_app_address(app_id),
+        amt=201_000,  # min balance of the application
+    )
+
+    await send_and_wait(client, [txn.sign(creator.get_private_key())])
+
+    return app_id
+
+
+async def set_up(client: AsyncAlgodClient, creator: Account, app_id: int, trade_app_id: int, bid_app_id: int, auction_app_id: int, distribution_app_id: int):
+    call_txn = transaction.ApplicationCallTxn(
+        sender=creator.get_address(),
+        sp=await get_suggested_params(client),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        foreign_apps=[trade_app_id, bid_app_id, auction_app_id, distribution_app_id],
+        app_args=[b"setup"],
+    )
+    await send_and_wait(client, [call_txn.sign(creator.get_private_key())])
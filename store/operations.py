@@ -7,7 +7,7 @@ from pyteal.ast import txn
 
 from .contracts import approval_program, clear_state_program
 
-from utils import fully_compile_contract, get_app_address, wait_for_confirmation
+from utils import fully_compile_contract, get_app_address, get_suggested_params, wait_for_confirmation
 from account import Account
 
 def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
@@ -39,7 +39,7 @@ def create_store_app(client: AlgodClient, creator: Account) -> int:
         clear_program=clear,
         global_schema=global_schema,
         local_schema=local_schema,
-        sp=client.suggested_params()
+        sp=get_suggested_params(client)
     )
     
     signed_txn = txn.sign(creator.get_private_key())
@@ -52,7 +52,7 @@ def create_store_app(client: AlgodClient, creator: Account) -> int:
     
     txn = transaction.PaymentTxn(
         sender=creator.get_address(),
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         receiver=get_app_address(app_id),
         amt=201_000,  # min balance of the application
     )
@@ -67,7 +67,7 @@ def create_store_app(client: AlgodClient, creator: Account) -> int:
 def set_up(client: AlgodClient, creator: Account, app_id: int, trade_app_id: int, bid_app_id: int, auction_app_id: int, distribution_app_id: int):
     call_txn = transaction.ApplicationCallTxn(
         sender=creator.get_address(),
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         index=app_id,
         on_complete=transaction.OnComplete.NoOpOC,
         foreign_apps=[trade_app_id, bid_app_id, auction_app_id, distribution_app_id],
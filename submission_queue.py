@@ -0,0 +1,437 @@
+import collections
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Deque, Dict, List, Optional
+from weakref import WeakKeyDictionary
+
+from algosdk.error import AlgodHTTPError
+from algosdk.v2client.algod import AlgodClient
+
+from confirmation import ConfirmationTimeout, get_confirmation_waiter
+from fee_bumper import FeeBumper, get_congestion_monitor, is_low_fee, is_overlapping_lease
+from raw_submit import EncodedGroup, send_raw_group
+from retry import backoff, is_transient
+from suggested_params import get_params_provider
+
+
+# fragments of algod rejections meaning the transactions are already known
+DUPLICATE_ERRORS = ("already in ledger", "already in pool", "duplicate")
+
+# seconds over which `throughput` is averaged
+THROUGHPUT_WINDOW = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+class SubmissionError(Exception):
+    """Raised when algod rejects a group for good, or it can no longer be confirmed."""
+
+
+class AlreadyInLedger(SubmissionError):
+    """Raised when algod says a group is already in the ledger but no longer
+    has its pending transaction info, so the confirmation can not be read."""
+
+
+def is_duplicate(e: Exception) -> bool:
+    """Whether a submission failed only because algod already has the transactions."""
+    message = str(e).lower()
+    return any(fragment in message for fragment in DUPLICATE_ERRORS)
+
+
+def is_in_ledger(e: Exception) -> bool:
+    """Whether a submission failed because the transactions are already committed."""
+    return "already in ledger" in str(e).lower()
+
+
+class _Submission:
+    def __init__(self, group: EncodedGroup, bumper: Optional[FeeBumper] = None) -> None:
+        self.group = group
+        self.last_valid = group.last_valid
+        self.bumper = bumper
+        self.future: Future = Future()
+        self.attempts = 0
+        self.sent_at = 0.0
+        self.queued = False
+        # first transaction IDs of every version sent, while they are tracked
+        self.keys: List[str] = []
+        self.previous: Optional[Any] = None
+        self.lease_held = False
+        # algod answered the last send with "already in ledger"
+        self.in_ledger = False
+
+    @property
+    def data(self) -> Any:
+        return self.group.data
+
+    @property
+    def tx_ids(self) -> List[str]:
+        return self.group.tx_ids
+
+    def replace(self, group: EncodedGroup) -> None:
+        # keep the version algod last accepted through chained bumps
+        if self.previous is None:
+            self.previous = self.group
+        self.group = group
+
+    def restore(self) -> None:
+        self.group = self.previous
+        self.previous = None
+
+    def accept(self) -> None:
+        self.previous = None
+        if self.bumper is not None:
+            self.bumper.commit()
+
+
+class SubmissionQueue:
+    """Background workers that send signed groups and see them confirmed.
+
+    `submit` queues a group and returns at once. The group is encoded once,
+    every send and resend posts the same bytes. Workers take up to
+    `batch_size` ready groups at a time, send them, and track them with the
+    client's shared `ConfirmationWaiter`.
+
+    Transient failures are retried with jittered exponential backoff:
+    transport errors, 5xx and 429 responses, and a full transaction pool.
+    A rejection saying the transactions are already in the pool or the
+    ledger counts as a successful send. A group still pending
+    `resubmit_after` seconds after it was sent is sent again, as is one
+    that the node dropped from its pool, for as long as the current round
+    is below its last valid round. A group the node reports as already in
+    the ledger but has no pending info for is not sent again: its future
+    fails with `AlreadyInLedger`, as the confirmation can not be read back.
+    Anything else fails the group's future with a `SubmissionError`.
+
+    Groups queued with `submit_bumpable` are also signed again with a
+    higher fee, within the budget of their `fee_bumper.FeeBumper`: right
+    away when algod rejects the fee as too low for its load, and instead of
+    a plain resend when the group stays pending while the client's
+    `CongestionMonitor` reports congestion. The lease the bumper puts on
+    the group keeps a bumped version from confirming alongside the one it
+    replaces; whichever of them confirms resolves the future. A bump only
+    counts once algod accepts the new version. While the previous version
+    is still in the node's pool the lease makes algod reject the new one,
+    so that group can not be re-priced: the bump is rolled back, its fee
+    returned to the budget, and the queue waits for the pooled version.
+
+    Args:
+        client: An algod client.
+        workers: Number of sending threads.
+        batch_size: Groups a worker takes per pass.
+        max_attempts: Sends of a group before a transient error is final.
+        backoff_base: Upper bound of the first retry delay, in seconds.
+        backoff_cap: Upper bound of any retry delay, in seconds.
+        resubmit_after: Seconds a sent group may stay pending before it is
+            sent again.
+    """
+
+    def __init__(
+        self,
+        client: AlgodClient,
+        workers: int = 4,
+        batch_size: int = 16,
+        max_attempts: int = 8,
+        backoff_base: float = 0.25,
+        backoff_cap: float = 8.0,
+        resubmit_after: float = 12.0,
+    ) -> None:
+        self.client = client
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.resubmit_after = resubmit_after
+
+        self.submitted = 0
+        self.sent = 0
+        self.retried = 0
+        self.duplicates = 0
+        self.resubmitted = 0
+        self.bumped = 0
+        self.confirmed = 0
+        self.failed = 0
+
+        self._cond = threading.Condition()
+        self._ready: List[Any] = []
+        self._seq = itertools.count()
+        self._in_flight: Dict[str, _Submission] = dict()
+        self._confirmed_at: Deque[float] = collections.deque()
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+
+    def submit(self, signed_txns: List[Any]) -> Future:
+        """Queue a signed group.
+
+        Returns:
+            A future resolved with the pending transaction infos of the
+            group, in group order, once it is confirmed.
+        """
+        return self.submit_encoded(EncodedGroup.encode(signed_txns))
+
+    def submit_encoded(self, group: EncodedGroup) -> Future:
+        """Queue a group encoded by `raw_submit`, see `submit`."""
+        return self._submit(_Submission(group))
+
+    def submit_bumpable(self, bumper: FeeBumper) -> Future:
+        """Queue a group whose fee `bumper` may raise, see `submit`."""
+        return self._submit(_Submission(bumper.encode(), bumper))
+
+    def _submit(self, submission: _Submission) -> Future:
+        with self._cond:
+            if self._closed:
+                raise SubmissionError("The submission queue is closed")
+            self.submitted += 1
+            self._push(submission, 0.0)
+            self._start()
+        return submission.future
+
+    def submit_and_wait(self, signed_txns: List[Any]) -> List[Dict[str, Any]]:
+        return self.submit(signed_txns).result()
+
+    def depth(self) -> int:
+        """Number of groups waiting to be sent or retried."""
+        with self._cond:
+            return len(self._ready)
+
+    def throughput(self) -> float:
+        """Groups confirmed per second over the last `THROUGHPUT_WINDOW` seconds."""
+        with self._cond:
+            self._trim(time.monotonic())
+            return len(self._confirmed_at) / THROUGHPUT_WINDOW
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._trim(time.monotonic())
+            return {
+                "depth": len(self._ready),
+                "in_flight": len(set(self._in_flight.values())),
+                "submitted": self.submitted,
+                "sent": self.sent,
+                "retried": self.retried,
+                "duplicates": self.duplicates,
+                "resubmitted": self.resubmitted,
+                "bumped": self.bumped,
+                "confirmed": self.confirmed,
+                "failed": self.failed,
+                "throughput": len(self._confirmed_at) / THROUGHPUT_WINDOW,
+            }
+
+    def close(self) -> None:
+        """Stop the workers once the queued groups have been sent."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join()
+
+    def _start(self) -> None:
+        if self._threads:
+            return
+        for i in range(self.workers):
+            self._threads.append(threading.Thread(target=self._run, name=f"submission-{i}", daemon=True))
+        self._threads.append(threading.Thread(target=self._sweep, name="submission-sweep", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def _push(self, submission: _Submission, delay: float) -> None:
+        submission.queued = True
+        heapq.heappush(self._ready, (time.monotonic() + delay, next(self._seq), submission))
+        self._cond.notify_all()
+
+    def _take(self) -> Optional[List[_Submission]]:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self._ready and self._ready[0][0] <= now:
+                    batch = []
+                    while self._ready and self._ready[0][0] <= now and len(batch) < self.batch_size:
+                        submission = heapq.heappop(self._ready)[2]
+                        submission.queued = False
+                        batch.append(submission)
+                    return batch
+                if self._closed and not self._ready:
+                    return None
+                timeout = self._ready[0][0] - now if self._ready else None
+                self._cond.wait(timeout)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take()
+            if batch is None:
+                return
+            for submission in batch:
+                self._send(submission)
+
+    def _send(self, submission: _Submission) -> None:
+        submission.attempts += 1
+        submission.in_ledger = False
+        try:
+            send_raw_group(self.client, submission.data)
+        except Exception as e:
+            if is_duplicate(e):
+                submission.in_ledger = is_in_ledger(e)
+                with self._cond:
+                    self.duplicates += 1
+            elif submission.previous is not None and is_overlapping_lease(e):
+                # the version signed before the bump is in the pool and holds
+                # the lease, keep waiting for that one
+                submission.restore()
+                submission.bumper.rollback()
+                submission.lease_held = True
+                return
+            elif submission.bumper is not None and is_low_fee(e):
+                if self._bump(submission):
+                    with self._cond:
+                        self._push(submission, 0.0)
+                else:
+                    self._fail(submission, SubmissionError(f"Fee budget exhausted: {e}"))
+                return
+            elif is_transient(e) and submission.attempts < self.max_attempts:
+                delay = backoff(submission.attempts, self.backoff_base, self.backoff_cap)
+                with self._cond:
+                    self.retried += 1
+                    self._push(submission, delay)
+                return
+            else:
+                self._fail(submission, SubmissionError(str(e)))
+                return
+
+        submission.accept()
+        submission.sent_at = time.monotonic()
+        key = submission.tx_ids[0]
+        with self._cond:
+            self.sent += 1
+            first_send = key not in self._in_flight
+            if first_send:
+                self._in_flight[key] = submission
+                submission.keys.append(key)
+        if first_send:
+            self._track(submission)
+
+    def _track(self, submission: _Submission) -> None:
+        waiter = get_confirmation_waiter(self.client)
+        key = submission.tx_ids[0]
+        future = waiter.track_group(submission.tx_ids, last_valid=submission.last_valid)
+        future.add_done_callback(lambda done: self._tracked(submission, key, done))
+
+    def _bump(self, submission: _Submission) -> bool:
+        group = submission.bumper.bump(get_params_provider(self.client).get())
+        if group is None:
+            return False
+        submission.replace(group)
+        with self._cond:
+            self.bumped += 1
+        return True
+
+    def _congested(self) -> bool:
+        try:
+            return get_congestion_monitor(self.client).congested()
+        except Exception as e:
+            logger.warning("Congestion check failed: %s", e)
+            return False
+
+    def _sweep(self) -> None:
+        """Send groups that stay pending again until they expire, with a
+        higher fee if they can be bumped and the network is congested."""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed, self.resubmit_after / 2)
+                if self._closed:
+                    return
+                last_round = get_confirmation_waiter(self.client).last_round
+                now = time.monotonic()
+                stuck = []
+                for submission in set(self._in_flight.values()):
+                    if submission.queued or submission.future.done():
+                        continue
+                    if now - submission.sent_at < self.resubmit_after:
+                        continue
+                    if last_round is not None and last_round > submission.last_valid:
+                        continue
+                    stuck.append(submission)
+
+            congested = None
+            for submission in stuck:
+                bumped = False
+                if submission.bumper is not None and not submission.lease_held:
+                    if congested is None:
+                        congested = self._congested()
+                    bumped = congested and self._bump(submission)
+                with self._cond:
+                    if submission.queued or submission.future.done():
+                        continue
+                    if not bumped:
+                        self.resubmitted += 1
+                    self._push(submission, 0.0)
+
+    def _tracked(self, submission: _Submission, key: str, done: Future) -> None:
+        if submission.future.done():
+            return
+        error = done.exception()
+        if error is not None and key != submission.tx_ids[0]:
+            # a version replaced by a bump, the current one is tracked too
+            with self._cond:
+                self._in_flight.pop(key, None)
+            return
+        if error is None:
+            with self._cond:
+                self._forget(submission)
+                self.confirmed += 1
+                now = time.monotonic()
+                self._confirmed_at.append(now)
+                self._trim(now)
+            submission.future.set_result(done.result())
+            return
+
+        last_round = get_confirmation_waiter(self.client).last_round
+        dropped = isinstance(error, AlgodHTTPError) and error.code == 404
+        if dropped and submission.in_ledger:
+            # committed already, resending would only be answered the same way
+            error = AlreadyInLedger(f"Group is already in the ledger, its confirmation is no longer available: {error}")
+        elif dropped and (last_round is None or last_round <= submission.last_valid):
+            # the node forgot the group, send it again and track it afresh
+            with self._cond:
+                self.resubmitted += 1
+                self._in_flight.pop(key, None)
+                submission.keys.remove(key)
+                self._push(submission, 0.0)
+            return
+        if isinstance(error, ConfirmationTimeout):
+            error = SubmissionError(f"Group expired at round {submission.last_valid}: {error}")
+        self._fail(submission, error if isinstance(error, SubmissionError) else SubmissionError(str(error)))
+
+    def _fail(self, submission: _Submission, error: Exception) -> None:
+        with self._cond:
+            self._forget(submission)
+            self.failed += 1
+        if not submission.future.done():
+            submission.future.set_exception(error)
+
+    def _forget(self, submission: _Submission) -> None:
+        for key in submission.keys:
+            self._in_flight.pop(key, None)
+        submission.keys.clear()
+
+    def _trim(self, now: float) -> None:
+        while self._confirmed_at and self._confirmed_at[0] < now - THROUGHPUT_WINDOW:
+            self._confirmed_at.popleft()
+
+
+_queues: "WeakKeyDictionary[AlgodClient, SubmissionQueue]" = WeakKeyDictionary()
+_queues_lock = threading.Lock()
+
+
+def get_submission_queue(client: AlgodClient) -> SubmissionQueue:
+    """Return the submission queue shared by everything using `client`."""
+    with _queues_lock:
+        queue = _queues.get(client)
+        if queue is None:
+            queue = SubmissionQueue(client)
+            _queues[client] = queue
+        return queue
@@ -0,0 +1,103 @@
+import copy
+import threading
+import time
+from typing import Optional
+from weakref import WeakKeyDictionary
+
+from algosdk.future.transaction import SuggestedParams
+from algosdk.v2client.algod import AlgodClient
+
+from confirmation import get_confirmation_waiter
+
+
+class SuggestedParamsProvider:
+    """Caches suggested params for a number of rounds or seconds.
+
+    Once the cached params are older than `refresh_after` seconds, callers
+    keep getting them while a background thread fetches fresh ones. Params
+    older than `max_age` seconds or `max_rounds` rounds are never handed out.
+    Every caller gets its own copy, so changing `sp.fee` is safe.
+
+    Args:
+        client: An algod client.
+        max_rounds: Rounds after which the cached params must be refetched.
+        max_age: Seconds after which the cached params must be refetched.
+        refresh_after: Seconds after which a background refresh is started.
+    """
+
+    def __init__(
+        self,
+        client: AlgodClient,
+        max_rounds: int = 10,
+        max_age: float = 30.0,
+        refresh_after: float = 15.0,
+    ) -> None:
+        self.client = client
+        self.max_rounds = max_rounds
+        self.max_age = max_age
+        self.refresh_after = refresh_after
+        self.fetches = 0
+
+        self._lock = threading.Lock()
+        self._params: Optional[SuggestedParams] = None
+        self._fetched_at = 0.0
+        self._refreshing = False
+
+    def get(self) -> SuggestedParams:
+        with self._lock:
+            params = self._params
+            age = time.monotonic() - self._fetched_at
+            start_refresh = (
+                params is not None
+                and age > self.refresh_after
+                and not self._refreshing
+            )
+            if start_refresh:
+                self._refreshing = True
+
+        if params is None or age > self.max_age or self._is_round_expired(params):
+            params = self.refresh()
+        elif start_refresh:
+            threading.Thread(target=self._background_refresh, daemon=True).start()
+
+        return copy.copy(params)
+
+    def refresh(self) -> SuggestedParams:
+        params = self.client.suggested_params()
+        with self._lock:
+            self.fetches += 1
+            self._params = params
+            self._fetched_at = time.monotonic()
+        return params
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._params = None
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            # the next caller past max_age refetches in the foreground
+            pass
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _is_round_expired(self, params: SuggestedParams) -> bool:
+        last_round = get_confirmation_waiter(self.client).last_round
+        return last_round is not None and last_round - params.first >= self.max_rounds
+
+
+_providers: "WeakKeyDictionary[AlgodClient, SuggestedParamsProvider]" = WeakKeyDictionary()
+_providers_lock = threading.Lock()
+
+
+def get_params_provider(client: AlgodClient) -> SuggestedParamsProvider:
+    """Return the suggested params provider shared by everything using `client`."""
+    with _providers_lock:
+        provider = _providers.get(client)
+        if provider is None:
+            provider = SuggestedParamsProvider(client)
+            _providers[client] = provider
+        return provider
@@ -0,0 +1,276 @@
+from typing import Tuple, List
+
+from algosdk import encoding
+from algosdk.future import transaction
+from algosdk.logic import get_application_address
+
+from account import Account
+from async_client import AsyncAlgodClient
+from async_utils import *
+from fee_estimator import estimate_fee
+from .contracts import approval_program, clear_state_program
+
+# min balance of a listing slot's local state in the app, plus its opt-in fee
+SLOT_OPTIN_PRICE = 100000 + 28500 * 4 + 50000 * 1 + 1000
+
+
+async def get_contracts(client: AsyncAlgodClient) -> Tuple[bytes, bytes]:
+    """Get the compiled TEAL contracts for the swap.
+
+    Args:
+        client: An async algod client that has the ability to compile TEAL programs.
+
+    Returns:
+        A tuple of 2 byte strings. The first is the approval program, and the
+        second is the clear state program.
+    """
+    approval = await fully_compile_contract(client, approval_program())
+    clear_state = await fully_compile_contract(client, clear_state_program())
+
+    return approval, clear_state
+
+
+async def create_swap_app(
+    client: AsyncAlgodClient,
+    creator: Account,
+    staking_address: str,
+    team_wallet_address: str
+) -> int:
+    """Create a new swap. See operations.create_swap_app."""
+    approval, clear = await get_contracts(client)
+
+    global_schema = transaction.StateSchema(num_uints=0, num_byte_slices=2)
+    local_schema = transaction.StateSchema(num_uints=4, num_byte_slices=1)
+
+    sp = await get_suggested_params(client)
+
+    txn = transaction.ApplicationCreateTxn(
+        sender=creator.get_address(),
+        on_complete=transaction.OnComplete.NoOpOC,
+        approval_program=approval,
+        clear_program=clear,
+        global_schema=global_schema,
+        local_schema=local_schema,
+        app_args=[],
+        accounts=[staking_address, team_wallet_address],
+        sp=sp,
+    )
+    response = await send_and_wait(client, [txn.sign(creator.get_private_key())])
+    assert response.application_index is not None and response.application_index > 0
+
+    app_id = response.application_index
+    initial_funding_amount = (
+        # min account balance
+        100_000
+    )
+
+    initial_fund_app_txn = transaction.PaymentTxn(
+        sender=creator.get_address(),
+        receiver=get_application_address(appID=app_id),
+        amt=initial_funding_amount,
+        sp=sp,
+    )
+    await send_and_wait(client, [initial_fund_app_txn.sign(creator.get_private_key())])
+
+    return app_id
+
+
+async def setup_swap_app(
+    client: AsyncAlgodClient,
+    app_id: int,
+    funder: Account,
+    token_ids: List[int],
+) -> None:
+    """Opt the swap escrow into `token_ids`. See operations.setup_swap_app."""
+    app_address = get_application_address(app_id)
+    params = await get_suggested_params(client)
+
+    funding_amount = (
+        # min optin asset balance
+        100_000
+        # min txn fee
+        + 1_000
+    ) * len(token_ids)
+
+    fund_app_txn = transaction.PaymentTxn(
+        sender=funder.get_address(),
+        receiver=app_address,
+        amt=funding_amount,
+        sp=params,
+    )
+
+    setup_txn = transaction.ApplicationCallTxn(
+        sender=funder.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"setup"],
+        foreign_assets=token_ids,
+        sp=params,
+    )
+
+    group = [fund_app_txn, setup_txn]
+    fees = estimate_fee(approval_program, group, 1)
+    # the opt-in fees are funded to the app above, it pays its own inner txns
+    await send_and_wait(client, GroupBuilder(group, funder, sp=params, **fees.group_args(prefunded=True)).sign().signed_transactions)
+
+
+async def place_swap(client: AsyncAlgodClient, app_id: int, offer: Account, offering_token_id: int, offering_token_amount: int, accepting_token_id: int, accepting_token_amount, swap_index: str) -> str:
+    """Place or replace a swap on an active swap. See operations.place_swap."""
+    app_address = get_application_address(app_id)
+    suggested_params = await get_suggested_params(client)
+
+    if not await is_opted_in_asset(client, accepting_token_id, offer.get_address()):
+        await optin_asset(client, accepting_token_id, offer)
+
+    tokens = [offering_token_id, accepting_token_id]
+    # app optin asset for receiving the asset
+    offering_opted_in = await is_opted_in_asset(client, offering_token_id, app_address)
+    accepting_opted_in = await is_opted_in_asset(client, accepting_token_id, app_address)
+    if not offering_opted_in and not accepting_opted_in:
+        await setup_swap_app(client=client, app_id=app_id, funder=offer, token_ids=tokens)
+    elif not offering_opted_in:
+        await setup_swap_app(client=client, app_id=app_id, funder=offer, token_ids=[offering_token_id])
+    elif not accepting_opted_in:
+        await setup_swap_app(client=client, app_id=app_id, funder=offer, token_ids=[accepting_token_id])
+
+    local_state = dict()
+    n_address = swap_index
+    # if swap_index is empty, claim a free slot (its token id is 0) from the free-slot index
+    if not n_address:
+        n_address, state = await get_free_slot(client, offer, app_id, SLOT_OPTIN_PRICE, b"O_TKID")
+        local_state = {n_address: state}
+    else:
+        state = await get_app_local_state(client, app_id, swap_index)
+        local_state = {swap_index: state}
+        if b"O_TKID" in state and state[b"O_TKID"] > 0:
+            tokens.append(state[b"O_TKID"])
+
+    token_txn = transaction.AssetTransferTxn(
+        sender=offer.get_address(),
+        receiver=app_address,
+        index=offering_token_id,
+        amt=offering_token_amount,
+        sp=suggested_params,
+    )
+
+    app_call_txn = transaction.ApplicationCallTxn(
+        sender=offer.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"swap", accepting_token_amount.to_bytes(8, "big")],
+        accounts=[n_address],
+        foreign_assets=tokens,
+        sp=suggested_params,
+    )
+
+    group = [token_txn, app_call_txn]
+    try:
+        fees = estimate_fee(approval_program, group, 1, local_state=local_state)
+        await send_and_wait(client, GroupBuilder(group, offer, sp=suggested_params, **fees.group_args()).sign().signed_transactions)
+    except Exception:
+        if not swap_index:
+            # the slot was claimed for this listing, record what it holds
+            await verify_slot(client, n_address, app_id, b"O_TKID")
+        raise
+
+    return n_address
+
+
+async def cancel_swap(client: AsyncAlgodClient, app_id: int, offer: Account, swap_index: str) -> bool:
+    """Cancel a swap on an active swap. See operations.cancel_swap."""
+    if not await is_opted_in_app(client, app_id, swap_index):
+        return False
+
+    offer_app_local_state = await get_app_local_state(client, app_id, swap_index)
+    token_id = offer_app_local_state[b"O_TKID"]
+    suggested_params = await get_suggested_params(client)
+
+    app_call_txn = transaction.ApplicationCallTxn(
+        sender=offer.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"cancel"],
+        accounts=[swap_index],
+        foreign_assets=[token_id],
+        sp=suggested_params,
+    )
+    fees = estimate_fee(approval_program, [app_call_txn], 0, local_state={swap_index: offer_app_local_state})
+    await send_and_wait(client, GroupBuilder([app_call_txn], offer, sp=suggested_params, **fees.group_args()).sign().signed_transactions)
+    # the contract cleared the listing, the slot is free again
+    await release_slot(swap_index, app_id)
+
+
+async def accept_swap(client: AsyncAlgodClient, app_id: int, accepter: Account, swap_index: str) -> None:
+    """Accept on an active swap. See operations.accept_swap."""
+    app_address = get_application_address(app_id)
+    app_config = await get_app_config(client, app_id)
+    suggested_params = await get_suggested_params(client)
+
+    if not await is_opted_in_app(client, app_id, swap_index):
+        return False
+
+    offer_app_local_state = await get_app_local_state(client, app_id, swap_index)
+    offer = encoding.encode_address(offer_app_local_state[b"O_ADDR"])
+    offering_token_id = offer_app_local_state[b"O_TKID"]
+    offering_token_amount = offer_app_local_state[b"O_AMT"]
+    accepting_token_id = offer_app_local_state[b"A_TKID"]
+    accepting_token_amount = offer_app_local_state[b"A_AMT"]
+
+    # check if accepter has enough assets
+    if (await get_balances(client, accepter.get_address()))[accepting_token_id] < accepting_token_amount:
+        return False
+
+    if not await is_opted_in_asset(client, offering_token_id, app_address):
+        return False
+
+    if not await is_opted_in_asset(client, accepting_token_id, app_address):
+        # the offer is only an address here, so the accepter funds the escrow opt in
+        await setup_swap_app(client=client, app_id=app_id, funder=accepter, token_ids=[accepting_token_id])
+
+    if not await is_opted_in_asset(client, offering_token_id, accepter.get_address()):
+        await optin_asset(client, offering_token_id, accepter)
+
+    token_txn = transaction.AssetTransferTxn(
+        sender=accepter.get_address(),
+        receiver=app_address,
+        index=accepting_token_id,
+        amt=accepting_token_amount,
+        sp=suggested_params,
+    )
+
+    app_call_txn = transaction.ApplicationCallTxn(
+        sender=accepter.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"accept", offering_token_amount.to_bytes(8, "big")],
+        foreign_assets=[offering_token_id, accepting_token_id],
+        # must include the offer here to the app can send accepting asset to the offer
+        accounts=[offer,
+                  swap_index,
+                  app_config.staking_address,
+                  app_config.team_wallet_address],
+        sp=suggested_params,
+    )
+
+    group = [token_txn, app_call_txn]
+    fees = estimate_fee(approval_program, group, 1, local_state={swap_index: offer_app_local_state})
+    await send_and_wait(client, GroupBuilder(group, accepter, sp=suggested_params, **fees.group_args()).sign().signed_transactions)
+    # the contract cleared the listing, the slot is free again
+    await release_slot(swap_index, app_id)
+
+
+async def close_swap(client: AsyncAlgodClient, app_id: int, closer: Account, assets: List[int]):
+    """Close an swap. See operations.close_swap."""
+    app_config = await get_app_config(client, app_id)
+
+    accounts: List[str] = [app_config.staking_address,
+                           app_config.team_wallet_address]
+
+    delete_txn = transaction.ApplicationDeleteTxn(
+        sender=closer.get_address(),
+        index=app_id,
+        accounts=accounts,
+        foreign_assets=assets,
+        sp=await get_suggested_params(client),
+    )
+    await send_and_wait(client, [delete_txn.sign(closer.get_private_key())])
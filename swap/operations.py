@@ -13,6 +13,9 @@ from account import Account
 from utils import *
 from .contracts import approval_program, clear_state_program
 
+# min balance of a listing slot's local state in the app, plus its opt-in fee
+SLOT_OPTIN_PRICE = 100000 + 28500 * 4 + 50000 * 1 + 1000
+
 
 def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
     """Get the compiled TEAL contracts for the swap.
@@ -57,7 +60,7 @@ def create_swap_app(
     global_schema = transaction.StateSchema(num_uints=0, num_byte_slices=2)
     local_schema = transaction.StateSchema(num_uints=4, num_byte_slices=1)
     
-    sp = client.suggested_params()
+    sp = get_suggested_params(client)
 
     txn = transaction.ApplicationCreateTxn(
         sender=creator.get_address(),
@@ -116,7 +119,7 @@ def setup_swap_app(
         token_id: The NFT ID.
     """
     app_address = get_application_address(app_id)
-    params = client.suggested_params()
+    params = get_suggested_params(client)
 
     funding_amount = (
         # min optin asset balance
@@ -141,13 +144,10 @@ def setup_swap_app(
         sp=params,
     )
 
-    transaction.assign_group_id([fund_app_txn, setup_txn])
-
-    signed_fund_app_txn = fund_app_txn.sign(funder.get_private_key())
-    signed_setup_txn = setup_txn.sign(funder.get_private_key())
-
-    client.send_transactions([signed_fund_app_txn, signed_setup_txn])
-    wait_for_confirmation(client, signed_fund_app_txn.get_txid())
+    group = [fund_app_txn, setup_txn]
+    fees = estimate_fee(approval_program, group, 1)
+    # the opt-in fees are funded to the app above, it pays its own inner txns
+    GroupBuilder(group, funder, sp=params, **fees.group_args(prefunded=True)).execute(client)
 
     
 def place_swap(client: AlgodClient, app_id: int, offer: Account, offering_token_id: int, offering_token_amount: int, accepting_token_id: int, accepting_token_amount, swap_index: str) -> None:
@@ -162,7 +162,7 @@ def place_swap(client: AlgodClient, app_id: int, offer: Account, offering_token_
         swap_index: Index for replace swap.
     """
     app_address = get_application_address(app_id)
-    suggested_params = client.suggested_params()
+    suggested_params = get_suggested_params(client)
     
     if (is_opted_in_asset(client, accepting_token_id, offer.get_address()) == False):
         optin_asset(client, accepting_token_id, offer)
@@ -178,40 +178,18 @@ def place_swap(client: AlgodClient, app_id: int, offer: Account, offering_token_
     if is_opted_in_asset(client, accepting_token_id, app_address) == False:
         setup_swap_app(client=client, app_id=app_id, funder=offer, token_ids=[accepting_token_id])
     
+    local_state = dict()
     n_address = swap_index
-    # if bid_index is empty, find a usable(if the bid app local state's token id is 0) rekeyed address used in the past, 
+    # if swap_index is empty, claim a free slot (its token id is 0) from the free-slot index
     if not n_address:
-        unused_rekeyed_address = ""
-        rekeyed_addresses = get_rekeyed_addresses(offer.get_address()) # we can get this from network
-        for rekeyed_address in rekeyed_addresses:
-            if is_opted_in_app(client, app_id, rekeyed_address):
-                state = get_app_local_state(client, app_id, rekeyed_address)
-                print(f"local state of {rekeyed_address} :", state)
-                if b"O_TKID" in state and state[b"O_TKID"] == 0:
-                    unused_rekeyed_address = rekeyed_address
-            else:
-                # might have rekeyed address already but not optin app, we can use it
-                unused_rekeyed_address = rekeyed_address
-                optin_price = 100000 + 28500 * 4 + 50000 * 1 + 1000
-                charge_optin_price(client, offer, unused_rekeyed_address, optin_price)
-                optin_app_rekeyed_address(client, app_id, offer, unused_rekeyed_address)
-                break
-        
-        # if not found, create one, and optin app for local state
-        n_address = unused_rekeyed_address
-        if not n_address:
-            optin_price = 100000 + 28500 * 4 + 50000 * 1 + 1000
-            n_address = generate_rekeyed_address(client, offer, app_id, optin_price)
-            optin_app_rekeyed_address(client, app_id, offer, n_address)
-            set_rekeyed_address(offer.get_address(), n_address, 1)
+        n_address, state = get_free_slot(client, offer, app_id, SLOT_OPTIN_PRICE, b"O_TKID")
+        local_state = {n_address: state}
     else:
         state = get_app_local_state(client, app_id, swap_index)
+        local_state = {swap_index: state}
         if b"O_TKID" in state and state[b"O_TKID"] > 0:
             tokens.append(state[b"O_TKID"])
         
-    txns = []
-    signed_txns = []
-        
     token_txn = transaction.AssetTransferTxn(
         sender=offer.get_address(),
         receiver=app_address,
@@ -220,10 +198,6 @@ def place_swap(client: AlgodClient, app_id: int, offer: Account, offering_token_
         sp=suggested_params,
     )
     print(f"token_txn: {token_txn}")
-    txns.append(token_txn)
-
-    if len(tokens) == 3:
-        suggested_params.fee = 2 * 1_000
         
     app_call_txn = transaction.ApplicationCallTxn(
         sender=offer.get_address(),
@@ -234,18 +208,15 @@ def place_swap(client: AlgodClient, app_id: int, offer: Account, offering_token_
         foreign_assets=tokens,
         sp=suggested_params,
     )
-    txns.append(app_call_txn)
-    
-    transaction.assign_group_id(txns)
-    
-    signed_token_txn = token_txn.sign(offer.get_private_key())
-    signed_txns.append(signed_token_txn)
-    
-    signed_app_call_txn = app_call_txn.sign(offer.get_private_key())
-    signed_txns.append(signed_app_call_txn)
-
-    client.send_transactions(signed_txns)
-    wait_for_confirmation(client, app_call_txn.get_txid())
+    group = [token_txn, app_call_txn]
+    try:
+        fees = estimate_fee(approval_program, group, 1, local_state=local_state)
+        GroupBuilder(group, offer, sp=suggested_params, **fees.group_args()).execute(client)
+    except Exception:
+        if not swap_index:
+            # the slot was claimed for this listing, record what it holds
+            verify_slot(client, n_address, app_id, b"O_TKID")
+        raise
     
     return n_address
     
@@ -263,9 +234,8 @@ def cancel_swap(client: AlgodClient, app_id: int, offer: Account, swap_index: st
     
     offer_app_local_state = get_app_local_state(client, app_id, swap_index)
     token_id = offer_app_local_state[b"O_TKID"]
-    suggested_params = client.suggested_params()
+    suggested_params = get_suggested_params(client)
     
-    suggested_params.fee = 2 * 1_000
     app_call_txn = transaction.ApplicationCallTxn(
         sender=offer.get_address(),
         index=app_id,
@@ -276,9 +246,10 @@ def cancel_swap(client: AlgodClient, app_id: int, offer: Account, swap_index: st
         sp=suggested_params,
     )
     
-    signed_app_call_txn = app_call_txn.sign(offer.get_private_key())
-    client.send_transaction(signed_app_call_txn)    
-    wait_for_confirmation(client, app_call_txn.get_txid())    
+    fees = estimate_fee(approval_program, [app_call_txn], 0, local_state={swap_index: offer_app_local_state})
+    GroupBuilder([app_call_txn], offer, sp=suggested_params, **fees.group_args()).execute(client)
+    # the contract cleared the listing, the slot is free again
+    release_slot(swap_index, app_id)
     
     # #do we need this store app opt out? cause the offer might wants to swap again later ?
     # app_global_state = get_app_global_state(client, app_id)
@@ -301,8 +272,8 @@ def accept_swap(client: AlgodClient, app_id: int, accepter: Account, swap_index:
         accepter: The account buying the asset.
     """
     app_address = get_application_address(app_id)
-    app_global_state = get_app_global_state(client, app_id)
-    suggested_params = client.suggested_params()
+    app_config = get_app_config(client, app_id)
+    suggested_params = get_suggested_params(client)
 
     if (is_opted_in_app(client, app_id, swap_index) == False): 
         return False
@@ -340,7 +311,6 @@ def accept_swap(client: AlgodClient, app_id: int, accepter: Account, swap_index:
         sp=suggested_params,
     )
     
-    suggested_params.fee = 3 * 1_000
     app_call_txn = transaction.ApplicationCallTxn(
         sender=accepter.get_address(),
         index=app_id,
@@ -350,17 +320,16 @@ def accept_swap(client: AlgodClient, app_id: int, accepter: Account, swap_index:
         # must include the offer here to the app can send accepting asset to the offer
         accounts=[offer, 
                   swap_index,
-                  encoding.encode_address(app_global_state[b"SA_ADDR"]), 
-                  encoding.encode_address(app_global_state[b"TW_ADDR"])],
+                  app_config.staking_address, 
+                  app_config.team_wallet_address],
         sp=suggested_params,
     )
     
-    transaction.assign_group_id([token_txn, app_call_txn])
-    signed_token_txn = token_txn.sign(accepter.get_private_key())
-    signed_app_call_txn = app_call_txn.sign(accepter.get_private_key())
-    
-    client.send_transactions([signed_token_txn, signed_app_call_txn])
-    wait_for_confirmation(client, app_call_txn.get_txid())
+    group = [token_txn, app_call_txn]
+    fees = estimate_fee(approval_program, group, 1, local_state={swap_index: offer_app_local_state})
+    GroupBuilder(group, accepter, sp=suggested_params, **fees.group_args()).execute(client)
+    # the contract cleared the listing, the slot is free again
+    release_slot(swap_index, app_id)
 
 
 def close_swap(client: AlgodClient, app_id: int, closer: Account, assets: List[int]):
@@ -380,12 +349,12 @@ def close_swap(client: AlgodClient, app_id: int, closer: Account, assets: List[i
         closer: The account initiating the close transaction. This must be
             the swap creator.
     """
-    app_global_state = get_app_global_state(client, app_id)
+    app_config = get_app_config(client, app_id)
 
     print(b"assets", assets)
 
-    accounts: List[str] = [encoding.encode_address(app_global_state[b"SA_ADDR"]), 
-                           encoding.encode_address(app_global_state[b"TW_ADDR"])]
+    accounts: List[str] = [app_config.staking_address, 
+                           app_config.team_wallet_address]
     print(b"accounts", accounts)
     
     delete_txn = transaction.ApplicationDeleteTxn(
@@ -393,7 +362,7 @@ def close_swap(client: AlgodClient, app_id: int, closer: Account, assets: List[i
         index=app_id,
         accounts=accounts,
         foreign_assets=assets,
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
     )
     signed_delete_txn = delete_txn.sign(closer.get_private_key())
     client.send_transaction(signed_delete_txn)
@@ -5,13 +5,13 @@ from algosdk.v2client.algod import AlgodClient
 from algosdk.future import transaction
 
 from account import Account
-from utils import get_algod_client, wait_for_confirmation
+from utils import get_algod_client, get_suggested_params, wait_for_confirmation
 
 
 def create_dummy_asset(client: AlgodClient, sender: Account, total: int, decimals: int, asset_name: str, unit_name: str):
     txn = transaction.AssetConfigTxn(
         sender=sender.get_address(),
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         total=total,
         decimals=decimals,
         asset_name=asset_name,
@@ -34,7 +34,9 @@ def create_dummy_asset(client: AlgodClient, sender: Account, total: int, decimal
 if __name__ == '__main__':
     dotenv.load_dotenv('.env')
 
-    client = get_algod_client(os.environ.get('ALGOD_URL'), os.environ.get('ALGOD_TOKEN'))
+    # ALGOD_URL may list several comma separated endpoints, most preferred first
+    urls = os.environ.get('ALGOD_URL').split(',')
+    client = get_algod_client(urls if len(urls) > 1 else urls[0], os.environ.get('ALGOD_TOKEN'))
     creator = Account.from_mnemonic(os.environ.get("CREATOR_MN"))
     asset_id = create_dummy_asset(client, creator, 1_000_000_000, 3, "Algoverse Token", "AVT")
     print(f"Token ID: {asset_id}")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules of this repository import each other from its root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,87 @@
+import pytest
+from algosdk import account, encoding
+from algosdk.future import transaction
+from algosdk.logic import get_application_address
+
+from auction.contracts import approval_program as auction_program
+from fee_estimator import estimate_fee, get_contract_fees
+from staking.contracts import approval_program as staking_program
+
+
+APP_ID = 42
+TOKEN_ID = 9
+
+
+@pytest.fixture
+def sp():
+    return transaction.SuggestedParams(0, 1, 1000, "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=")
+
+
+def _address():
+    return account.generate_account()[1]
+
+
+def _auction_state(lead_bidder=None, lead_bid=0):
+    return {
+        b"TK_ID": TOKEN_ID,
+        b"RA": 1_000_000,
+        b"MBI": 100_000,
+        b"LB_ADDR": encoding.decode_address(lead_bidder) if lead_bidder else bytes(32),
+        b"LBP": lead_bid,
+        b"NB": 1 if lead_bidder else 0,
+    }
+
+
+def _bid(sp, bidder, auction_index, amount, lead_bidder=None):
+    pay = transaction.PaymentTxn(bidder, sp, get_application_address(APP_ID), amount)
+    call = transaction.ApplicationCallTxn(
+        bidder, sp, APP_ID, transaction.OnComplete.NoOpOC,
+        app_args=[b"bid"],
+        foreign_assets=[TOKEN_ID],
+        accounts=[auction_index, lead_bidder] if lead_bidder else [auction_index],
+    )
+    return [pay, call]
+
+
+def test_auction_outbid_refunds_lead_bidder(sp):
+    bidder, auction_index, lead_bidder = _address(), _address(), _address()
+    holdings = {(get_application_address(APP_ID), TOKEN_ID): 1}
+    group = _bid(sp, bidder, auction_index, 2_000_000, lead_bidder)
+    estimate = estimate_fee(auction_program, group, 1,
+                            local_state={auction_index: _auction_state(lead_bidder, 1_000_000)}, holdings=holdings)
+    # the refund is paid from the fees held back from the bid, not by the caller
+    assert estimate.min_fees == {}
+    assert estimate.group_args()["inner_txns"] == {1: 1}
+
+
+def test_auction_bid_below_reserve_raises(sp):
+    bidder, auction_index = _address(), _address()
+    holdings = {(get_application_address(APP_ID), TOKEN_ID): 1}
+    with pytest.raises(Exception, match="would be rejected"):
+        estimate_fee(auction_program, _bid(sp, bidder, auction_index, 1000), 1,
+                     local_state={auction_index: _auction_state()}, holdings=holdings)
+
+
+def test_auction_bid_with_no_asset_in_the_app_raises(sp):
+    bidder, auction_index = _address(), _address()
+    holdings = {(get_application_address(APP_ID), TOKEN_ID): 0}
+    with pytest.raises(Exception, match="would be rejected"):
+        estimate_fee(auction_program, _bid(sp, bidder, auction_index, 5_000_000), 1,
+                     local_state={auction_index: _auction_state()}, holdings=holdings)
+
+
+def test_staking_stake_fee(sp):
+    sender = _address()
+    transfer = transaction.ApplicationCallTxn(
+        sender, sp, 50, transaction.OnComplete.NoOpOC, app_args=[b"transfer", (5).to_bytes(8, "big")]
+    )
+    stake = transaction.ApplicationCallTxn(
+        sender, sp, APP_ID, transaction.OnComplete.NoOpOC, app_args=[b"stake", (5).to_bytes(8, "big")]
+    )
+    assert estimate_fee(staking_program, [transfer, stake], 1).min_fees == {0: 4000}
+
+
+def test_auction_inner_txn_counts():
+    counts = get_contract_fees(auction_program).inner_txn_counts()
+    assert counts["close"] == [1, 4]
+    assert counts["bid"] == [0, 1]
@@ -0,0 +1,120 @@
+import pytest
+from algosdk import account
+from algosdk.future import transaction
+
+from group_packer import (
+    ALONE,
+    ANYWHERE,
+    FIRST,
+    MAX_ACCOUNTS,
+    MAX_GROUP_SIZE,
+    MAX_REFERENCES,
+    Operation,
+    References,
+    chunks,
+    pack,
+)
+
+
+SENDER = account.generate_account()[1]
+SP = transaction.SuggestedParams(1000, 1, 1000, "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=", flat_fee=True)
+
+
+def _operation(size, position=ANYWHERE, **kwargs):
+    return Operation([transaction.PaymentTxn(SENDER, SP, SENDER, i) for i in range(size)], None,
+                     position=position, **kwargs)
+
+
+def _app_call(**kwargs):
+    return transaction.ApplicationCallTxn(SENDER, SP, 1, transaction.OnComplete.NoOpOC, **kwargs)
+
+
+def _layout(groups):
+    return [[(op.position, len(op)) for op in group.operations] for group in groups]
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_groups_hold_at_most_16_transactions(ordered):
+    operations = [_operation(size) for size in (5, 9, 3, 7, 1, 1, 10, 6)]
+    groups = pack(operations, ordered)
+    assert all(len(group) <= MAX_GROUP_SIZE for group in groups)
+    assert sum(len(group) for group in groups) == 42
+    assert sorted(id(op) for group in groups for op in group.operations) == sorted(id(op) for op in operations)
+
+
+def test_ordered_keeps_the_stream_order():
+    operations = [_operation(size) for size in (5, 9, 3, 7, 1, 1, 10, 6)]
+    groups = pack(operations)
+    assert [len(group) for group in groups] == [14, 12, 16]
+    assert [op for group in groups for op in group.operations] == operations
+
+
+def test_unordered_packs_fewest_groups():
+    operations = [_operation(size) for size in (5, 9, 3, 7, 1, 1, 10, 6)]
+    assert [len(group) for group in pack(operations, ordered=False)] == [16, 16, 10]
+
+
+def test_full_operation_gets_its_own_group():
+    groups = pack([_operation(1), _operation(MAX_GROUP_SIZE), _operation(1)])
+    assert [len(group) for group in groups] == [1, 16, 1]
+
+
+def test_operation_over_the_group_limit_is_rejected():
+    with pytest.raises(Exception):
+        _operation(MAX_GROUP_SIZE + 1)
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_first_opens_its_group(ordered):
+    operations = [_operation(2), _operation(3, FIRST), _operation(2), _operation(3, FIRST)]
+    groups = pack(operations, ordered)
+    for group in groups:
+        positions = [op.position for op in group.operations]
+        assert FIRST not in positions[1:]
+    assert sum(op.position == FIRST for group in groups for op in group.operations) == 2
+    if ordered:
+        assert _layout(groups) == [[(ANYWHERE, 2)], [(FIRST, 3), (ANYWHERE, 2)], [(FIRST, 3)]]
+    else:
+        assert _layout(groups) == [[(FIRST, 3), (ANYWHERE, 2), (ANYWHERE, 2)], [(FIRST, 3)]]
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_alone_gets_a_group_to_itself(ordered):
+    operations = [_operation(2), _operation(1, ALONE), _operation(2), _operation(2, FIRST)]
+    groups = pack(operations, ordered)
+    alone = [group for group in groups if any(op.position == ALONE for op in group.operations)]
+    assert len(alone) == 1
+    assert len(alone[0].operations) == 1
+
+
+def test_fee_fields_are_offset_within_the_group():
+    operations = [_operation(3, min_fees={0: 2000}), _operation(2, inner_txns={1: 4}, min_fees={1: 5000})]
+    group, = pack(operations)
+    assert group.min_fees == {0: 2000, 4: 5000}
+    assert group.inner_txns == {4: 4}
+
+
+def test_references_are_applied():
+    txn = _app_call()
+    Operation([txn], None, references={0: References(accounts=[SENDER], assets=[5, 6], apps=[7])})
+    assert (txn.accounts, txn.foreign_assets, txn.foreign_apps) == ([SENDER], [5, 6], [7])
+
+
+def test_too_many_accounts_are_rejected():
+    with pytest.raises(Exception, match="accounts"):
+        Operation([_app_call()], None, references={0: References(accounts=[SENDER] * (MAX_ACCOUNTS + 1))})
+    with pytest.raises(Exception, match="accounts"):
+        Operation([_app_call(accounts=[SENDER] * (MAX_ACCOUNTS + 1))], None)
+
+
+def test_too_many_references_are_rejected():
+    references = References(accounts=[SENDER] * MAX_ACCOUNTS, assets=list(range(1, MAX_REFERENCES - MAX_ACCOUNTS + 2)))
+    with pytest.raises(Exception, match="references"):
+        Operation([_app_call()], None, references={0: references})
+    with pytest.raises(Exception, match="references"):
+        Operation([_app_call(foreign_assets=list(range(1, MAX_REFERENCES + 2)))], None)
+    Operation([_app_call(foreign_assets=list(range(1, MAX_REFERENCES + 1)))], None)
+
+
+def test_chunks():
+    assert chunks(list(range(10)), 4) == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
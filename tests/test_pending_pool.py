@@ -0,0 +1,92 @@
+import msgpack
+import pytest
+from algosdk import account
+from algosdk.future import transaction
+
+from pending_pool import MAX_PENDING_TXNS, PendingConflict, PendingPool, _top_transactions, index_pending
+
+
+SENDER = account.generate_account()[1]
+SLOT = account.generate_account()[1]
+SP = transaction.SuggestedParams(1000, 1, 1000, "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=", flat_fee=True)
+
+
+def _signed(txn):
+    # the pool returns signed transactions, the signature is not looked at
+    return {"sig": b"\x00" * 64, "txn": txn.dictify()}
+
+
+def _call(app_id, method=b"bid", accounts=None):
+    return transaction.ApplicationCallTxn(SENDER, SP, app_id, transaction.OnComplete.NoOpOC,
+                                          app_args=[method], accounts=accounts)
+
+
+def _response(txns, **extra):
+    response = dict(extra)
+    response["top-transactions"] = None if txns is None else [_signed(txn) for txn in txns]
+    response["total-transactions"] = 0 if txns is None else len(txns)
+    return msgpack.packb(response, use_bin_type=True)
+
+
+def test_top_transactions_yields_every_transaction():
+    txns = [_call(1), transaction.PaymentTxn(SENDER, SP, SLOT, 5)]
+    decoded = list(_top_transactions(_response(txns)))
+    assert [signed["txn"]["type"] for signed in decoded] == ["appl", "pay"]
+
+
+def test_top_transactions_of_an_empty_pool():
+    assert list(_top_transactions(_response(None))) == []
+    assert list(_top_transactions(_response([]))) == []
+
+
+def test_top_transactions_skips_other_keys():
+    response = msgpack.packb({"total-transactions": 1, "other": {"a": [1, 2]},
+                              "top-transactions": [_signed(_call(1))]}, use_bin_type=True)
+    assert len(list(_top_transactions(response))) == 1
+
+
+def test_index_pending_by_sender_and_accounts():
+    call = _call(7, accounts=[SLOT])
+    calls = index_pending(_response([call, transaction.PaymentTxn(SENDER, SP, SLOT, 5)]))
+    assert set(calls) == {(7, SENDER), (7, SLOT)}
+    pending = calls[(7, SLOT)][0]
+    assert pending.sender == SENDER
+    assert pending.method == b"bid"
+    assert pending.tx_id == call.get_txid()
+
+
+def test_index_pending_keeps_only_the_given_apps():
+    calls = index_pending(_response([_call(7, accounts=[SLOT]), _call(8, accounts=[SLOT])]), {8})
+    assert set(calls) == {(8, SENDER), (8, SLOT)}
+
+
+def test_index_pending_of_an_empty_pool():
+    assert index_pending(_response(None)) == {}
+
+
+class _Client:
+    def __init__(self, txns):
+        self.txns = txns
+        self.requests = []
+
+    def pending_transactions(self, max_txns=0, response_format="json"):
+        self.requests.append(max_txns)
+        return _response(self.txns)
+
+
+def test_pending_pool_reads_a_capped_pool_once():
+    client = _Client([_call(7, accounts=[SLOT])])
+    pool = PendingPool(client, max_age=60)
+    with pytest.raises(PendingConflict):
+        pool.check(7, SLOT)
+    pool.check(7, account.generate_account()[1])
+    assert client.requests == [MAX_PENDING_TXNS]
+
+
+def test_pending_pool_reads_again_for_a_new_app():
+    client = _Client([_call(8, accounts=[SLOT])])
+    pool = PendingPool(client, max_age=60)
+    pool.check(7, SLOT)
+    with pytest.raises(PendingConflict):
+        pool.check(8, SLOT)
+    assert len(client.requests) == 2
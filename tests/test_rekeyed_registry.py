@@ -0,0 +1,154 @@
+import json
+import multiprocessing
+import time
+
+import pytest
+
+from rekeyed_registry import NO_APP, SLOT_CLOSING, SLOT_FREE, SLOT_IN_USE, SLOT_NEW, RekeyedRegistry
+
+
+OWNER = "OWNER"
+APP = 7
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "slots.db")
+
+
+@pytest.fixture
+def registry(path):
+    registry = RekeyedRegistry(path, legacy_json=None)
+    yield registry
+    registry.close()
+
+
+def _slots(registry, count, app_id=APP, state=SLOT_FREE, prefix="SLOT"):
+    addresses = [f"{prefix}{i:03}" for i in range(count)]
+    for address in addresses:
+        registry.add(OWNER, address, 1)
+        if state is not None:
+            registry.set_state(address, app_id, state)
+    return addresses
+
+
+def _claim_all(path, queue):
+    registry = RekeyedRegistry(path, legacy_json=None)
+    claimed = []
+    while True:
+        address = registry.claim(OWNER, APP)
+        if address is None:
+            break
+        claimed.append(address)
+    queue.put(claimed)
+
+
+def test_claim_takes_the_oldest_free_slot(registry):
+    addresses = _slots(registry, 3)
+    registry.mark(addresses[0], APP, SLOT_IN_USE)
+    assert registry.claim(OWNER, APP) == addresses[1]
+    assert registry.state(addresses[1], APP) == SLOT_IN_USE
+    assert registry.claim(OWNER, APP) == addresses[2]
+    assert registry.claim(OWNER, APP) is None
+    assert registry.claim(OWNER, APP + 1) is None
+
+
+def test_claim_race_between_processes(registry, path):
+    addresses = _slots(registry, 200)
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    workers = [context.Process(target=_claim_all, args=(path, queue)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    claimed = [queue.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+    every = claimed[0] + claimed[1]
+    assert len(every) == len(set(every))
+    assert sorted(every) == addresses
+    assert registry.count(OWNER, APP, SLOT_IN_USE) == 200
+
+
+def test_index_records_a_slot_once(registry):
+    address, = _slots(registry, 1, state=None)
+    assert registry.index(address, APP, SLOT_IN_USE)
+    assert not registry.index(address, APP, SLOT_FREE)
+    assert registry.state(address, APP) == SLOT_IN_USE
+    with pytest.raises(Exception):
+        registry.index("UNKNOWN", APP, SLOT_FREE)
+
+
+def test_unused_skips_indexed_and_closing_slots(registry):
+    fresh = _slots(registry, 3, state=None, prefix="FRESH")
+    used = _slots(registry, 2, prefix="USED")
+    other = _slots(registry, 1, app_id=APP + 1, prefix="OTHER")
+    registry.set_state(fresh[1], APP + 1, SLOT_CLOSING)
+    assert registry.unused(OWNER, APP, limit=10) == [fresh[0], fresh[2]] + other
+    assert registry.unused(OWNER, APP, limit=1) == [fresh[0]]
+    assert registry.unused(OWNER, APP + 1, limit=10) == [fresh[0], fresh[2]] + used
+    assert registry.unused("NOBODY", APP, limit=10) == []
+
+
+def test_reserve_idle_keeps_the_newest_free_slots(registry):
+    free = _slots(registry, 5, prefix="FREE")
+    busy = _slots(registry, 2, state=SLOT_IN_USE, prefix="BUSY")
+    new = _slots(registry, 1, state=SLOT_NEW, prefix="NEW")
+    reserved = registry.reserve_idle(OWNER, time.time() + 1, keep=2, limit=10)
+    assert reserved == free[:3] + new
+    assert all(registry.state(address, APP) == SLOT_CLOSING for address in reserved)
+    assert all(registry.state(address, APP) == SLOT_IN_USE for address in busy)
+    assert registry.find(OWNER, APP, SLOT_FREE, limit=10) == free[3:]
+    assert registry.reserve_idle(OWNER, time.time() + 1, keep=2, limit=10) == []
+
+
+def test_reserve_idle_needs_every_app_idle(registry):
+    first, second = _slots(registry, 2)
+    registry.set_state(second, APP + 1, SLOT_IN_USE)
+    assert registry.reserve_idle(OWNER, time.time() + 1, limit=10) == [first]
+
+
+def test_reserve_idle_skips_recent_slots(registry):
+    _slots(registry, 3)
+    assert registry.reserve_idle(OWNER, time.time() - 3600, limit=10) == []
+
+
+def test_reserved_slots_are_not_claimed_until_unreserved(registry):
+    address, = _slots(registry, 1)
+    assert registry.reserve_idle(OWNER, time.time() + 1) == [address]
+    assert registry.claim(OWNER, APP) is None
+    assert registry.unused(OWNER, APP + 1) == []
+    registry.unreserve(address)
+    assert registry.state(address, APP) is None
+    assert registry.unused(OWNER, APP) == [address]
+
+
+def test_import_json_runs_once(tmp_path, path):
+    legacy = tmp_path / "rekeyed_addresses.json"
+    legacy.write_text(json.dumps({OWNER: {"B": 1, "A": 0, "C": 1}, "OTHER": {"D": 1}}))
+    registry = RekeyedRegistry(path, legacy_json=str(legacy))
+    assert registry.addresses(OWNER) == ["B", "A", "C"]
+    assert registry.all() == {OWNER: {"B": 1, "A": 0, "C": 1}, "OTHER": {"D": 1}}
+    assert registry.import_json(str(legacy)) == 0
+    registry.close()
+
+    reopened = RekeyedRegistry(path, legacy_json=str(legacy))
+    assert reopened.count(OWNER) == 3
+    assert reopened.import_json(str(legacy)) == 0
+    reopened.close()
+
+
+def test_reserve_idle_takes_slots_never_used(registry):
+    old, = _slots(registry, 1, state=None, prefix="OLD")
+    assert registry.reserve_idle(OWNER, time.time() + 1) == [old]
+    assert registry.state(old, NO_APP) == SLOT_CLOSING
+    assert registry.unused(OWNER, APP) == []
+    assert registry.reserve_idle(OWNER, time.time() + 1) == []
+    registry.unreserve(old)
+    assert registry.state(old, NO_APP) is None
+    assert registry.unused(OWNER, APP) == [old]
+
+
+def test_reserve_idle_skips_recent_slots_never_used(registry):
+    _slots(registry, 2, state=None)
+    assert registry.reserve_idle(OWNER, time.time() - 3600) == []
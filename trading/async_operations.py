@@ -0,0 +1,312 @@
+from typing import Tuple, List
+
+from algosdk.future import transaction
+from algosdk.logic import get_application_address
+
+from account import Account
+from async_client import AsyncAlgodClient
+from async_utils import *
+from fee_estimator import estimate_fee
+from .contracts import approval_program, clear_state_program
+
+# min balance of a listing slot's local state in the app, plus its opt-in fee
+SLOT_OPTIN_PRICE = 100000 + 28500 * 3 + 50000 * 1 + 1000
+
+
+async def get_contracts(client: AsyncAlgodClient) -> Tuple[bytes, bytes]:
+    """Get the compiled TEAL contracts for the trading.
+
+    Args:
+        client: An async algod client that has the ability to compile TEAL programs.
+
+    Returns:
+        A tuple of 2 byte strings. The first is the approval program, and the
+        second is the clear state program.
+    """
+    approval = await fully_compile_contract(client, approval_program())
+    clear_state = await fully_compile_contract(client, clear_state_program())
+
+    return approval, clear_state
+
+
+async def create_trading_app(
+    client: AsyncAlgodClient,
+    creator: Account,
+    store_app_id: int,
+    staking_address: str,
+    team_wallet_address: str
+) -> int:
+    """Create a new trading. See operations.create_trading_app."""
+    approval, clear = await get_contracts(client)
+
+    global_schema = transaction.StateSchema(num_uints=1, num_byte_slices=2)
+    local_schema = transaction.StateSchema(num_uints=3, num_byte_slices=1)
+
+    sp = await get_suggested_params(client)
+
+    txn = transaction.ApplicationCreateTxn(
+        sender=creator.get_address(),
+        on_complete=transaction.OnComplete.NoOpOC,
+        approval_program=approval,
+        clear_program=clear,
+        global_schema=global_schema,
+        local_schema=local_schema,
+        app_args=[],
+        foreign_apps=[store_app_id],
+        accounts=[staking_address, team_wallet_address],
+        sp=sp,
+    )
+    response = await send_and_wait(client, [txn.sign(creator.get_private_key())])
+    assert response.application_index is not None and response.application_index > 0
+
+    app_id = response.application_index
+    initial_funding_amount = (
+        # min account balance
+        100_000
+        # for optin asset
+        + 100_000
+        # optin asset fee
+        + 1_000
+    )
+
+    initial_fund_app_txn = transaction.PaymentTxn(
+        sender=creator.get_address(),
+        receiver=get_application_address(appID=app_id),
+        amt=initial_funding_amount,
+        sp=sp,
+    )
+    await send_and_wait(client, [initial_fund_app_txn.sign(creator.get_private_key())])
+
+    return app_id
+
+
+async def setup_trading_app(
+    client: AsyncAlgodClient,
+    app_id: int,
+    funder: Account,
+    token_id: int,
+) -> None:
+    """Finish setting up an trading. See operations.setup_trading_app."""
+    app_address = get_application_address(app_id)
+    params = await get_suggested_params(client)
+
+    funding_amount = (
+        # opt into asset min balance
+        + 100_000
+    )
+    pay_txn = transaction.PaymentTxn(
+        sender=funder.get_address(),
+        receiver=app_address,
+        amt=funding_amount,
+        sp=params,
+    )
+
+    setup_txn = transaction.ApplicationCallTxn(
+        sender=funder.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"setup"],
+        foreign_assets=[token_id],
+        sp=params,
+    )
+
+    group = [pay_txn, setup_txn]
+    fees = estimate_fee(approval_program, group, 1)
+    await send_and_wait(client, GroupBuilder(group, funder, sp=params, **fees.group_args()).sign().signed_transactions)
+
+
+async def place_trade(client: AsyncAlgodClient, app_id: int, seller: Account, token_id: int, token_amount: int, price: int, trading_index: str) -> str:
+    """Place or replace a trade on an active trading. See operations.place_trade."""
+    app_address = get_application_address(app_id)
+    app_config = await get_app_config(client, app_id)
+    suggested_params = await get_suggested_params(client)
+
+    # optin store app for saving information
+    store_app_id = app_config.store_app_id
+    if not await is_opted_in_app(client, store_app_id, seller.get_address()):
+        await optin_app(client, store_app_id, seller)
+
+    # app optin asset for receiving the asset
+    if not await is_opted_in_asset(client, token_id, app_address):
+        await setup_trading_app(client=client, app_id=app_id, funder=seller, token_id=token_id)
+
+    tokens = [token_id]
+    local_state = dict()
+    n_address = trading_index
+    # if trading_index is empty, claim a free slot (its token id is 0) from the free-slot index
+    if not n_address:
+        n_address, state = await get_free_slot(client, seller, app_id, SLOT_OPTIN_PRICE)
+        local_state = {n_address: state}
+    else:
+        state = await get_app_local_state(client, app_id, trading_index)
+        local_state = {trading_index: state}
+        if b"TK_ID" in state and state[b"TK_ID"] > 0 and state[b"TA"] > 0:
+            tokens.append(state[b"TK_ID"])
+
+    token_txn = transaction.AssetTransferTxn(
+        sender=seller.get_address(),
+        receiver=app_address,
+        index=token_id,
+        amt=token_amount,
+        sp=suggested_params,
+    )
+
+    app_call_txn = transaction.ApplicationCallTxn(
+        sender=seller.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"trade", price.to_bytes(8, "big")],
+        accounts=[n_address],
+        foreign_assets=tokens,
+        sp=suggested_params,
+    )
+
+    group = [token_txn, app_call_txn]
+    try:
+        fees = estimate_fee(approval_program, group, 1, local_state=local_state)
+        await send_and_wait(client, GroupBuilder(group, seller, sp=suggested_params, **fees.group_args()).sign().signed_transactions)
+    except Exception:
+        if not trading_index:
+            # the slot was claimed for this listing, record what it holds
+            await verify_slot(client, n_address, app_id)
+        raise
+
+    return n_address
+
+
+async def cancel_trade(client: AsyncAlgodClient, app_id: int, seller: Account, trading_index: str) -> bool:
+    """Cancel a trade on an active trading. See operations.cancel_trade."""
+    if not await is_opted_in_app(client, app_id, trading_index):
+        return False
+
+    seller_app_local_state = await get_app_local_state(client, app_id, trading_index)
+    token_id = seller_app_local_state[b"TK_ID"]
+    suggested_params = await get_suggested_params(client)
+
+    app_call_txn = transaction.ApplicationCallTxn(
+        sender=seller.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"cancel"],
+        accounts=[trading_index],
+        foreign_assets=[token_id],
+        sp=suggested_params,
+    )
+    fees = estimate_fee(approval_program, [app_call_txn], 0, local_state={trading_index: seller_app_local_state})
+    await send_and_wait(client, GroupBuilder([app_call_txn], seller, sp=suggested_params, **fees.group_args()).sign().signed_transactions)
+    # the contract cleared the listing, the slot is free again
+    await release_slot(trading_index, app_id)
+
+
+async def cancel_trades(client: AsyncAlgodClient, app_id: int, seller: Account, trading_indexes: List[str]) -> int:
+    """Cancel several trades of a seller. See operations.cancel_trades."""
+    suggested_params = await get_suggested_params(client)
+    operations, cancelled = [], []
+    for trading_index in trading_indexes:
+        if not await is_opted_in_app(client, app_id, trading_index):
+            continue
+        local_state = await get_app_local_state(client, app_id, trading_index)
+        if not local_state.get(b"TK_ID"):
+            continue
+        app_call_txn = transaction.ApplicationCallTxn(
+            sender=seller.get_address(),
+            index=app_id,
+            on_complete=transaction.OnComplete.NoOpOC,
+            app_args=[b"cancel"],
+            accounts=[trading_index],
+            foreign_assets=[local_state[b"TK_ID"]],
+            sp=suggested_params,
+        )
+        fees = estimate_fee(approval_program, [app_call_txn], 0, local_state={trading_index: local_state})
+        operations.append(Operation([app_call_txn], seller, **fees.group_args()))
+        cancelled.append(trading_index)
+
+    await execute_operations(client, operations, ordered=False)
+    for trading_index in cancelled:
+        await release_slot(trading_index, app_id)
+    return len(operations)
+
+
+async def accept_trade(client: AsyncAlgodClient, app_id: int, buyer: Account, seller: str, trading_index: str) -> None:
+    """Accept on an active trading. See operations.accept_trade."""
+    app_address = get_application_address(app_id)
+    app_config = await get_app_config(client, app_id)
+    suggested_params = await get_suggested_params(client)
+
+    if not await is_opted_in_app(client, app_id, trading_index):
+        return False
+
+    seller_app_local_state = await get_app_local_state(client, app_id, trading_index)
+    token_id = seller_app_local_state[b"TK_ID"]
+    token_amount = seller_app_local_state[b"TA"]
+    trading_price = seller_app_local_state[b"TP"]
+
+    # check if buyer has enough algo
+    if (await get_balances(client, buyer.get_address()))[0] < trading_price:
+        return False
+
+    store_app_id = app_config.store_app_id
+    pay_txn = transaction.PaymentTxn(
+        sender=buyer.get_address(),
+        receiver=app_address,
+        amt=trading_price + 4_000, # 1_000 is for asset txn, 3_000 is for split payment txn
+        sp=suggested_params,
+    )
+
+    app_call_txn = transaction.ApplicationCallTxn(
+        sender=buyer.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"accept", token_amount.to_bytes(8, "big")],
+        foreign_assets=[token_id],
+        # must include the seller here to the app can refund that seller's payment
+        accounts=[seller,
+                  trading_index,
+                  app_config.staking_address,
+                  app_config.team_wallet_address],
+        sp=suggested_params,
+    )
+
+    store_app_call_txn = transaction.ApplicationCallTxn(
+        sender=buyer.get_address(),
+        sp=suggested_params,
+        index=store_app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"buy"],
+        accounts=[seller]
+    )
+
+    group = [pay_txn, app_call_txn, store_app_call_txn]
+    # an acceptance the contract rejects raises here, before anything is sent
+    fees = estimate_fee(approval_program, group, 1, local_state={trading_index: seller_app_local_state},
+                        global_state=app_config.global_state())
+    # an accept or cancel already in the pool closes the trade first
+    await get_pending_pool(client).check(app_id, trading_index)
+
+    if not await is_opted_in_app(client, store_app_id, buyer.get_address()):
+        await optin_app(client, store_app_id, buyer)
+
+    if not await is_opted_in_asset(client, token_id, buyer.get_address()):
+        await optin_asset(client, token_id, buyer)
+
+    # the payment carries the fees of the inner transactions
+    await send_and_wait(client, GroupBuilder(group, buyer, sp=suggested_params, **fees.group_args(prefunded=True)).sign().signed_transactions)
+    # the contract cleared the listing, the slot is free again
+    await release_slot(trading_index, app_id)
+
+
+async def close_trading(client: AsyncAlgodClient, app_id: int, closer: Account, assets: List[int]):
+    """Close an trading. See operations.close_trading."""
+    app_config = await get_app_config(client, app_id)
+
+    accounts: List[str] = [app_config.staking_address,
+                           app_config.team_wallet_address]
+
+    delete_txn = transaction.ApplicationDeleteTxn(
+        sender=closer.get_address(),
+        index=app_id,
+        accounts=accounts,
+        foreign_assets=assets,
+        sp=await get_suggested_params(client),
+    )
+    await send_and_wait(client, [delete_txn.sign(closer.get_private_key())])
@@ -13,6 +13,9 @@ from account import Account
 from utils import *
 from .contracts import approval_program, clear_state_program
 
+# min balance of a listing slot's local state in the app, plus its opt-in fee
+SLOT_OPTIN_PRICE = 100000 + 28500 * 3 + 50000 * 1 + 1000
+
 
 def get_contracts(client: AlgodClient) -> Tuple[bytes, bytes]:
     """Get the compiled TEAL contracts for the trading.
@@ -58,7 +61,7 @@ def create_trading_app(
     global_schema = transaction.StateSchema(num_uints=1, num_byte_slices=2)
     local_schema = transaction.StateSchema(num_uints=3, num_byte_slices=1)
     
-    sp = client.suggested_params()
+    sp = get_suggested_params(client)
 
     txn = transaction.ApplicationCreateTxn(
         sender=creator.get_address(),
@@ -123,7 +126,7 @@ def setup_trading_app(
     """
     
     app_address = get_application_address(app_id)
-    params = client.suggested_params()
+    params = get_suggested_params(client)
     
     funding_amount = (
         # opt into asset min balance
@@ -135,8 +138,6 @@ def setup_trading_app(
         amt=funding_amount,
         sp=params,
     )
-    params.fee = 2000 # including min txn fee for in app opt into asset
-        
     setup_txn = transaction.ApplicationCallTxn(
         sender=funder.get_address(),
         index=app_id,
@@ -146,13 +147,9 @@ def setup_trading_app(
         sp=params,
     )
 
-    transaction.assign_group_id([pay_txn, setup_txn])
-    
-    signed_pay_txn = pay_txn.sign(funder.get_private_key())
-    signed_setup_txn = setup_txn.sign(funder.get_private_key())
-    
-    client.send_transactions([signed_pay_txn, signed_setup_txn])
-    wait_for_confirmation(client, signed_setup_txn.get_txid())
+    group = [pay_txn, setup_txn]
+    fees = estimate_fee(approval_program, group, 1)
+    GroupBuilder(group, funder, sp=params, **fees.group_args()).execute(client)
     
     
 def place_trade(client: AlgodClient, app_id: int, seller: Account, token_id: int, token_amount: int, price: int, trading_index: str) -> None:
@@ -167,11 +164,11 @@ def place_trade(client: AlgodClient, app_id: int, seller: Account, token_id: int
         trading_index: Index for replace trade.
     """
     app_address = get_application_address(app_id)
-    app_global_state = get_app_global_state(client, app_id)
-    suggested_params = client.suggested_params()
+    app_config = get_app_config(client, app_id)
+    suggested_params = get_suggested_params(client)
     
     # optin store app for saving information    
-    store_app_id = app_global_state[b"SA_ID"]
+    store_app_id = app_config.store_app_id
     print(f"store_app_id", store_app_id)
     if is_opted_in_app(client, store_app_id, seller.get_address()) == False:
         print(f"seller {seller.get_address()} opt in app {store_app_id}")
@@ -181,43 +178,18 @@ def place_trade(client: AlgodClient, app_id: int, seller: Account, token_id: int
     if is_opted_in_asset(client, token_id, app_address) == False:
         setup_trading_app(client=client, app_id=app_id, funder=seller, token_id=token_id)
     
-    suggested_params.fee = 2 * 1_000
     tokens = [token_id]
+    local_state = dict()
     n_address = trading_index
-    # if bid_index is empty, find a usable(if the bid app local state's token id is 0) rekeyed address used in the past, 
+    # if trading_index is empty, claim a free slot (its token id is 0) from the free-slot index
     if not n_address:
-        unused_rekeyed_address = ""
-        rekeyed_addresses = get_rekeyed_addresses(seller.get_address()) # we can get this from network
-        for rekeyed_address in rekeyed_addresses:
-            if is_opted_in_app(client, app_id, rekeyed_address):
-                state = get_app_local_state(client, app_id, rekeyed_address)
-                print(f"local state of {rekeyed_address} :", state)
-                if b"TK_ID" in state and state[b"TK_ID"] == 0:
-                    unused_rekeyed_address = rekeyed_address
-                    
-                if state[b"TK_ID"] > 0 and state[b"TA"] > 0:
-                    suggested_params.fee = 3 * 1_000 # add inner returning asset txn fee
-                    
-            else:
-                # might have rekeyed address already but not optin app, we can use it
-                unused_rekeyed_address = rekeyed_address
-                optin_price = 100000 + 28500 * 3 + 50000 * 1 + 1000
-                charge_optin_price(client, seller, unused_rekeyed_address, optin_price)
-                optin_app_rekeyed_address(client, app_id, seller, unused_rekeyed_address)
-                break
-        
-        # if not found, create one, and optin app for local state
-        n_address = unused_rekeyed_address
-        if not n_address:
-            optin_price = 100000 + 28500 * 3 + 50000 * 1 + 1000
-            n_address = generate_rekeyed_address(client, seller, app_id, optin_price)
-            optin_app_rekeyed_address(client, app_id, seller, n_address)
-            set_rekeyed_address(seller.get_address(), n_address, 1)
+        n_address, state = get_free_slot(client, seller, app_id, SLOT_OPTIN_PRICE)
+        local_state = {n_address: state}
     else:
         state = get_app_local_state(client, app_id, trading_index)
+        local_state = {trading_index: state}
         if b"TK_ID" in state and state[b"TK_ID"] > 0 and state[b"TA"] > 0:
             tokens.append(state[b"TK_ID"])
-            suggested_params.fee = 3 * 1_000 # add inner returning asset txn fee    
     
     token_txn = transaction.AssetTransferTxn(
         sender=seller.get_address(),
@@ -228,7 +200,6 @@ def place_trade(client: AlgodClient, app_id: int, seller: Account, token_id: int
     )
     print(f"token_txn: {token_txn}")
 
-    suggested_params.fee = 0
     app_call_txn = transaction.ApplicationCallTxn(
         sender=seller.get_address(),
         index=app_id,
@@ -239,13 +210,15 @@ def place_trade(client: AlgodClient, app_id: int, seller: Account, token_id: int
         sp=suggested_params,
     )
 
-    transaction.assign_group_id([token_txn, app_call_txn])
-    
-    signed_token_txn = token_txn.sign(seller.get_private_key())
-    signed_app_call_txn = app_call_txn.sign(seller.get_private_key())
-
-    client.send_transactions([signed_token_txn, signed_app_call_txn])
-    wait_for_confirmation(client, app_call_txn.get_txid())
+    group = [token_txn, app_call_txn]
+    try:
+        fees = estimate_fee(approval_program, group, 1, local_state=local_state)
+        GroupBuilder(group, seller, sp=suggested_params, **fees.group_args()).execute(client)
+    except Exception:
+        if not trading_index:
+            # the slot was claimed for this listing, record what it holds
+            verify_slot(client, n_address, app_id)
+        raise
     
     return n_address
     
@@ -263,8 +236,7 @@ def cancel_trade(client: AlgodClient, app_id: int, seller: Account, trading_inde
     
     seller_app_local_state = get_app_local_state(client, app_id, trading_index)
     token_id = seller_app_local_state[b"TK_ID"]
-    suggested_params = client.suggested_params()
-    suggested_params.fee = 2_000
+    suggested_params = get_suggested_params(client)
         
     app_call_txn = transaction.ApplicationCallTxn(
         sender=seller.get_address(),
@@ -276,9 +248,10 @@ def cancel_trade(client: AlgodClient, app_id: int, seller: Account, trading_inde
         sp=suggested_params,
     )
     
-    signed_app_call_txn = app_call_txn.sign(seller.get_private_key())
-    client.send_transaction(signed_app_call_txn)
-    wait_for_confirmation(client, app_call_txn.get_txid())    
+    fees = estimate_fee(approval_program, [app_call_txn], 0, local_state={trading_index: seller_app_local_state})
+    GroupBuilder([app_call_txn], seller, sp=suggested_params, **fees.group_args()).execute(client)
+    # the contract cleared the listing, the slot is free again
+    release_slot(trading_index, app_id)
     
     # #do we need this store app opt out? cause the seller might wants to trade again later ?
     # app_global_state = get_app_global_state(client, app_id)
@@ -290,6 +263,48 @@ def cancel_trade(client: AlgodClient, app_id: int, seller: Account, trading_inde
     #     return False
 
 
+def cancel_trades(client: AlgodClient, app_id: int, seller: Account, trading_indexes: List[str]) -> int:
+    """Cancel several trades of a seller, packing the cancels into as few groups as possible.
+
+    Trades that are not open are skipped. A group is atomic, so one cancel
+    failing fails the others sent with it.
+
+    Args:
+        client: An Algod client.
+        app_id: The app ID of the trading.
+        seller: The account that placed the trades.
+        trading_indexes: The rekeyed addresses holding the trades.
+
+    Returns:
+        The number of trades cancelled.
+    """
+    suggested_params = get_suggested_params(client)
+    operations, cancelled = [], []
+    for trading_index in trading_indexes:
+        if not is_opted_in_app(client, app_id, trading_index):
+            continue
+        local_state = get_app_local_state(client, app_id, trading_index)
+        if not local_state.get(b"TK_ID"):
+            continue
+        app_call_txn = transaction.ApplicationCallTxn(
+            sender=seller.get_address(),
+            index=app_id,
+            on_complete=transaction.OnComplete.NoOpOC,
+            app_args=[b"cancel"],
+            accounts=[trading_index],
+            foreign_assets=[local_state[b"TK_ID"]],
+            sp=suggested_params,
+        )
+        fees = estimate_fee(approval_program, [app_call_txn], 0, local_state={trading_index: local_state})
+        operations.append(Operation([app_call_txn], seller, **fees.group_args()))
+        cancelled.append(trading_index)
+
+    execute_operations(client, operations, ordered=False)
+    for trading_index in cancelled:
+        release_slot(trading_index, app_id)
+    return len(operations)
+
+
 def accept_trade(client: AlgodClient, app_id: int, buyer: Account, seller: str, trading_index: str) -> None:
     """Accept on an active trading.
 
@@ -299,10 +314,14 @@ def accept_trade(client: AlgodClient, app_id: int, buyer: Account, seller: str,
         app_id: The app ID of the trading.
         seller: The account selling the asset.
         buyer: The account buying the asset.
+
+    Raises:
+        PendingConflict: A call on the same trade is waiting in the pool.
+        Exception: The contract would reject the acceptance in the current
+            state.
     """
-    app_address = get_application_address(app_id)
-    app_global_state = get_app_global_state(client, app_id)
-    suggested_params = client.suggested_params()
+    app_config = get_app_config(client, app_id)
+    suggested_params = get_suggested_params(client)
 
     if (is_opted_in_app(client, app_id, trading_index) == False): 
         return False
@@ -317,51 +336,59 @@ def accept_trade(client: AlgodClient, app_id: int, buyer: Account, seller: str,
     # check if buyer has enough algo
     if get_balances(client, buyer.get_address())[0] < trading_price:
         return False
+
+    # an acceptance the contract rejects raises here, before anything is sent
+    builder = _accept_group(app_id, app_config, buyer, seller, trading_index, seller_app_local_state, suggested_params)
+    # an accept or cancel already in the pool closes the trade first
+    get_pending_pool(client).check(app_id, trading_index)
     
-    store_app_id = app_global_state[b"SA_ID"]
+    store_app_id = app_config.store_app_id
     if is_opted_in_app(client, store_app_id, buyer.get_address()) == False:
         optin_app(client, store_app_id, buyer)
         
     if (is_opted_in_asset(client, token_id, buyer.get_address()) == False):
         optin_asset(client, token_id, buyer)
     
-    pay_txn = transaction.PaymentTxn(
-        sender=buyer.get_address(),
-        receiver=app_address,
-        amt=trading_price + 4_000, # 1_000 is for asset txn, 3_000 is for split payment txn
-        sp=suggested_params,
-    )
-    
-    app_call_txn = transaction.ApplicationCallTxn(
-        sender=buyer.get_address(),
-        index=app_id,
-        on_complete=transaction.OnComplete.NoOpOC,
-        app_args=[b"accept", token_amount.to_bytes(8, "big")],
-        foreign_assets=[token_id],
-        # must include the seller here to the app can refund that seller's payment
-        accounts=[seller, 
-                  trading_index,
-                  encoding.encode_address(app_global_state[b"SA_ADDR"]), 
-                  encoding.encode_address(app_global_state[b"TW_ADDR"])],
-        sp=suggested_params,
-    )
-    
-    store_app_call_txn = transaction.ApplicationCallTxn(
-        sender=buyer.get_address(),
-        sp=suggested_params,
-        index=store_app_id,
-        on_complete=transaction.OnComplete.NoOpOC,
-        app_args=[b"buy"],
-        accounts=[seller]
-    )
-    
-    transaction.assign_group_id([pay_txn, app_call_txn, store_app_call_txn])
-    signed_pay_txn = pay_txn.sign(buyer.get_private_key())
-    signed_app_call_txn = app_call_txn.sign(buyer.get_private_key())
-    signed_store_app_call_txn = store_app_call_txn.sign(buyer.get_private_key())
-    
-    client.send_transactions([signed_pay_txn, signed_app_call_txn, signed_store_app_call_txn])
-    wait_for_confirmation(client, app_call_txn.get_txid())
+    builder.execute(client)
+    # the contract cleared the listing, the slot is free again
+    release_slot(trading_index, app_id)
+
+
+def presign_accept_trade(client: AlgodClient, app_id: int, buyer: Account, seller: str, trading_index: str,
+                         window: int = MAX_VALIDITY) -> PresignedGroup:
+    """Build and sign the acceptance of a trade ahead of time.
+
+    The opt-ins `accept_trade` may need are made now. The accept group is
+    signed over a `window` of rounds with a lease on its payment and kept
+    valid in the background, so `send()` on the returned template takes
+    the trade with a single request. The group pays the price listed when
+    it was last refreshed, a repriced listing rejects it.
+
+    Args:
+        client: An Algod client.
+        app_id: The app ID of the trading.
+        buyer: The account buying the asset.
+        seller: The account selling the asset.
+        trading_index: The rekeyed address holding the trade.
+        window: Rounds each signed copy stays valid for.
+    """
+    app_config = get_app_config(client, app_id)
+    seller_app_local_state = get_app_local_state(client, app_id, trading_index)
+    token_id = seller_app_local_state[b"TK_ID"]
+    if token_id == 0:
+        raise Exception(f"{trading_index} holds no trade")
+
+    if is_opted_in_app(client, app_config.store_app_id, buyer.get_address()) == False:
+        optin_app(client, app_config.store_app_id, buyer)
+    if (is_opted_in_asset(client, token_id, buyer.get_address()) == False):
+        optin_asset(client, token_id, buyer)
+
+    def build(sp: transaction.SuggestedParams, lease: bytes) -> list:
+        local_state = get_app_local_state(client, app_id, trading_index)
+        builder = _accept_group(app_id, app_config, buyer, seller, trading_index, local_state, sp, lease)
+        return builder.sign().signed_transactions
+
+    return PresignedGroup(client, build, window=window)
 
 
 def close_trading(client: AlgodClient, app_id: int, closer: Account, assets: List[int]):
@@ -381,12 +408,12 @@ def close_trading(client: AlgodClient, app_id: int, closer: Account, assets: Lis
         closer: The account initiating the close transaction. This must be
             the trading creator.
     """
-    app_global_state = get_app_global_state(client, app_id)
+    app_config = get_app_config(client, app_id)
 
     print(b"assets", assets)
 
-    accounts: List[str] = [encoding.encode_address(app_global_state[b"SA_ADDR"]), 
-                           encoding.encode_address(app_global_state[b"TW_ADDR"])]
+    accounts: List[str] = [app_config.staking_address, 
+                           app_config.team_wallet_address]
     print(b"accounts", accounts)
     
     delete_txn = transaction.ApplicationDeleteTxn(
@@ -394,9 +421,55 @@ def close_trading(client: AlgodClient, app_id: int, closer: Account, assets: Lis
         index=app_id,
         accounts=accounts,
         foreign_assets=assets,
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
     )
     signed_delete_txn = delete_txn.sign(closer.get_private_key())
     client.send_transaction(signed_delete_txn)
 
     wait_for_confirmation(client, signed_delete_txn.get_txid())
+
+
+def _accept_group(app_id: int, app_config: AppConfig, buyer: Account, seller: str, trading_index: str,
+                  seller_app_local_state: dict, sp: transaction.SuggestedParams, lease: bytes = None) -> GroupBuilder:
+    app_address = get_application_address(app_id)
+    token_id = seller_app_local_state[b"TK_ID"]
+    token_amount = seller_app_local_state[b"TA"]
+    trading_price = seller_app_local_state[b"TP"]
+    store_app_id = app_config.store_app_id
+
+    pay_txn = transaction.PaymentTxn(
+        sender=buyer.get_address(),
+        receiver=app_address,
+        amt=trading_price + 4_000, # 1_000 is for asset txn, 3_000 is for split payment txn
+        sp=sp,
+        lease=lease,
+    )
+    
+    app_call_txn = transaction.ApplicationCallTxn(
+        sender=buyer.get_address(),
+        index=app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"accept", token_amount.to_bytes(8, "big")],
+        foreign_assets=[token_id],
+        # must include the seller here to the app can refund that seller's payment
+        accounts=[seller, 
+                  trading_index,
+                  app_config.staking_address, 
+                  app_config.team_wallet_address],
+        sp=sp,
+    )
+    
+    store_app_call_txn = transaction.ApplicationCallTxn(
+        sender=buyer.get_address(),
+        sp=sp,
+        index=store_app_id,
+        on_complete=transaction.OnComplete.NoOpOC,
+        app_args=[b"buy"],
+        accounts=[seller]
+    )
+    
+    group = [pay_txn, app_call_txn, store_app_call_txn]
+    fees = estimate_fee(approval_program, group, 1, local_state={trading_index: seller_app_local_state},
+                        global_state=app_config.global_state())
+    # the payment carries the fees of the inner transactions
+    return GroupBuilder(group, buyer, sp=sp, **fees.group_args(prefunded=True))
@@ -1,8 +1,8 @@
 from base64 import b64decode, b64encode
-from typing import Dict, Tuple, Union, List, Any, Optional
+from typing import Callable, Dict, Tuple, Union, List, Any, Optional
 from algosdk.future import transaction
 
-from algosdk import encoding
+from algosdk import constants, encoding
 from algosdk.error import AlgodHTTPError
 from algosdk.future.transaction import LogicSigTransaction, assign_group_id
 from algosdk.v2client.algod import AlgodClient
@@ -10,17 +10,76 @@ from pyteal import compileTeal, Expr, Mode
 
 from account import Account
 from algosdk import account, mnemonic
+from confirmation import ConfirmationWaiter, ConfirmationTimeout, get_confirmation_waiter
+from compile_cache import CompileCache, get_compile_cache
+from suggested_params import SuggestedParamsProvider, get_params_provider
+from account_cache import AccountSnapshotCache, get_account_cache
+from app_config import AppConfig, get_app_config_cache
+from pooled_client import PooledAlgodClient
+from algod_pool import AlgodPool, ROUND_ROBIN, LOWEST_LATENCY
+from rate_limit import DEFAULT_LIMITS, RateLimiter
+from fee_estimator import FeeEstimate, estimate_fee
+from raw_submit import EncodedBatch, EncodedGroup, encode_groups, send_raw_group
+from signing_engine import SigningEngine
+from signer_registry import SignerRegistry
+from fee_bumper import DEFAULT_BUDGET, CongestionMonitor, FeeBudget, FeeBumper, get_congestion_monitor
+from rekeyed_registry import SLOT_NEW, SLOT_FREE, SLOT_IN_USE, SLOT_CLOSING, RekeyedRegistry, get_rekeyed_registry
+from slot_provisioner import SlotProvisioner, get_slot_provisioner
+from pending_pool import PendingConflict, PendingPool, get_pending_pool
+from submission_queue import AlreadyInLedger, SubmissionError, SubmissionQueue, get_submission_queue, is_duplicate
+from presigned import MAX_VALIDITY, PresignedGroup, get_template_refresher
+from group_packer import Operation, PackedGroup, References, pack, chunks, ANYWHERE, FIRST, ALONE
 import json
 
 import base64
 import hashlib
+import logging
+import time
 
 
-def get_algod_client(url, token) -> AlgodClient:
+logger = logging.getLogger(__name__)
+
+
+def get_algod_client(url, token, pool_size: int = 10, timeout: float = 30.0,
+                     strategy: str = ROUND_ROBIN,
+                     rate_limits: Optional[Dict[str, Tuple[float, int]]] = DEFAULT_LIMITS) -> AlgodClient:
+    """Return a pooled algod client.
+
+    `url` may also be a list of endpoints, most preferred first, in which case
+    an `AlgodPool` over all of them is returned. `token` is then either shared
+    by every endpoint or a list with one token per endpoint.
+
+    `rate_limits` maps endpoint classes of `rate_limit` to (requests per
+    second, burst) and gives every endpoint its own `RateLimiter`, by
+    default with `rate_limit.DEFAULT_LIMITS`. None sends requests unpaced;
+    429 responses are resent after their Retry-After period either way.
+    """
+    if isinstance(url, (list, tuple)):
+        tokens = token if isinstance(token, (list, tuple)) else [token] * len(url)
+        # reads are coalesced once by the pool rather than per endpoint
+        clients = [_pooled_client(u, t, pool_size, timeout, rate_limits, coalesce_reads=False)
+                   for u, t in zip(url, tokens)]
+        return AlgodPool(clients, strategy=strategy)
+    return _pooled_client(url, token, pool_size, timeout, rate_limits)
+
+
+def _pooled_client(url, token, pool_size, timeout, rate_limits, coalesce_reads=True) -> PooledAlgodClient:
     headers = {
         'X-API-Key': token
     }
-    return AlgodClient(token, url, headers)
+    rate_limiter = RateLimiter(rate_limits) if rate_limits is not None else None
+    return PooledAlgodClient(token, url, headers, pool_size=pool_size, timeout=timeout,
+                             rate_limiter=rate_limiter, coalesce_reads=coalesce_reads)
+
+
+def get_suggested_params(client: AlgodClient) -> transaction.SuggestedParams:
+    """Return a copy of the params cached for `client`, safe to mutate."""
+    return get_params_provider(client).get()
+
+
+def get_account_snapshot(client: AlgodClient, address: str) -> Dict[str, Any]:
+    """Return `account_info` for `address`, fetched at most once per round."""
+    return get_account_cache(client).get(address)
 
 
 class PendingTxnResponse:
@@ -59,31 +118,190 @@ class TransactionGroup:
                 self.signed_transactions[i] = LogicSigTransaction(txn, logicsig)
 
     def sign_with_private_key(self, account: Account):
+        address = account.get_address()
         for i, txn in enumerate(self.transactions):
-            if txn.sender == account.get_address():
+            if txn.sender == address:
                 self.signed_transactions[i] = txn.sign(account.get_private_key())
 
+    def sign_with_registry(self, registry: SignerRegistry):
+        """Sign every transaction in one pass, rekeyed senders included."""
+        registry.sign_group(self)
+
     def submit(self, algod, wait=False):
         try:
             txid = algod.send_transactions(self.signed_transactions)
         except AlgodHTTPError as e:
-            raise Exception(str(e))
+            if not is_duplicate(e):
+                raise Exception(str(e))
+            txid = self.transactions[0].get_txid()
         if wait:
-            return wait_for_confirmation(algod, txid)
+            return wait_for_group_confirmation(algod, [txn.get_txid() for txn in self.transactions])[0]
         return {'txid': txid}
 
 
+# bytes a signature adds to an encoded transaction
+SIGNATURE_OVERHEAD = 75
+
+
+def group_fee(transactions: list, inner_txns: Optional[Dict[int, int]] = None,
+              sp: Optional[transaction.SuggestedParams] = None) -> int:
+    """Return the total fee a group needs, counting its inner transactions.
+
+    Every outer and inner transaction costs the minimum fee. When `sp`
+    carries a per-byte fee because the network is congested, an outer
+    transaction costs the larger of that and the minimum.
+
+    Args:
+        transactions: The unsigned transactions of the group.
+        inner_txns: Map from group index to the number of inner transactions
+            that transaction submits.
+        sp: Params to price the group with.
+    """
+    min_fee = getattr(sp, "min_fee", None) or constants.min_txn_fee
+    fee_per_byte = sp.fee if sp is not None and not sp.flat_fee else 0
+
+    total = 0
+    for txn in transactions:
+        fee = min_fee
+        if fee_per_byte:
+            size = len(b64decode(encoding.msgpack_encode(txn))) + SIGNATURE_OVERHEAD
+            fee = max(fee, fee_per_byte * size)
+        total += fee
+    if inner_txns:
+        total += min_fee * sum(inner_txns.values())
+    return total
+
+
+class GroupBuilder(TransactionGroup):
+    """Atomic group with a pooled fee and one-pass signing.
+
+    Call sites list the transactions in group order and declare how many
+    inner transactions each app call submits, usually from
+    `fee_estimator.estimate_fee`. The fee of the whole group, from
+    `group_fee`, is charged to the transaction at `fee_payer` and every
+    other transaction is sent with a zero fee, except those a contract
+    asserts a minimum fee on, which carry that minimum.
+
+    `sign` looks each sender up in a `SignerRegistry`, so a group mixing
+    several accounts, rekeyed addresses and logic signatures is signed in
+    one pass. It also takes a `SigningEngine`, for groups signed in bulk.
+
+    Args:
+        transactions: The unsigned transactions in group order.
+        signers: A SignerRegistry, an Account, a list of Accounts and logic
+            signatures, or a map from sender address to the Account, private
+            key or LogicSigAccount signing for it.
+        inner_txns: Map from group index to the number of inner transactions
+            that transaction submits.
+        sp: Params to price the group with, see `group_fee`.
+        fee_payer: Group index of the transaction paying the pooled fee.
+        min_fees: Map from group index to the smallest fee that transaction
+            must carry.
+    """
+
+    def __init__(self, transactions: list, signers, inner_txns: Optional[Dict[int, int]] = None,
+                 sp: Optional[transaction.SuggestedParams] = None, fee_payer: int = 0,
+                 min_fees: Optional[Dict[int, int]] = None):
+        if len(transactions) > constants.tx_group_limit:
+            raise Exception(f"A group holds at most {constants.tx_group_limit} transactions")
+        self.signers = _signer_registry(signers)
+        self.inner_txns = dict(inner_txns or {})
+        self.fee_payer = fee_payer
+        self.min_fees = min_fees = dict(min_fees or {})
+        self.fee = max(group_fee(transactions, self.inner_txns, sp), sum(min_fees.values()))
+        rest = self.fee - sum(min_fees.values())
+        for i, txn in enumerate(transactions):
+            txn.group = None
+            txn.fee = min_fees.get(i, 0) + (rest if i == fee_payer else 0)
+        super().__init__(transactions)
+
+    @classmethod
+    def from_packed(cls, packed: PackedGroup, sp: Optional[transaction.SuggestedParams] = None) -> "GroupBuilder":
+        """Build the group `group_packer.pack` put together."""
+        signers = SignerRegistry()
+        for operation_signers in packed.signers:
+            signers.update(_signer_registry(operation_signers))
+        return cls(packed.transactions, signers, inner_txns=packed.inner_txns, sp=sp,
+                   fee_payer=packed.fee_payer, min_fees=packed.min_fees)
+
+    def sign(self, signers=None) -> "GroupBuilder":
+        if isinstance(signers, SigningEngine):
+            signers.sign_groups([self])
+            return self
+        signers = self.signers if signers is None else _signer_registry(signers)
+        signers.sign_group(self)
+        return self
+
+    def required_fee(self, sp: transaction.SuggestedParams) -> int:
+        """The total fee the group needs at `sp`."""
+        return max(group_fee(self.transactions, self.inner_txns, sp), sum(self.min_fees.values()))
+
+    def bumper(self, budget: FeeBudget = DEFAULT_BUDGET) -> FeeBumper:
+        """A `FeeBumper` signing the group again with higher fees within `budget`."""
+        return FeeBumper(self.transactions, self.signers.sign_transactions, self.fee_payer, budget,
+                         self.required_fee)
+
+    def execute(self, algod, budget: Optional[FeeBudget] = DEFAULT_BUDGET) -> PendingTxnResponse:
+        """Sign the group, submit it through the client's `SubmissionQueue` and
+        wait for it to be confirmed.
+
+        Under congestion the group is signed again with higher fees, within
+        `budget`. Pass None to always send it with the fee it has.
+        """
+        queue = get_submission_queue(algod)
+        if budget is None:
+            pending_txns = queue.submit_and_wait(self.sign().signed_transactions)
+        else:
+            pending_txns = queue.submit_bumpable(self.bumper(budget)).result()
+        print(f"Group of {len(pending_txns)} transactions confirmed in round {pending_txns[0].get('confirmed-round')}.")
+        return PendingTxnResponse(pending_txns[0])
+
+
+def execute_operations(client: AlgodClient, operations: List[Operation], ordered: bool = True,
+                       budget: Optional[FeeBudget] = DEFAULT_BUDGET) -> List[PendingTxnResponse]:
+    """Pack `operations` into the fewest groups and execute them one by one.
+
+    Returns the response of the first transaction of every group. See
+    `group_packer.pack` for `ordered` and `GroupBuilder.execute` for `budget`.
+    """
+    sp = get_suggested_params(client)
+    return [GroupBuilder.from_packed(group, sp=sp).execute(client, budget) for group in pack(operations, ordered)]
+
+
+def sign_transaction(txn: transaction.Transaction, signer):
+    """Sign `txn` with an Account, a private key or a logic signature."""
+    if isinstance(signer, Account):
+        return txn.sign(signer.get_private_key())
+    if isinstance(signer, str):
+        return txn.sign(signer)
+    return LogicSigTransaction(txn, signer)
+
+
+def load_signer_registry(accounts: List[Account], logicsigs: List[Any] = ()) -> SignerRegistry:
+    """Build a `SignerRegistry` for `accounts`, including the rekeyed addresses
+    they own according to the rekeyed address registry."""
+    return SignerRegistry.from_accounts(accounts, read_rekeyed_addresses(), logicsigs)
+
+
+def _signer_registry(signers) -> SignerRegistry:
+    if isinstance(signers, SignerRegistry):
+        return signers
+    registry = SignerRegistry()
+    if isinstance(signers, dict):
+        for address, signer in signers.items():
+            registry.add(signer, address)
+        return registry
+    if isinstance(signers, Account):
+        signers = [signers]
+    for signer in signers:
+        registry.add(signer)
+    return registry
+
+
 def wait_for_confirmation(
-        client: AlgodClient, tx_id: str
+        client: AlgodClient, tx_id: str, timeout_rounds: Optional[int] = None
 ) -> PendingTxnResponse:
-    last_status = client.status()
-    last_round = last_status.get("last-round")
-    pending_txn = client.pending_transaction_info(tx_id)
-    while not (pending_txn.get("confirmed-round") and pending_txn.get("confirmed-round") > 0):
-        print("Waiting for confirmation...")
-        last_round += 1
-        client.status_after_block(last_round)
-        pending_txn = client.pending_transaction_info(tx_id)
+    pending_txn = get_confirmation_waiter(client).wait(tx_id, timeout_rounds)
     print(
         "Transaction {} confirmed in round {}.".format(
             tx_id, pending_txn.get("confirmed-round")
@@ -92,15 +310,25 @@ def wait_for_confirmation(
     return PendingTxnResponse(pending_txn)
 
 
+def wait_for_group_confirmation(
+        client: AlgodClient, tx_ids: List[str], timeout_rounds: Optional[int] = None
+) -> List[PendingTxnResponse]:
+    pending_txns = get_confirmation_waiter(client).wait_for_group(tx_ids, timeout_rounds)
+    print(
+        "Group of {} transactions confirmed in round {}.".format(
+            len(tx_ids), pending_txns[0].get("confirmed-round")
+        )
+    )
+    return [PendingTxnResponse(pending_txn) for pending_txn in pending_txns]
+
+
 def fully_compile_contract(client: AlgodClient, contract: Expr) -> bytes:
     teal = compileTeal(contract, mode=Mode.Application, version=5)
-    response = client.compile(teal)
-    return b64decode(response["result"])
+    return get_compile_cache().compile(client, teal, version=5)
 
 
 def compile_teal(client: AlgodClient, teal) -> bytes:
-    response = client.compile(teal)
-    return b64decode(response["result"])
+    return get_compile_cache().compile(client, teal)
 
 
 def int_to_bytes(num):
@@ -149,10 +377,21 @@ def get_app_global_state(
     return decode_state(app_info["params"]["global-state"])
 
 
+def get_app_config(client: AlgodClient, app_id: int) -> AppConfig:
+    """Return the create/setup-time global state of an app, loaded once."""
+    return get_app_config_cache(client).get(app_id)
+
+
 def get_app_local_state(
         client: AlgodClient, app_id: int, sender_address: str
 ) -> Dict[bytes, Union[int, bytes]]:
-    account_info = client.account_info(sender_address)
+    account_info = get_account_snapshot(client, sender_address)
+    return decode_local_state(account_info, app_id)
+
+
+def decode_local_state(
+        account_info: Dict[str, Any], app_id: int
+) -> Dict[bytes, Union[int, bytes]]:
     for local_state in account_info["apps-local-state"]:
         if local_state["id"] == app_id:
             if "key-value" not in local_state:
@@ -168,9 +407,12 @@ def get_app_address(app_id: int) -> str:
 
 
 def get_balances(client: AlgodClient, account: str) -> Dict[int, int]:
-    balances: Dict[int, int] = dict()
+    account_info = get_account_snapshot(client, account)
+    return decode_balances(account_info)
 
-    account_info = client.account_info(account)
+
+def decode_balances(account_info: Dict[str, Any]) -> Dict[int, int]:
+    balances: Dict[int, int] = dict()
 
     # set key 0 to Algo balance
     balances[0] = account_info["amount"]
@@ -184,6 +426,11 @@ def get_balances(client: AlgodClient, account: str) -> Dict[int, int]:
     return balances
 
 
+def get_holdings(client: AlgodClient, address: str) -> Dict[Tuple[str, int], int]:
+    """Asset balances of `address` by (address, asset ID), as `estimate_fee` takes them."""
+    return {(address, asset_id): amount for asset_id, amount in get_balances(client, address).items() if asset_id}
+
+
 def get_asset_info(client: AlgodClient, asset_id: int):
     return client.asset_info(asset_id)
 
@@ -198,7 +445,11 @@ def get_last_block_timestamp(client: AlgodClient) -> Tuple[int, int]:
 
 
 def is_opted_in_app(client: AlgodClient, app_id: int, user_address: str):
-    account_info = client.account_info(user_address)  
+    account_info = get_account_snapshot(client, user_address)
+    return has_app_local_state(account_info, app_id)
+
+
+def has_app_local_state(account_info: Dict[str, Any], app_id: int) -> bool:
     for a in account_info.get('apps-local-state', []):
         if a['id'] == app_id:
             return True
@@ -208,7 +459,7 @@ def is_opted_in_app(client: AlgodClient, app_id: int, user_address: str):
 def optin_app(client: AlgodClient, app_id: int, sender: Account):
     txn = transaction.ApplicationOptInTxn(
         sender=sender.get_address(),
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         index=app_id
     )
     signed_txn = txn.sign(sender.get_private_key())
@@ -220,10 +471,11 @@ def optin_app(client: AlgodClient, app_id: int, sender: Account):
 def optin_app_rekeyed_address(client: AlgodClient, app_id: int, sender: Account, rekeyed_adr: str):
     txn = transaction.ApplicationOptInTxn(
         sender=rekeyed_adr,
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         index=app_id
     )
-    signed_txn = txn.sign(sender.get_private_key())
+    signers = SignerRegistry.from_accounts([sender], {sender.get_address(): [rekeyed_adr]})
+    signed_txn = signers.sign(txn)
     client.send_transaction(signed_txn)
     wait_for_confirmation(client, signed_txn.get_txid())
     
@@ -231,7 +483,7 @@ def optin_app_rekeyed_address(client: AlgodClient, app_id: int, sender: Account,
 def optout_app(client: AlgodClient, app_id: int, sender: Account):
     txn = transaction.ApplicationClearStateTxn(
         sender=sender.get_address(),
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         index=app_id
     )
     signed_txn = txn.sign(sender.get_private_key())
@@ -240,7 +492,11 @@ def optout_app(client: AlgodClient, app_id: int, sender: Account):
     
     
 def is_opted_in_asset(client: AlgodClient, asset_id: int, user_address: str):
-    account_info = client.account_info(user_address)  
+    account_info = get_account_snapshot(client, user_address)
+    return has_asset_holding(account_info, asset_id)
+
+
+def has_asset_holding(account_info: Dict[str, Any], asset_id: int) -> bool:
     for a in account_info.get('assets', []):
         if a['asset-id'] == asset_id:
             return True
@@ -250,12 +506,22 @@ def is_opted_in_asset(client: AlgodClient, asset_id: int, user_address: str):
 def optin_asset(client: AlgodClient, asset_id: int, sender: Account):
     txn = transaction.AssetOptInTxn(
         sender=sender.get_address(),
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
         index=asset_id
     )
     signed_txn = txn.sign(sender.get_private_key())
     client.send_transaction(signed_txn)
     wait_for_confirmation(client, signed_txn.get_txid())
+
+
+def optin_assets(client: AlgodClient, asset_ids: List[int], sender: Account):
+    """Opt `sender` into every asset in `asset_ids`, 16 opt-ins per group."""
+    sp = get_suggested_params(client)
+    operations = [
+        Operation([transaction.AssetOptInTxn(sender=sender.get_address(), sp=sp, index=asset_id)], sender)
+        for asset_id in asset_ids
+    ]
+    return execute_operations(client, operations)
     
     
 def generate_account_keypair():
@@ -266,49 +532,342 @@ def generate_account_keypair():
     return private_key, address
     
 
-def generate_rekeyed_address(client: AlgodClient, funder: Account, app_id: int, optin_price: int):
-    """Generate rekeyed address and charge balance to optin app.   
+# a new slot takes a funding payment and an opt-in
+SLOTS_PER_GROUP = constants.tx_group_limit // 2
+
+
+def generate_rekeyed_addresses(client: AlgodClient, funder: Account, app_id: int, optin_price: int,
+                               count: int = 1) -> List[str]:
+    """Create `count` addresses rekeyed to `funder` and opted into `app_id`.
+
+    Each address takes a funding payment and an opt-in signed by its fresh
+    key that also rekeys it to `funder`, so one confirmed group creates it
+    and 16-transaction groups create 8 at once. The funder pays every fee.
 
     Args:
         client: An Algod client.
-        rekey_to: Auth address.
+        funder: Funds the addresses and becomes their auth address.
         app_id: App id to optin.
         optin_price: Additional min balance to optin app.
-    """
-    private_key, address = generate_account_keypair()
-    
-    funding_amount = (
-        # min account balance
-        100_000
-        # additional min balance to opt into app: 100000 + 28500 * 3 + 50000
-        + optin_price
-        # min txn fee for rekeying
-        + 1_000
-    )
+        count: Number of addresses to create.
 
+    Returns:
+        The new addresses, in creation order.
+    """
+    sp = get_suggested_params(client)
+    addresses, operations = [], []
+    for _ in range(count):
+        address, operation = slot_operation(funder, app_id, optin_price, sp)
+        addresses.append(address)
+        operations.append(operation)
+    execute_operations(client, operations)
+    return addresses
+
+
+def slot_operation(funder: Account, app_id: int, optin_price: int,
+                    sp: transaction.SuggestedParams) -> Tuple[str, Operation]:
+    """A new address and the operation funding it, opting it into `app_id`
+    and rekeying it to `funder`."""
+    # not generate_account_keypair, which prints the key
+    private_key, address = account.generate_account()
     fund_account_txn = transaction.PaymentTxn(
         sender=funder.get_address(),
         receiver=address,
-        amt=funding_amount,
-        sp=client.suggested_params(),
+        # min account balance, plus the additional min balance to opt into app
+        amt=100_000 + optin_price,
+        sp=sp,
     )
-    signed_fund_txn = fund_account_txn.sign(funder.get_private_key())
-    client.send_transaction(signed_fund_txn)
-    wait_for_confirmation(client, signed_fund_txn.get_txid())
-    
-    txn = transaction.PaymentTxn(
+    optin_txn = transaction.ApplicationOptInTxn(
         sender=address,
+        sp=sp,
+        index=app_id,
+        rekey_to=funder.get_address(),
+    )
+    return address, Operation([fund_account_txn, optin_txn], {funder.get_address(): funder, address: private_key})
+
+
+def slot_optin_operation(owner: Account, address: str, app_id: int, optin_price: int,
+                         sp: transaction.SuggestedParams) -> Operation:
+    """The operation topping up slot `address` of `owner` with the opt-in
+    price of `app_id` and opting it in, both signed by `owner`."""
+    topup_txn = transaction.PaymentTxn(
+        sender=owner.get_address(),
         receiver=address,
-        amt=0,
-        rekey_to=funder.get_address(),  #get_app_address(app_id),
-        sp=client.suggested_params(),
+        amt=optin_price,
+        sp=sp,
     )
-    
-    signed_txn = txn.sign(private_key)
-    client.send_transaction(signed_txn)
-    wait_for_confirmation(client, signed_txn.get_txid())
-    
-    return address
+    optin_txn = transaction.ApplicationOptInTxn(
+        sender=address,
+        sp=sp,
+        index=app_id,
+    )
+    signers = SignerRegistry.from_accounts([owner], {owner.get_address(): [address]})
+    return Operation([topup_txn, optin_txn], signers)
+
+
+def create_slot(client: AlgodClient, owner: Account, app_id: int, optin_price: int, state: int = SLOT_FREE) -> str:
+    """Create a rekeyed address of `owner` opted into `app_id` and register it
+    as a listing slot in `state`."""
+    return create_slots(client, owner, app_id, optin_price, 1, state)[0]
+
+
+def create_slots(client: AlgodClient, owner: Account, app_id: int, optin_price: int, count: int,
+                 state: int = SLOT_FREE) -> List[str]:
+    """Create `count` listing slots of `owner` in bulk, see `generate_rekeyed_addresses`.
+
+    The slots of every group are registered as soon as it is confirmed, so
+    a failing group loses none created before it.
+    """
+    registry = get_rekeyed_registry()
+    addresses = []
+    while len(addresses) < count:
+        batch = min(count - len(addresses), SLOTS_PER_GROUP)
+        for address in generate_rekeyed_addresses(client, owner, app_id, optin_price, batch):
+            registry.add(owner.get_address(), address, 1)
+            registry.set_state(address, app_id, state)
+            addresses.append(address)
+    return addresses
+
+
+def provision_slots(client: AlgodClient, owner: Account, app_id: int, optin_price: int,
+                    target: Optional[int] = None) -> None:
+    """Keep `target` free listing slots of `owner` ready for `app_id`.
+
+    Provisioning is opt-in: the client's `SlotProvisioner` creates the
+    slots ahead of time in the background, which locks up to `target`
+    times `optin_price` of `owner`'s ALGO, and keeps `owner` to sign for
+    them until the pair is idle or `SlotProvisioner.remove` is called.
+    """
+    get_slot_provisioner(client).ensure(owner.get_address(), app_id,
+                                        lambda count: create_slots(client, owner, app_id, optin_price, count),
+                                        target)
+
+
+def take_slot(client: AlgodClient, owner: Account, app_id: int) -> Optional[str]:
+    """Claim a ready listing slot of `owner` for `app_id`, filling its pool
+    first if `provision_slots` keeps one for the pair.
+
+    Returns:
+        The slot, None when none is ready.
+    """
+    return get_slot_provisioner(client).take(owner.get_address(), app_id)
+
+
+def get_free_slot(client: AlgodClient, owner: Account, app_id: int, optin_price: int,
+                  token_key: bytes = b"TK_ID") -> Tuple[str, Dict[bytes, Any]]:
+    """Claim a listing slot of `owner` for `app_id` from the free-slot index.
+
+    The index is the state the rekeyed registry keeps for every slot in
+    every app, updated from our own confirmed operations, so claiming a
+    slot costs no network calls however many slots `owner` has. When none
+    is free, the slots the index has never seen with `app_id`, those
+    created before it or used with other apps, are looked up on the
+    network once each and reused. Only when none of them is free either is
+    a slot taken from the pool `provision_slots` keeps for the pair, or
+    else created.
+
+    Args:
+        client: An Algod client.
+        owner: The account the slots are rekeyed to.
+        app_id: The app the listing goes to.
+        optin_price: Additional min balance to optin app.
+        token_key: The local state key holding the listed token, 0 when the
+            slot is free.
+
+    Returns:
+        The slot, marked in use, and its known local state in `app_id`.
+    """
+    registry = get_rekeyed_registry()
+    address = registry.claim(owner.get_address(), app_id, SLOT_FREE, SLOT_IN_USE)
+    if address:
+        return address, {}
+
+    while True:
+        addresses = registry.unused(owner.get_address(), app_id, limit=SLOTS_PER_GROUP)
+        if not addresses:
+            break
+        for address in addresses:
+            # reserve the slot before looking it up, it stays in use if it holds a listing
+            if not registry.index(address, app_id, SLOT_IN_USE):
+                continue
+            if not is_opted_in_app(client, app_id, address):
+                # might have rekeyed address already but not optin app, we can use it
+                execute_operations(client, [
+                    slot_optin_operation(owner, address, app_id, optin_price, get_suggested_params(client))
+                ])
+                return address, {}
+            state = get_app_local_state(client, app_id, address)
+            if not state.get(token_key):
+                return address, state
+
+    address = take_slot(client, owner, app_id)
+    if address:
+        return address, {}
+
+    # if not found, create one, and optin app for local state
+    return create_slot(client, owner, app_id, optin_price, state=SLOT_IN_USE), {}
+
+
+def release_slot(address: str, app_id: int) -> None:
+    """Record in the free-slot index that the listing of slot `address` in
+    `app_id` was closed by a confirmed operation."""
+    get_rekeyed_registry().mark(address, app_id, SLOT_FREE)
+
+
+def verify_slot(client: AlgodClient, address: str, app_id: int, token_key: bytes = b"TK_ID") -> int:
+    """Read the state of slot `address` in `app_id` from the network and
+    record it in the free-slot index, after an operation on it failed.
+
+    Returns:
+        The state recorded.
+    """
+    if not is_opted_in_app(client, app_id, address):
+        state = SLOT_NEW
+    else:
+        state = SLOT_IN_USE if get_app_local_state(client, app_id, address).get(token_key) else SLOT_FREE
+    get_rekeyed_registry().mark(address, app_id, state)
+    return state
+
+
+# local state keys holding the token a slot lists, 0 once the listing is closed
+LISTING_KEYS = (b"TK_ID", b"O_TKID")
+
+
+class ReclaimReport:
+    """What `reclaim_slots` did.
+
+    Attributes:
+        closed: Slots closed and removed from the registry.
+        skipped: Idle slots found to still hold a listing or an asset.
+        failed: Slots in groups that were not confirmed.
+        fees: MicroAlgos paid in fees.
+        recovered: MicroAlgos returned to the owner, fees deducted.
+    """
+
+    def __init__(self) -> None:
+        self.closed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.fees = 0
+        self.recovered = 0
+
+    def __repr__(self) -> str:
+        return (f"{self.closed} slots closed, {self.recovered / 1_000_000:.6f} ALGO recovered, "
+                f"{self.skipped} skipped, {self.failed} failed")
+
+
+# tells from a slot's local state in an app whether its listing there is over
+IdlePolicy = Callable[[AlgodClient, int, Dict[bytes, Any]], bool]
+
+
+def reclaim_slots(client: AlgodClient, owner: Account, min_idle: float = 7 * 24 * 3600, keep: int = 0,
+                  limit: Optional[int] = None, batch: int = 64,
+                  idle_policies: Optional[Dict[int, IdlePolicy]] = None) -> ReclaimReport:
+    """Close idle listing slots of `owner` and recover their min balance.
+
+    Slots are taken from the registry oldest first when they are new or
+    free in every app, or were never used with any, and were not touched
+    for `min_idle` seconds; the `keep` newest free slots of every app are
+    left for new listings. Each slot is checked on the network first: one
+    still holding a listing or an asset is skipped, and what it holds in
+    each app is recorded in the free-slot index. A listing is over once
+    its token key is 0, or, in an app of `idle_policies`, once that app's
+    policy says so. Otherwise its local state is cleared in every app it
+    is opted into and its balance closed to `owner`, 8 slots per group for
+    the usual single app, the first slot of a group paying its fees.
+    Closed slots leave the registry.
+
+    Args:
+        client: An Algod client.
+        owner: The account the slots are rekeyed to, which gets the funds.
+        min_idle: Seconds a slot must have been idle for.
+        keep: Free slots to keep per app.
+        limit: Largest number of slots to look at, None for all.
+        batch: Slots reserved and checked at a time.
+        idle_policies: Map from app ID to the policy of apps whose closed
+            listings keep their token key, such as
+            `auction.operations.is_auction_idle`.
+
+    Returns:
+        The number of slots closed and the ALGO recovered.
+    """
+    registry = get_rekeyed_registry()
+    signers = SignerRegistry.from_accounts([owner])
+    before = time.time() - min_idle
+    report = ReclaimReport()
+    seen = 0
+    while limit is None or seen < limit:
+        addresses = registry.reserve_idle(owner.get_address(), before, keep,
+                                          batch if limit is None else min(batch, limit - seen))
+        if not addresses:
+            break
+        seen += len(addresses)
+
+        sp = get_suggested_params(client)
+        operations, balances = [], dict()
+        for address in addresses:
+            account_info = client.account_info(address)
+            listings = _listings(client, account_info, idle_policies or {})
+            if any(listings.values()) or not _holds_nothing(account_info):
+                registry.unreserve(address)
+                # index what the slot holds, it is looked at again once idle for min_idle
+                for app_id, listed in listings.items():
+                    registry.index(address, app_id, SLOT_IN_USE if listed else SLOT_FREE)
+                report.skipped += 1
+                continue
+            txns = [
+                transaction.ApplicationClearStateTxn(sender=address, sp=sp, index=local_state["id"])
+                for local_state in account_info.get("apps-local-state", [])
+            ]
+            txns.append(transaction.PaymentTxn(
+                sender=address,
+                receiver=owner.get_address(),
+                amt=0,
+                close_remainder_to=owner.get_address(),
+                sp=sp,
+            ))
+            signers.add_rekeyed(address, owner.get_address())
+            operations.append(Operation(txns, signers, fee_payer=len(txns) - 1))
+            balances[address] = account_info["amount"]
+
+        for group in pack(operations, ordered=False):
+            slots = [operation.transactions[-1].sender for operation in group.operations]
+            builder = GroupBuilder.from_packed(group, sp=sp)
+            try:
+                builder.execute(client)
+            except Exception as e:
+                logger.warning("Closing %d slots failed: %s", len(slots), e)
+                for address in slots:
+                    registry.unreserve(address)
+                report.failed += len(slots)
+                continue
+            fee = sum(txn.fee for txn in builder.transactions)
+            for address in slots:
+                registry.remove(address)
+            report.closed += len(slots)
+            report.fees += fee
+            report.recovered += sum(balances[address] for address in slots) - fee
+
+    return report
+
+
+def _holds_nothing(account_info: Dict[str, Any]) -> bool:
+    return not (account_info.get("assets") or account_info.get("created-apps") or account_info.get("created-assets"))
+
+
+def _listings(client: AlgodClient, account_info: Dict[str, Any],
+              idle_policies: Dict[int, IdlePolicy]) -> Dict[int, bool]:
+    """Whether the slot still holds a listing, by app it is opted into."""
+    listings = dict()
+    for local_state in account_info.get("apps-local-state", []):
+        app_id = local_state["id"]
+        state = decode_state(local_state.get("key-value", []))
+        policy = idle_policies.get(app_id)
+        if policy is not None:
+            listings[app_id] = not policy(client, app_id, state)
+        else:
+            listings[app_id] = any(state.get(key) for key in LISTING_KEYS)
+    return listings
 
 
 def charge_optin_price(client: AlgodClient, sender: Account, receiver: str, optin_price: int):
@@ -316,7 +875,7 @@ def charge_optin_price(client: AlgodClient, sender: Account, receiver: str, opti
         sender=sender.get_address(),
         receiver=receiver,
         amt=optin_price,
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
     )
     signed_fund_txn = fund_account_txn.sign(sender.get_private_key())
     client.send_transaction(signed_fund_txn)
@@ -324,39 +883,22 @@ def charge_optin_price(client: AlgodClient, sender: Account, receiver: str, opti
 
 
 def get_rekeyed_addresses(sender: str) -> List:
-    result = []
-    obj = read_rekeyed_addresses()
-    for key in obj:
-        if (key == sender):
-            for address in obj[key]:
-                result.append(address)
-        return result
-    return []
+    return get_rekeyed_registry().addresses(sender)
 
 
 def write_rekeyed_addresses(obj):
-    with open("rekeyed_addresses.json", 'w') as f:
-        json.dump(obj, f)
+    registry = get_rekeyed_registry()
+    for sender, addresses in obj.items():
+        for address, optedin in addresses.items():
+            registry.add(sender, address, optedin)
         
 
 def read_rekeyed_addresses():
-    with open("rekeyed_addresses.json", 'r') as f:
-        return json.load(f)
+    return get_rekeyed_registry().all()
         
 
 def set_rekeyed_address(sender: str, new_address: str, optedin: int = 0):
-    obj = read_rekeyed_addresses()
-    #print("obj", obj)
-    for key in obj:
-        if (key == sender):
-            obj[key][new_address] = optedin
-            write_rekeyed_addresses(obj)
-            return
-    
-    no = {}
-    no[new_address] = optedin
-    obj[sender] = no
-    write_rekeyed_addresses(obj)
+    get_rekeyed_registry().add(sender, new_address, optedin)
 
 
 def get_account_info(client: AlgodClient, sender_address: str):
@@ -370,7 +912,7 @@ def deleteApps(client: AlgodClient, app_ids: List[int], sender: Account):
         delete_txn = transaction.ApplicationDeleteTxn(
             sender=sender.get_address(),
             index=app_id,
-            sp=client.suggested_params(),
+            sp=get_suggested_params(client),
         )
         signed_delete_txn = delete_txn.sign(sender.get_private_key())
         client.send_transaction(signed_delete_txn)
@@ -391,7 +933,7 @@ def send_asset(client: AlgodClient, asset_id: int, asset_amount: int, sender: Ac
         receiver=receiver.get_address,
         index=asset_id,
         amt=asset_amount,
-        sp=client.suggested_params(),
+        sp=get_suggested_params(client),
     )
     
     signed_txn = txn.sign(sender.get_address())
@@ -417,4 +959,4 @@ def hashMetaData(json_metadata: str) :
     print(base64.b64encode(am).decode("utf-8"))
     #return base64.b64encode(am)
 
-    return am
\ No newline at end of file
+    return am